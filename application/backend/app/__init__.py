@@ -1,22 +1,41 @@
+import asyncio
 import os
-from flask import Flask
-from flask_cors import CORS
-from asgiref.wsgi import WsgiToAsgi
+import re
+from quart import Quart, jsonify
+from quart_cors import cors
 
 from .config import Config
 from .database import init_app as init_db_app
+from .json_provider import init_app as init_json_app
+from .metrics import init_app as init_metrics_app
+from .profiling import admin_required, init_app as init_profiling_app
+from .warmup import init_app as init_warmup_app
+from .utils.crypto_pool import init_app as init_crypto_pool_app
+from .utils.issuance_jobs import init_app as init_issuance_jobs_app
+from .cache import cache_stats
 
 """Application factory function."""
 def create_app():
     
-    app = Flask(__name__)
+    # Quart serves the app natively over ASGI: async views run on the server's event loop
+    # and sync views are run on a thread pool.
+    app = Quart(__name__)
     app.config.from_object(Config)
 
-    # Initialize CORS
-    CORS(app, supports_credentials=True, resources={r"/*": {"origins": "*"}})
+    # orjson-backed jsonify/get_json when available
+    init_json_app(app)
+
+    # Initialize CORS (any origin is reflected back, so credentials are allowed)
+    app = cors(app, allow_credentials=True, allow_origin=re.compile(r".*"))
 
     # Initialize Database
     init_db_app(app)
+
+    # Request timing and the Prometheus /metrics endpoint
+    init_metrics_app(app)
+
+    # Open DB connections and load issuer keys in each server process before it takes traffic
+    init_warmup_app(app)
     
     # Import and register blueprints
     from .routes import verifier_routes, auth_routes, issuer_routes, holder_routes
@@ -25,11 +44,41 @@ def create_app():
     app.register_blueprint(verifier_routes.verifier, url_prefix='/api/verifier')
     app.register_blueprint(issuer_routes.issuer, url_prefix='/api/issuer')
     app.register_blueprint(holder_routes.holder, url_prefix='/api/holder')
+    # /verify_batch streams bodies larger than MAX_CONTENT_LENGTH
+    verifier_routes.init_app(app)
+
+    # Workers draining the asynchronous issuance queue, started with the server
+    init_issuance_jobs_app(app)
+
+    # didkit signing and verification worker processes; 503 when saturated (shut down after the issuance workers)
+    init_crypto_pool_app(app)
+
+    from .utils.issuer_stats import rebuild_issuer_stats_command
+    app.cli.add_command(rebuild_issuer_stats_command)
+    from .utils.credential_codec import reencode_credentials_command, credential_storage_stats_command
+    app.cli.add_command(reencode_credentials_command)
+    app.cli.add_command(credential_storage_stats_command)
+    from .utils.provisioning import provision_users_command, backfill_keys_command
+    app.cli.add_command(provision_users_command)
+    app.cli.add_command(backfill_keys_command)
     
     @app.route('/')
     def home():
-        return "Flask backend (MariaDB) is running!"
+        return f"Quart backend ({app.config['STORAGE_BACKEND']}) is running!"
+
+    @app.route('/api/cache/stats')
+    @admin_required
+    def get_cache_stats():
+        return jsonify(cache_stats())
+
+    # Opt-in per-request profiling; wraps every view registered above
+    init_profiling_app(app)
 
-    app.asgi_app = WsgiToAsgi(app)
+    return app
 
-    return app
\ No newline at end of file
+def run_with_app_context(app, func, *args, **kwargs):
+    """Runs a blocking callable inside an app context from a plain script (Quart contexts are async)."""
+    async def _inner():
+        async with app.app_context():
+            return func(*args, **kwargs)
+    return asyncio.run(_inner())
@@ -0,0 +1,38 @@
+"""
+Async bridge to the storage backends for the `async def` routes.
+
+Storage calls are blocking, so they are shipped to a dedicated thread pool and
+awaited. The current context is copied into the worker so `g` and
+`current_app` behave exactly as in a sync route, and the connection held by the
+request is shared with the rest of it. Calls for a single request are awaited
+one after another, so the connection is never used by two threads at once.
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from quart import current_app
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor():
+    """Returns the process-wide executor used for database I/O."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=current_app.config["DB_EXECUTOR_WORKERS"],
+                    thread_name_prefix="db-io",
+                )
+    return _executor
+
+async def run_sync(func, *args, **kwargs):
+    """Runs a blocking callable on the database executor with the current context."""
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, func, *args, **kwargs)
+    return await loop.run_in_executor(get_executor(), call)
@@ -13,7 +13,108 @@ class Config:
     MARIADB_PASSWORD = os.environ.get("MARIADB_PASSWORD")
     MARIADB_DATABASE = os.environ.get("MARIADB_DATABASE")
     MARIADB_PORT = os.environ.get("MARIADB_PORT")
-    
+
+    # Connection pool settings (see app/pool.py)
+    DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 10))
+    DB_POOL_MAX_OVERFLOW = int(os.environ.get("DB_POOL_MAX_OVERFLOW", 5))
+    DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 5))
+    DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 1800))
+    DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "true").lower() == "true"
+
+    # Threads used by the async routes for blocking database I/O (see app/async_db.py)
+    DB_EXECUTOR_WORKERS = int(os.environ.get("DB_EXECUTOR_WORKERS", DB_POOL_SIZE + DB_POOL_MAX_OVERFLOW))
+
+    # Authenticated user lookup cache (see routes/auth_routes.py)
+    USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", 10000))
+    USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", 60))
+
+    # Password hashing (see utils/crypto.py). Changing BCRYPT_ROUNDS rehashes passwords on next login.
+    BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", 12))
+    BCRYPT_WORKERS = int(os.environ.get("BCRYPT_WORKERS", os.cpu_count() or 1))
+    BCRYPT_MAX_QUEUE = int(os.environ.get("BCRYPT_MAX_QUEUE", 32))
+
+    # didkit signing and verification (see utils/crypto_pool.py): CRYPTO_WORKERS processes per server process
+    # (0: on the event loop). At most CRYPTO_MAX_QUEUE more operations wait (each proof of a verification
+    # batch counts as one, so the default leaves room for a few full batches); beyond that requests get a 503.
+    CRYPTO_WORKERS = int(os.environ.get("CRYPTO_WORKERS", os.cpu_count() or 1))
+    CRYPTO_MAX_QUEUE = int(os.environ.get("CRYPTO_MAX_QUEUE", 256))
+    CRYPTO_TIMEOUT = float(os.environ.get("CRYPTO_TIMEOUT", 10))
+
+    # Derived DID / verification-method cache for signing keys (see utils/keys.py)
+    KEY_CACHE_SIZE = int(os.environ.get("KEY_CACHE_SIZE", 1024))
+    KEY_CACHE_TTL = float(os.environ.get("KEY_CACHE_TTL", 300))
+
+    # Batch issuance (see routes/issuer_routes.py)
+    ISSUE_BATCH_MAX_ITEMS = int(os.environ.get("ISSUE_BATCH_MAX_ITEMS", 1000))
+    ISSUE_BATCH_CONCURRENCY = int(os.environ.get("ISSUE_BATCH_CONCURRENCY", 8))
+
+    # Asynchronous issuance jobs (see utils/issuance_jobs.py). Every server process runs ISSUE_JOB_CONCURRENCY
+    # workers (0: none in this process). Failed items are retried with exponential backoff from ISSUE_JOB_RETRY_DELAY;
+    # an item claimed longer than ISSUE_JOB_LEASE seconds ago is assumed lost and claimed again.
+    ISSUE_JOB_CONCURRENCY = int(os.environ.get("ISSUE_JOB_CONCURRENCY", 4))
+    ISSUE_JOB_MAX_ITEMS = int(os.environ.get("ISSUE_JOB_MAX_ITEMS", 10000))
+    ISSUE_JOB_MAX_ATTEMPTS = int(os.environ.get("ISSUE_JOB_MAX_ATTEMPTS", 5))
+    ISSUE_JOB_RETRY_DELAY = float(os.environ.get("ISSUE_JOB_RETRY_DELAY", 2))
+    ISSUE_JOB_LEASE = float(os.environ.get("ISSUE_JOB_LEASE", 300))
+    ISSUE_JOB_POLL_INTERVAL = float(os.environ.get("ISSUE_JOB_POLL_INTERVAL", 1))
+
+    # Proof verification batches (see utils/batch_verify.py): at most VERIFY_BATCH_SIZE proofs per crypto worker
+    # round trip (1: no batching). did:key public keys are decoded once per process, up to DID_KEY_CACHE_SIZE.
+    VERIFY_BATCH_SIZE = int(os.environ.get("VERIFY_BATCH_SIZE", 64))
+    DID_KEY_CACHE_SIZE = int(os.environ.get("DID_KEY_CACHE_SIZE", 4096))
+
+    # Maximum verifications in flight per /api/verifier/verify_batch request (one full batch by default)
+    VERIFY_BATCH_CONCURRENCY = int(os.environ.get("VERIFY_BATCH_CONCURRENCY", VERIFY_BATCH_SIZE))
+    # Largest single document accepted in a /verify_batch body (characters)
+    VERIFY_BATCH_MAX_DOCUMENT = int(os.environ.get("VERIFY_BATCH_MAX_DOCUMENT", 1024 * 1024))
+
+    # Verification result cache (see utils/verification_cache.py)
+    VERIFY_CACHE_SIZE = int(os.environ.get("VERIFY_CACHE_SIZE", 10000))
+    VERIFY_CACHE_TTL = float(os.environ.get("VERIFY_CACHE_TTL", 300))
+
+    # Keyset pagination for /api/holder/list_credentials
+    HOLDER_PAGE_SIZE = int(os.environ.get("HOLDER_PAGE_SIZE", 50))
+    HOLDER_PAGE_SIZE_MAX = int(os.environ.get("HOLDER_PAGE_SIZE_MAX", 200))
+
+    # Revocation status lists (see utils/status_list.py). PUBLIC_BASE_URL is used in credentialStatus URLs;
+    # at most STATUS_LIST_CACHE_SIZE decoded lists are kept in memory.
+    PUBLIC_BASE_URL = os.environ.get("PUBLIC_BASE_URL", "http://localhost:5001")
+    STATUS_LIST_SIZE = int(os.environ.get("STATUS_LIST_SIZE", 131072))
+    STATUS_LIST_TTL = float(os.environ.get("STATUS_LIST_TTL", 60))
+    STATUS_LIST_CACHE_SIZE = int(os.environ.get("STATUS_LIST_CACHE_SIZE", 1024))
+
+    # Storage format of new Credentials.credential_data rows: "none" (plain JSON), "zlib" or "zstd"
+    CREDENTIAL_COMPRESSION = os.environ.get("CREDENTIAL_COMPRESSION", "none").lower()
+    CREDENTIAL_COMPRESSION_LEVEL = int(os.environ.get("CREDENTIAL_COMPRESSION_LEVEL", 6))
+
+    # Storage backend (see app/storage): "mariadb" or "sqlite" (embedded, no external service)
+    STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "mariadb").lower()
+    SQLITE_PATH = os.environ.get("SQLITE_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "instance", "vc.sqlite3"))
+
+    # Per-stage latency histograms and the Prometheus /metrics endpoint (see metrics.py)
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() == "true"
+    # /metrics needs PROFILE_TOKEN like the other admin endpoints unless this is set
+    METRICS_PUBLIC = os.environ.get("METRICS_PUBLIC", "false").lower() == "true"
+
+    # On-demand request profiling (see profiling.py). Disabled unless PROFILE_TOKEN is set.
+    PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+    PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "instance", "profiles"))
+    PROFILE_MAX_FILES = int(os.environ.get("PROFILE_MAX_FILES", 50))
+    PROFILE_MIN_INTERVAL = float(os.environ.get("PROFILE_MIN_INTERVAL", 10))
+
+    # Request body (bytes) and response (seconds) limits of every endpoint; Quart's defaults.
+    # /api/verifier/verify_batch streams its body and has its own limits (0: unlimited).
+    MAX_CONTENT_LENGTH = int(os.environ.get("MAX_CONTENT_LENGTH", 16 * 1024 * 1024))
+    RESPONSE_TIMEOUT = float(os.environ.get("RESPONSE_TIMEOUT", 60))
+    VERIFY_BATCH_MAX_BODY = int(os.environ.get("VERIFY_BATCH_MAX_BODY", 256 * 1024 * 1024)) or None
+    VERIFY_BATCH_TIMEOUT = float(os.environ.get("VERIFY_BATCH_TIMEOUT", 600)) or None
+
+    # Per-worker warm-up before a server process accepts traffic (see warmup.py): pooled DB
+    # connections to open and how many issuers' key material to load into the key cache.
+    WARMUP_ON_START = os.environ.get("WARMUP_ON_START", "true").lower() == "true"
+    WARMUP_DB_CONNECTIONS = int(os.environ.get("WARMUP_DB_CONNECTIONS", DB_POOL_SIZE))
+    WARMUP_KEYS = int(os.environ.get("WARMUP_KEYS", KEY_CACHE_SIZE))
+
     # This check is also part of the class definition logic
-    if not all([SECRET_KEY, MARIADB_HOST, MARIADB_USER, MARIADB_PASSWORD, MARIADB_DATABASE]):
+    if not SECRET_KEY or (STORAGE_BACKEND == "mariadb" and not all([MARIADB_HOST, MARIADB_USER, MARIADB_PASSWORD, MARIADB_DATABASE])):
         raise ValueError("One or more required environment variables are not set.")
\ No newline at end of file
@@ -1,77 +1,163 @@
 import os
+import re
+import threading
 import mysql.connector
 import click
-from flask import g, current_app
-from flask.cli import with_appcontext
+from quart import g, current_app, jsonify
+from quart.cli import with_appcontext
+
+from .metrics import record_connection
+from .pool import ConnectionPool
+from .storage import get_storage, init_app as storage_init_app
+from .profiling import admin_required
+
+def _connection_config(app):
+    """Builds the mysql.connector arguments from the app configuration."""
+    config = {
+        'host': app.config["MARIADB_HOST"],
+        'user': app.config["MARIADB_USER"],
+        'password': app.config["MARIADB_PASSWORD"],
+        'database': app.config["MARIADB_DATABASE"]
+    }
+    port = app.config.get("MARIADB_PORT")
+    if port:
+        config['port'] = int(port)
+    return config
+
+_pool_lock = threading.Lock()
+
+def get_pool(app=None):
+    """Returns the process-wide connection pool for the app, creating it on first use."""
+    app = app or current_app._get_current_object()
+    pool = app.extensions.get('db_pool')
+    if pool is None:
+        with _pool_lock:
+            pool = app.extensions.get('db_pool')
+            if pool is None:
+                pool = ConnectionPool(
+                    _connection_config(app),
+                    pool_size=app.config["DB_POOL_SIZE"],
+                    max_overflow=app.config["DB_POOL_MAX_OVERFLOW"],
+                    timeout=app.config["DB_POOL_TIMEOUT"],
+                    recycle=app.config["DB_POOL_RECYCLE"],
+                    pre_ping=app.config["DB_POOL_PRE_PING"],
+                )
+                app.extensions['db_pool'] = pool
+    return pool
 
 def get_db():
-    """Opens a new database connection if there is none yet for the current application context."""
+    """Checks a pooled database connection out for the current application context."""
     if 'db' not in g:
         try:
-            config = {
-                'host': current_app.config["MARIADB_HOST"],
-                'user': current_app.config["MARIADB_USER"],
-                'password': current_app.config["MARIADB_PASSWORD"],
-                'database': current_app.config["MARIADB_DATABASE"]
-            }
-            port = current_app.config.get("MARIADB_PORT")
-            if port:
-                config['port'] = int(port)
-            
-            g.db = mysql.connector.connect(**config)
-
+            g.db = get_pool().checkout()
+            record_connection()
         except mysql.connector.Error as err:
             print(f"Error connecting to MariaDB: {err}")
             raise
     return g.db
 
-def init_db_schema():
-    """Initializes the database schema from schema.sql."""
-    schema_sql_path = os.path.join(os.path.dirname(__file__), 'schema.sql')
-    if not os.path.exists(schema_sql_path):
-        click.echo(click.style(f"Schema file not found: {schema_sql_path}", fg="red"))
-        return
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), 'migrations')
+MIGRATION_FILE_RE = re.compile(r'^(\d+)_(\w+)\.sql$')
+
+def list_migrations():
+    """Returns (version, name, path) for every migration file, in version order."""
+    migrations = []
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = MIGRATION_FILE_RE.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(MIGRATIONS_DIR, filename)))
+    return sorted(migrations)
 
+def applied_migrations(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS SchemaMigrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("SELECT version FROM SchemaMigrations")
+    return {row[0] for row in cursor.fetchall()}
+
+def migrate_db():
+    """
+    Applies pending migrations from app/migrations in version order and records
+    them in SchemaMigrations. Existing data is never dropped. MariaDB commits DDL
+    implicitly, so migrations are written to be safely re-runnable
+    (IF NOT EXISTS / INSERT IGNORE) in case one fails halfway.
+    """
     db = get_db()
     cursor = db.cursor()
     try:
-        with open(schema_sql_path, 'r') as f:
-            sql_script = f.read()
-        
-        statements = [s.strip() for s in sql_script.split(';') if s.strip()]
-        
-        for stmt in statements:
-            try:
-                click.echo(f"Executing: {stmt[:100]}...")
-                cursor.execute(stmt)
-            except mysql.connector.Error as err:
-                if err.errno == 1050:
-                     click.echo(click.style(f"Table in statement '{stmt[:50]}...' already exists. Skipped.", fg="yellow"))
-                else:
-                    click.echo(click.style(f"SQL Error during schema init: {err} for statement: {stmt}", fg="red"))
+        applied = applied_migrations(cursor)
+        pending = [m for m in list_migrations() if m[0] not in applied]
+        if not pending:
+            click.echo(click.style("Database schema is up to date.", fg="green"))
+            return 0
+
+        for version, name, path in pending:
+            click.echo(f"Applying migration {version:04d}_{name}...")
+            with open(path, 'r') as f:
+                # Drop comment lines so they can't hide or split statements
+                sql_script = "".join(line for line in f if not line.lstrip().startswith('--'))
+
+            statements = [s.strip() for s in sql_script.split(';') if s.strip()]
+            for stmt in statements:
+                try:
+                    cursor.execute(stmt)
+                except mysql.connector.Error as err:
+                    click.echo(click.style(f"SQL Error in migration {version:04d}_{name}: {err} for statement: {stmt}", fg="red"))
                     raise
-        db.commit()
-        click.echo(click.style("Database schema initialized successfully from schema.sql.", fg="green"))
+            cursor.execute("INSERT INTO SchemaMigrations (version, name) VALUES (%s, %s)", (version, name))
+            db.commit()
+
+        click.echo(click.style(f"Applied {len(pending)} migration(s).", fg="green"))
+        return len(pending)
     except Exception as e:
         db.rollback()
-        click.echo(click.style(f"An error occurred during schema initialization: {e}", fg="red"))
+        click.echo(click.style(f"An error occurred during migration: {e}", fg="red"))
+        raise
     finally:
         cursor.close()
 
 
 def close_db(e=None):
-    """Closes the database connection."""
+    """Returns the database connection to the pool."""
     db = g.pop('db', None)
-    if db is not None and db.is_connected():
-        db.close()
+    if db is not None:
+        get_pool().release(db)
+
+def get_pool_stats():
+    """Returns in-use count, wait time and checkout latency for the connection pool."""
+    return get_pool().stats()
 
 @click.command('init-db')
 @with_appcontext
 def init_db_command():
-    """CLI command to initialize the database."""
-    init_db_schema()
+    """CLI command to create or upgrade the database schema (non-destructive)."""
+    get_storage().migrate()
+
+@click.command('db-status')
+@with_appcontext
+def db_status_command():
+    """CLI command listing applied and pending schema migrations."""
+    if current_app.config["STORAGE_BACKEND"] != "mariadb":
+        click.echo("Versioned migrations only apply to MariaDB; 'quart init-db' keeps the SQLite schema current.")
+        return
+    cursor = get_db().cursor()
+    try:
+        applied = applied_migrations(cursor)
+    finally:
+        cursor.close()
+    for version, name, _ in list_migrations():
+        state = click.style("applied", fg="green") if version in applied else click.style("pending", fg="yellow")
+        click.echo(f"{version:04d}_{name}: {state}")
 
 def init_app(app):
-    """Register database functions with the Flask app."""
+    """Register database functions with the app."""
     app.teardown_appcontext(close_db)
-    app.cli.add_command(init_db_command)
\ No newline at end of file
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(db_status_command)
+    storage_init_app(app)
+    # Diagnostics (the SQLite path, pool internals): admin token only
+    app.add_url_rule('/api/db/pool_stats', 'db_pool_stats', admin_required(lambda: jsonify(get_storage().stats())))
\ No newline at end of file
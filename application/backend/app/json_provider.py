@@ -0,0 +1,63 @@
+"""
+JSON encoding for responses and internal serialisation.
+
+orjson is used when it is installed and the standard library otherwise. The
+orjson provider keeps the default provider's output contract: sorted keys,
+dates as HTTP dates, Decimal/UUID as strings and indented output in debug mode.
+
+Signed documents coming back from didkit are already serialised JSON, so
+`json_response` sends such a string as the body instead of parsing and
+re-encoding it.
+"""
+import json
+
+from quart import current_app
+from quart.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def dumps(obj):
+        """Compact JSON text for `obj` (document payloads, proof options, NDJSON lines)."""
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+
+    loads = orjson.loads
+
+    class OrjsonProvider(DefaultJSONProvider):
+        """Quart (Flask-compatible) JSON provider backed by orjson."""
+
+        def _encode(self, obj, indent=False):
+            option = ORJSON_OPTIONS | orjson.OPT_INDENT_2 if indent else ORJSON_OPTIONS
+            return orjson.dumps(obj, default=self.default, option=option)
+
+        def dumps(self, obj, **kwargs):
+            return self._encode(obj, indent=bool(kwargs.get('indent'))).decode('utf-8')
+
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+
+        def response(self, *args, **kwargs):
+            obj = self._prepare_response_obj(args, kwargs)
+            indent = (self.compact is None and self._app.debug) or self.compact is False
+            return self._app.response_class(self._encode(obj, indent) + b"\n", mimetype=self.mimetype)
+else:
+    def dumps(obj):
+        """Compact JSON text for `obj` (document payloads, proof options, NDJSON lines)."""
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+    loads = json.loads
+    OrjsonProvider = None
+
+
+def json_response(body, status=200):
+    """Response for a string that already holds a JSON document (e.g. didkit output)."""
+    return current_app.response_class(body, status=status, mimetype="application/json")
+
+def init_app(app):
+    if OrjsonProvider is not None:
+        app.json = OrjsonProvider(app)
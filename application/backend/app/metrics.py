@@ -0,0 +1,186 @@
+"""
+Low-overhead latency metrics in the Prometheus text format, served at /metrics.
+
+Stages of the hot paths are wrapped in `span("name")`, which records the wall
+time (including awaits) into the vc_stage_duration_seconds histogram. Every
+request is timed by hooks registered in init_app, which also count the database
+connections checked out and queries run on behalf of that request. A span costs
+two perf_counter() calls and one locked bucket update.
+
+Metrics live in the memory of the server process. With `run.py prod --workers N`
+a scrape is answered by whichever worker accepts the connection and reports only
+that worker's counters (and its own pools and caches), so values can jump between
+scrapes. Scrape each worker separately or aggregate over several scrapes.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from quart import Response, current_app, g, has_app_context, request
+
+from .cache import cache_stats
+from .profiling import admin_required
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+_registry = []
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)] + [f'{n}="{v}"' for n, v in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        for labels, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {series[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+# --- Metrics ---
+stage_duration = Histogram("vc_stage_duration_seconds", "Time spent in each instrumented stage.", ["stage"])
+request_duration = Histogram("vc_http_request_duration_seconds", "Request handling time.", ["method", "endpoint", "status"])
+request_queries = Histogram("vc_db_queries_per_request", "Database queries run for one request.", ["endpoint"], COUNT_BUCKETS)
+request_connections = Histogram("vc_db_connections_per_request", "Database connections checked out for one request.", ["endpoint"], COUNT_BUCKETS)
+db_queries = Counter("vc_db_queries_total", "Database queries executed.")
+db_connections = Counter("vc_db_connection_checkouts_total", "Database connections checked out for an application context.")
+crypto_service_time = Histogram("vc_crypto_service_seconds", "Time a crypto worker spent on one didkit operation.", ["operation"])
+crypto_queue_wait = Histogram("vc_crypto_queue_wait_seconds", "Time a didkit operation waited for a crypto worker (including the hand-off).", ["operation"])
+crypto_queue_depth = Histogram("vc_crypto_queue_depth", "Operations already waiting for a crypto worker when one was submitted.", (), COUNT_BUCKETS)
+verify_batch_size = Histogram("vc_verify_batch_size", "Distinct proofs sent to a crypto worker in one verification batch.", (), COUNT_BUCKETS)
+crypto_rejected = Counter("vc_crypto_rejected_total", "didkit operations rejected by the crypto pool (saturated, timeout, worker_lost).", ["operation", "reason"])
+
+
+@contextmanager
+def span(stage):
+    """Times the enclosed block as `stage` (works around awaits too)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_duration.observe(time.perf_counter() - started, stage)
+
+def record_query(count=1):
+    """Called by the storage layer for every statement it executes."""
+    db_queries.inc(count)
+    if has_app_context():
+        stats = g.get('request_metrics')
+        if stats is not None:
+            stats['queries'] += count
+
+def record_connection():
+    """Called by the storage backends when an application context checks a connection out."""
+    db_connections.inc()
+    if has_app_context():
+        stats = g.get('request_metrics')
+        if stats is not None:
+            stats['connections'] += 1
+
+
+# --- Exposition ---
+def _gauge_lines(name, documentation, samples):
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} gauge"]
+    lines += [f"{name}{labels} {value}" for labels, value in samples]
+    return lines
+
+def render_metrics():
+    """Returns every metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines += metric.render()
+
+    # Point-in-time values collected on scrape
+    from .storage import get_storage
+    pool = get_storage().stats()
+    for key, value in sorted(pool.items()):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            lines += _gauge_lines(f"vc_db_pool_{key}", f"Connection pool '{key}' ({current_app.config['STORAGE_BACKEND']}).", [("", value)])
+    caches = cache_stats()
+    for key in ("size", "hits", "misses", "evictions", "expirations", "invalidations"):
+        lines += _gauge_lines(f"vc_cache_{key}", f"Cache {key} per cache.",
+                              [(f'{{cache="{name}"}}', stats[key]) for name, stats in sorted(caches.items())])
+    from .utils.crypto_pool import crypto_pool_stats
+    crypto = crypto_pool_stats()
+    for key, value in sorted((crypto or {}).items()):
+        lines += _gauge_lines(f"vc_crypto_pool_{key}", f"Crypto pool '{key}' of this process.", [("", value)])
+    return "\n".join(lines) + "\n"
+
+
+# --- Request hooks ---
+async def _start_request():
+    g.request_metrics = {"started": time.perf_counter(), "queries": 0, "connections": 0}
+
+async def _finish_request(response):
+    stats = g.get('request_metrics')
+    if stats is not None:
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        request_duration.observe(time.perf_counter() - stats["started"], request.method, endpoint, response.status_code)
+        request_queries.observe(stats["queries"], endpoint)
+        request_connections.observe(stats["connections"], endpoint)
+    return response
+
+async def metrics_view():
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+def init_app(app):
+    """
+    Registers the request hooks and the /metrics endpoint when METRICS_ENABLED is
+    set. The endpoint reports pool and cache internals, so it requires the admin
+    token (Authorization: Bearer <PROFILE_TOKEN>) unless METRICS_PUBLIC is set.
+    """
+    if not app.config["METRICS_ENABLED"]:
+        return
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    view = metrics_view if app.config["METRICS_PUBLIC"] else admin_required(metrics_view)
+    app.add_url_rule('/metrics', 'metrics', view)
@@ -1,15 +1,7 @@
-CREATE DATABASE IF NOT EXISTS projetoVC;
+-- Baseline schema. Uses IF NOT EXISTS throughout so databases created from
+-- the old schema.sql are adopted as-is.
 
--- Use the database
-USE projetoVC;
-
--- Drop tables if they exist to ensure a clean slate
-DROP TABLE IF EXISTS projetoVC.Revocations;
-DROP TABLE IF EXISTS projetoVC.Credentials;
-DROP TABLE IF EXISTS projetoVC.Users;
-
--- Create Users table
-CREATE TABLE Users (
+CREATE TABLE IF NOT EXISTS Users (
     user_id INT PRIMARY KEY AUTO_INCREMENT,
     username VARCHAR(255) UNIQUE,                 
     email VARCHAR(255) UNIQUE NOT NULL,           
@@ -18,8 +10,7 @@ CREATE TABLE Users (
     role VARCHAR(50)                             
 );
 
--- Create Credentials table
-CREATE TABLE Credentials (
+CREATE TABLE IF NOT EXISTS Credentials (
     cred_id INT PRIMARY KEY AUTO_INCREMENT,
     issuer_id INT NOT NULL,
     holder_id INT NOT NULL,
@@ -33,8 +24,7 @@ CREATE TABLE Credentials (
     FOREIGN KEY(holder_id) REFERENCES Users(user_id) ON DELETE RESTRICT
 );
 
--- Create Revocations table
-CREATE TABLE Revocations (
+CREATE TABLE IF NOT EXISTS Revocations (
     revoc_id INT PRIMARY KEY AUTO_INCREMENT,
     cred_id INT UNIQUE NOT NULL,
     revoked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
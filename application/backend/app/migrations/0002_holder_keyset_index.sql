@@ -0,0 +1,5 @@
+-- Keyset pagination for /api/holder/list_credentials. The composite index
+-- also serves the holder_id foreign key, so the single-column one is dropped.
+
+CREATE INDEX IF NOT EXISTS idx_credentials_holder_issued ON Credentials(holder_id, issued_at, cred_id);
+DROP INDEX IF EXISTS idx_credentials_holder_id ON Credentials;
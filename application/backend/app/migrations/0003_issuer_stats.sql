@@ -0,0 +1,52 @@
+-- Incrementally maintained issuer dashboard statistics (see app/utils/issuer_stats.py).
+-- Existing data is folded in here, and 'flask rebuild-issuer-stats' does the same at any time.
+
+CREATE TABLE IF NOT EXISTS IssuerStats (
+    issuer_id INT PRIMARY KEY,
+    credentials_issued INT NOT NULL DEFAULT 0,
+    active_students INT NOT NULL DEFAULT 0,
+    revoked_credentials INT NOT NULL DEFAULT 0,
+    FOREIGN KEY(issuer_id) REFERENCES Users(user_id) ON DELETE CASCADE
+);
+
+-- Distinct holders per issuer, backing IssuerStats.active_students
+CREATE TABLE IF NOT EXISTS IssuerHolders (
+    issuer_id INT NOT NULL,
+    holder_id INT NOT NULL,
+    PRIMARY KEY (issuer_id, holder_id),
+    FOREIGN KEY(issuer_id) REFERENCES Users(user_id) ON DELETE CASCADE,
+    FOREIGN KEY(holder_id) REFERENCES Users(user_id) ON DELETE CASCADE
+);
+
+-- Ring of the most recent issuances per issuer (slot = seq mod ring size)
+CREATE TABLE IF NOT EXISTS IssuerActivity (
+    issuer_id INT NOT NULL,
+    slot TINYINT NOT NULL,
+    seq INT NOT NULL,
+    title VARCHAR(100),
+    holder_email VARCHAR(255),
+    issued_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (issuer_id, slot),
+    FOREIGN KEY(issuer_id) REFERENCES Users(user_id) ON DELETE CASCADE
+);
+
+INSERT IGNORE INTO IssuerHolders (issuer_id, holder_id)
+SELECT DISTINCT issuer_id, holder_id FROM Credentials;
+
+INSERT IGNORE INTO IssuerStats (issuer_id, credentials_issued, active_students, revoked_credentials)
+SELECT c.issuer_id, COUNT(*), COUNT(DISTINCT c.holder_id), COUNT(r.revoc_id)
+FROM Credentials c
+LEFT JOIN Revocations r ON r.cred_id = c.cred_id
+GROUP BY c.issuer_id;
+
+INSERT IGNORE INTO IssuerActivity (issuer_id, slot, seq, title, holder_email)
+SELECT ranked.issuer_id, MOD(s.credentials_issued - ranked.rn + 1, 5), s.credentials_issued - ranked.rn + 1,
+       ranked.title, ranked.holder_email
+FROM (
+    SELECT c.issuer_id, c.title, u.email AS holder_email,
+           ROW_NUMBER() OVER (PARTITION BY c.issuer_id ORDER BY c.issued_at DESC, c.cred_id DESC) AS rn
+    FROM Credentials c
+    JOIN Users u ON c.holder_id = u.user_id
+) ranked
+JOIN IssuerStats s ON s.issuer_id = ranked.issuer_id
+WHERE ranked.rn <= 5;
@@ -0,0 +1,9 @@
+-- Constraint-backed duplicate detection. Both dedup paths key on
+-- credential_hash: uploads hash the whole document and issue_vc hashes
+-- issuer:holder:course:grade:date, so one unique key covers
+-- (holder_id, credential_hash) as well. The routes insert and catch 1062
+-- instead of running a pre-check SELECT.
+--
+-- Fails if the table already holds duplicate hashes, so resolve those first.
+
+ALTER TABLE Credentials ADD UNIQUE INDEX IF NOT EXISTS uq_credentials_hash (credential_hash);
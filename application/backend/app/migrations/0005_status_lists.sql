@@ -0,0 +1,12 @@
+-- StatusList2021-style revocation (see app/utils/status_list.py). Each issuer
+-- has one bitstring, and credentials record their position in it.
+
+CREATE TABLE IF NOT EXISTS StatusLists (
+    issuer_id INT PRIMARY KEY,
+    next_index INT NOT NULL DEFAULT 0,
+    revision INT NOT NULL DEFAULT 0,
+    bits MEDIUMBLOB,
+    FOREIGN KEY(issuer_id) REFERENCES Users(user_id) ON DELETE CASCADE
+);
+
+ALTER TABLE Credentials ADD COLUMN IF NOT EXISTS status_list_index INT NULL;
@@ -0,0 +1,4 @@
+-- credential_data may now hold compressed documents (see app/utils/credential_codec.py).
+-- Existing JSON rows convert byte for byte and stay readable as plain JSON.
+
+ALTER TABLE Credentials MODIFY credential_data MEDIUMBLOB NOT NULL;
@@ -0,0 +1,30 @@
+-- Durable queue for asynchronous issuance (see app/utils/issuance_jobs.py). A job is
+-- one accepted request; each credential subject in it is an item that the issuance
+-- workers claim, sign and store on their own, with retries.
+
+CREATE TABLE IF NOT EXISTS IssuanceJobs (
+    job_id INT PRIMARY KEY AUTO_INCREMENT,
+    issuer_id INT NOT NULL,
+    total INT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY(issuer_id) REFERENCES Users(user_id) ON DELETE CASCADE
+);
+
+-- status: queued, running, created, duplicate or error. A running item whose
+-- claimed_at is older than the lease is claimed again (the worker died).
+CREATE TABLE IF NOT EXISTS IssuanceJobItems (
+    item_id INT PRIMARY KEY AUTO_INCREMENT,
+    job_id INT NOT NULL,
+    item_index INT NOT NULL,
+    payload TEXT NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+    attempts INT NOT NULL DEFAULT 0,
+    available_at DATETIME(6) NOT NULL,
+    claimed_at DATETIME(6) NULL,
+    finished_at DATETIME(6) NULL,
+    error VARCHAR(500) NULL,
+    UNIQUE KEY uq_issuance_job_item (job_id, item_index),
+    FOREIGN KEY(job_id) REFERENCES IssuanceJobs(job_id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_issuance_items_claim ON IssuanceJobItems(status, available_at);
@@ -0,0 +1,204 @@
+import threading
+import time
+from collections import deque
+
+import mysql.connector
+from mysql.connector import errors
+
+
+class PoolTimeoutError(errors.PoolError):
+    """Raised when no connection could be checked out before the wait timeout."""
+
+
+class ConnectionPool:
+    """
+    Thread-safe MariaDB connection pool.
+
+    Keeps up to `pool_size` idle connections around and allows `max_overflow`
+    extra connections under load. Callers that find the pool exhausted wait up
+    to `timeout` seconds for a connection to be returned. Connections older than
+    `recycle` seconds are replaced on checkout, and `pre_ping` checks liveness
+    before a connection is handed out.
+    """
+
+    def __init__(self, connect_args, pool_size=10, max_overflow=5, timeout=5.0, recycle=1800, pre_ping=True):
+        self._connect_args = dict(connect_args)
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._born = {}
+        # dispose() starts a new generation; connections of older ones are closed on release
+        self._generation = 0
+        self._conn_generation = {}
+        self._total = 0
+        self._in_use = 0
+
+        # Statistics
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._timeouts = 0
+        self._checkout_time = 0.0
+        self._checkout_time_max = 0.0
+        self._created = 0
+        self._recycled = 0
+        self._ping_failures = 0
+
+    # --- Connection lifecycle ---
+    def _connect(self):
+        conn = mysql.connector.connect(**self._connect_args)
+        with self._cond:
+            self._born[id(conn)] = time.monotonic()
+            self._conn_generation[id(conn)] = self._generation
+            self._created += 1
+        return conn
+
+    def _discard(self, conn):
+        with self._cond:
+            self._born.pop(id(conn), None)
+            self._conn_generation.pop(id(conn), None)
+        try:
+            conn.close()
+        except errors.Error:
+            pass
+
+    def _validate(self, conn):
+        """Returns a usable connection, replacing `conn` if it is stale or dead."""
+        born = self._born.get(id(conn), 0)
+        if self.recycle and time.monotonic() - born > self.recycle:
+            self._discard(conn)
+            with self._cond:
+                self._recycled += 1
+            return self._connect()
+
+        if self.pre_ping:
+            try:
+                conn.ping(reconnect=False)
+            except errors.Error:
+                self._discard(conn)
+                with self._cond:
+                    self._ping_failures += 1
+                return self._connect()
+        return conn
+
+    def checkout(self):
+        """Borrows a connection from the pool, waiting up to `timeout` seconds."""
+        start = time.monotonic()
+        deadline = start + self.timeout
+        conn = None
+        waited = False
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._total < self.pool_size + self.max_overflow:
+                    # Reserve a slot; the connection is opened outside the lock.
+                    self._total += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeoutError(
+                        f"Connection pool exhausted ({self._in_use} in use) after waiting {self.timeout}s"
+                    )
+                waited = True
+                self._cond.wait(remaining)
+            self._in_use += 1
+            wait_time = time.monotonic() - start
+            if waited:
+                self._waits += 1
+                self._wait_time += wait_time
+
+        try:
+            conn = self._connect() if conn is None else self._validate(conn)
+        except Exception:
+            with self._cond:
+                self._total -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        elapsed = time.monotonic() - start
+        with self._cond:
+            self._checkouts += 1
+            self._checkout_time += elapsed
+            self._checkout_time_max = max(self._checkout_time_max, elapsed)
+        return conn
+
+    def release(self, conn):
+        """Returns a connection to the pool, discarding it if broken or surplus."""
+        keep = True
+        try:
+            if conn.in_transaction:
+                # Never hand the next request a half-finished transaction.
+                conn.rollback()
+        except errors.Error:
+            keep = False
+
+        with self._cond:
+            self._in_use -= 1
+            current = self._conn_generation.get(id(conn)) == self._generation
+            if keep and current and len(self._idle) < self.pool_size:
+                self._idle.append(conn)
+            else:
+                self._total -= 1
+                keep = False
+            self._cond.notify()
+
+        if not keep:
+            self._discard(conn)
+
+    def prewarm(self, count):
+        """Opens idle connections until `count` (at most pool_size) are available. Returns the number opened."""
+        with self._cond:
+            wanted = min(count, self.pool_size) - len(self._idle)
+            wanted = max(0, min(wanted, self.pool_size + self.max_overflow - self._total))
+            # Reserve the slots; the connections are opened outside the lock.
+            self._total += wanted
+
+        opened = []
+        try:
+            for _ in range(wanted):
+                opened.append(self._connect())
+        finally:
+            with self._cond:
+                self._total -= wanted - len(opened)
+                self._idle.extend(opened)
+                self._cond.notify_all()
+        return len(opened)
+
+    def dispose(self):
+        """Closes every idle connection. Checked-out connections are closed on release."""
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+            self._total -= len(idle)
+            self._generation += 1
+        for conn in idle:
+            self._discard(conn)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "pool_size": self.pool_size,
+                "max_overflow": self.max_overflow,
+                "total": self._total,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "overflow": max(0, self._total - self.pool_size),
+                "checkouts": self._checkouts,
+                "connections_created": self._created,
+                "connections_recycled": self._recycled,
+                "ping_failures": self._ping_failures,
+                "waits": self._waits,
+                "wait_time_total_s": round(self._wait_time, 6),
+                "timeouts": self._timeouts,
+                "checkout_latency_avg_ms": round(self._checkout_time / self._checkouts * 1000, 3) if self._checkouts else 0.0,
+                "checkout_latency_max_ms": round(self._checkout_time_max * 1000, 3),
+            }
@@ -0,0 +1,205 @@
+"""
+On-demand cProfile capture of individual requests.
+
+Profiling is off unless PROFILE_TOKEN is set. A request carrying the token in
+the X-Profile header is then run under cProfile, as is one with the `_profile=1`
+query switch and the token as `Authorization: Bearer <token>` (the token itself
+is never read from the URL, which ends up in logs and browser history). The
+stats are written to PROFILE_DIR, which keeps only the newest
+PROFILE_MAX_FILES dumps. At most one request is profiled at a time and at most
+one per PROFILE_MIN_INTERVAL seconds; anything beyond that runs normally and is
+answered with `X-Profile: skipped`.
+
+The profiler is enabled in the thread that runs the view. For async views that
+is the server's event loop, which is shared, so other requests interleaved on
+the loop during the capture show up in the profile too. Work shipped to the DB
+executor shows up as time spent waiting on the loop. Streamed response bodies
+are not covered.
+
+Dumps are listed at /api/admin/profiles and downloaded (pstats format, e.g.
+for snakeviz) or summarised as text at /api/admin/profiles/<name>. Both
+endpoints require the same token, as do the other diagnostics endpoints
+(/api/db/pool_stats, /api/cache/stats) through `admin_required`.
+"""
+import cProfile
+import hmac
+import inspect
+import io
+import os
+import pstats
+import re
+import threading
+import time
+from datetime import datetime
+from functools import wraps
+
+from quart import current_app, g, jsonify, request, send_from_directory
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_QUERY_PARAM = "_profile"
+PROFILE_NAME_RE = re.compile(r'^[\w.-]+\.prof$')
+
+_slot = threading.Lock()
+_last_started = 0.0
+
+
+def _authorised(supplied):
+    token = current_app.config["PROFILE_TOKEN"]
+    return bool(token) and bool(supplied) and hmac.compare_digest(supplied.encode('utf-8'), token.encode('utf-8'))
+
+def _supplied_token():
+    return request.headers.get(PROFILE_HEADER) or request.headers.get('Authorization', '').removeprefix('Bearer ')
+
+def _profile_requested():
+    if not request.headers.get(PROFILE_HEADER) and request.args.get(PROFILE_QUERY_PARAM) != "1":
+        return False
+    return _authorised(_supplied_token())
+
+def _acquire_slot():
+    """Takes the single profiling slot if it is free and the rate limit allows it."""
+    global _last_started
+    if not _slot.acquire(blocking=False):
+        return False
+    now = time.monotonic()
+    if now - _last_started < current_app.config["PROFILE_MIN_INTERVAL"]:
+        _slot.release()
+        return False
+    _last_started = now
+    return True
+
+
+# --- On-disk ring ---
+def list_profiles(directory):
+    """Returns the stored dumps, newest first."""
+    if not os.path.isdir(directory):
+        return []
+    entries = []
+    for name in os.listdir(directory):
+        if PROFILE_NAME_RE.match(name):
+            stat = os.stat(os.path.join(directory, name))
+            entries.append({"name": name, "size": stat.st_size, "created": datetime.utcfromtimestamp(stat.st_mtime).isoformat() + "Z"})
+    return sorted(entries, key=lambda entry: entry["name"], reverse=True)
+
+def _store(profiler, elapsed):
+    """Writes the dump and trims the ring to PROFILE_MAX_FILES. Returns the file name."""
+    directory = current_app.config["PROFILE_DIR"]
+    os.makedirs(directory, exist_ok=True)
+    endpoint = re.sub(r'[^\w-]+', '_', request.endpoint or "unknown")
+    name = f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{request.method}-{endpoint}-{elapsed * 1000:.0f}ms.prof"
+    profiler.dump_stats(os.path.join(directory, name))
+
+    for stale in list_profiles(directory)[current_app.config["PROFILE_MAX_FILES"]:]:
+        try:
+            os.remove(os.path.join(directory, stale["name"]))
+        except OSError:
+            pass
+    return name
+
+def _finish(profiler, started):
+    elapsed = time.perf_counter() - started
+    try:
+        g.profile_id = _store(profiler, elapsed)
+    except OSError as err:
+        print(f"Could not store request profile: {err}")
+    finally:
+        _slot.release()
+
+
+# --- View wrapping ---
+def _profiled(view):
+    if inspect.iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(*args, **kwargs):
+            if not _profile_requested():
+                return await view(*args, **kwargs)
+            if not _acquire_slot():
+                g.profile_id = "skipped"
+                return await view(*args, **kwargs)
+            profiler = cProfile.Profile()
+            started = time.perf_counter()
+            profiler.enable()
+            try:
+                return await view(*args, **kwargs)
+            finally:
+                profiler.disable()
+                _finish(profiler, started)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not _profile_requested():
+            return view(*args, **kwargs)
+        if not _acquire_slot():
+            g.profile_id = "skipped"
+            return view(*args, **kwargs)
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            return view(*args, **kwargs)
+        finally:
+            profiler.disable()
+            _finish(profiler, started)
+    return wrapper
+
+async def _add_profile_header(response):
+    profile_id = g.get('profile_id')
+    if profile_id:
+        response.headers[PROFILE_HEADER] = profile_id
+    return response
+
+
+# --- Admin endpoints ---
+def _admin_denied():
+    if not _authorised(_supplied_token()):
+        return jsonify({"error": "Admin endpoints are disabled or the token is invalid."}), 403
+    return None
+
+def admin_required(view):
+    """Restricts a view to requests carrying PROFILE_TOKEN (403 for everyone when it is unset)."""
+    @wraps(view)
+    async def wrapper(*args, **kwargs):
+        denied = _admin_denied()
+        if denied:
+            return denied
+        return await current_app.ensure_async(view)(*args, **kwargs)
+    return wrapper
+
+def list_profiles_view():
+    denied = _admin_denied()
+    if denied:
+        return denied
+    return jsonify(list_profiles(current_app.config["PROFILE_DIR"]))
+
+async def get_profile_view(name):
+    """Downloads a dump, or returns the top functions as text with ?format=text."""
+    denied = _admin_denied()
+    if denied:
+        return denied
+    directory = current_app.config["PROFILE_DIR"]
+    if not PROFILE_NAME_RE.match(name) or not os.path.isfile(os.path.join(directory, name)):
+        return jsonify({"error": "Profile not found."}), 404
+
+    if request.args.get('format') == 'text':
+        sort = request.args.get('sort', 'cumulative')
+        if sort not in ('cumulative', 'tottime', 'ncalls'):
+            return jsonify({"error": "sort must be cumulative, tottime or ncalls."}), 400
+        out = io.StringIO()
+        pstats.Stats(os.path.join(directory, name), stream=out).sort_stats(sort).print_stats(50)
+        return current_app.response_class(out.getvalue(), mimetype="text/plain")
+    return await send_from_directory(directory, name, as_attachment=True, mimetype="application/octet-stream")
+
+
+def init_app(app):
+    """
+    Wraps every view registered so far and adds the admin endpoints. Must be
+    called at the end of create_app, after all blueprints are registered.
+    """
+    if not app.config["PROFILE_TOKEN"]:
+        return
+    for endpoint, view in list(app.view_functions.items()):
+        if endpoint != 'static':
+            app.view_functions[endpoint] = _profiled(view)
+    app.after_request(_add_profile_header)
+    app.add_url_rule('/api/admin/profiles', 'list_profiles', list_profiles_view)
+    app.add_url_rule('/api/admin/profiles/<name>', 'get_profile', get_profile_view)
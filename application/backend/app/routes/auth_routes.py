@@ -3,14 +3,44 @@ import jwt
 import uuid
 from functools import wraps
 from datetime import datetime, timedelta
-from flask import Blueprint, request, jsonify, g, current_app
-import mysql.connector
+from quart import Blueprint, request, jsonify, g, current_app
 import didkit
-from ..utils.crypto import hash_password, check_password
-from app.database import get_db
+from ..utils.crypto import get_password_hasher, PasswordPoolSaturated
+from app.storage import get_storage, StorageError, DuplicateError
+from app.utils.keys import invalidate_key_material
+from app.utils.status_list import unknown_issuers
+from app import async_db
+from app.cache import TTLCache
+from app.metrics import span
+from app.config import Config
 
 auth = Blueprint('auth', __name__)
 
+# --- Cached User Lookup ---
+# Resolved g.current_user rows, keyed by user_id, so authenticated requests skip the Users query.
+user_cache = TTLCache("users", maxsize=Config.USER_CACHE_SIZE, ttl=Config.USER_CACHE_TTL)
+
+def invalidate_user(user_id):
+    """Drops a cached user. Must be called whenever a user is registered, changes role or is deleted."""
+    user_cache.invalidate(user_id)
+    unknown_issuers.invalidate(user_id)
+
+def load_user(user_id):
+    user = user_cache.get(user_id)
+    if user is None:
+        user = get_storage().get_user(user_id)
+        if user:
+            user_cache.set(user_id, user)
+    return dict(user) if user else None
+
+async def async_load_user(user_id):
+    user = user_cache.get(user_id)
+    if user is None:
+        user = await async_db.run_sync(get_storage().get_user, user_id)
+        if user:
+            user_cache.set(user_id, user)
+    return dict(user) if user else None
+
 # --- JWT Token Decorators ---
 def token_required(f):
     @wraps(f)
@@ -26,12 +56,10 @@ def token_required(f):
             return jsonify({'message': 'Token is missing!'}), 401
         
         try:
-            data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=["HS256"])
-            db = get_db()
-            cursor = db.cursor(dictionary=True)
-            cursor.execute("SELECT user_id, email, role FROM Users WHERE user_id = %s", (data['user_id'],))
-            current_user = cursor.fetchone()
-            cursor.close()
+            with span("jwt_decode"):
+                data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=["HS256"])
+            with span("user_lookup"):
+                current_user = load_user(data['user_id'])
             if not current_user:
                  return jsonify({'message': 'Token is invalid (user not found)!'}), 401
             g.current_user = current_user
@@ -53,12 +81,10 @@ def async_token_required(f):
         if not token: return jsonify({'message': 'Token is missing!'}), 401
         
         try:
-            data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=["HS256"])
-            db = get_db()
-            cursor = db.cursor(dictionary=True)
-            cursor.execute("SELECT user_id, email, role FROM Users WHERE user_id = %s", (data['user_id'],))
-            g.current_user = cursor.fetchone()
-            cursor.close()
+            with span("jwt_decode"):
+                data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=["HS256"])
+            with span("user_lookup"):
+                g.current_user = await async_load_user(data['user_id'])
             if not g.current_user: return jsonify({'message': 'Token is invalid (user not found)!'}), 401
         except (jwt.ExpiredSignatureError, jwt.InvalidTokenError) as e:
             return jsonify({'message': f'Token error: {str(e)}'}), 401
@@ -67,9 +93,15 @@ def async_token_required(f):
     return decorated
 
 # --- Auth Routes ---
+def _busy_response():
+    """Fast rejection used when the bcrypt pool is saturated."""
+    response = jsonify({"error": "Authentication service is busy. Please retry shortly."})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
 @auth.route('/register', methods=['POST'])
-def register():
-    data = request.get_json()
+async def register():
+    data = await request.get_json()
     email = data.get('email')
     password = data.get('password')
     role = data.get('role', 'holder')
@@ -81,41 +113,38 @@ def register():
     if g.get('current_user') and g.current_user['role'] != 'issuer' and role == 'issuer':
         return jsonify({"error": "You do not have permission to register an issuer."}), 403
 
-    hashed_pwd = hash_password(password)
+    try:
+        with span("bcrypt_hash"):
+            hashed_pwd = await get_password_hasher().hash(password)
+    except PasswordPoolSaturated:
+        return _busy_response()
     
+    storage = get_storage()
     try:
-        db = get_db()
-        cursor = db.cursor()
-    except mysql.connector.Error as err:
+        await async_db.run_sync(storage.check_connection)
+    except StorageError as err:
         print(f"DB CONNECTION ERROR in /register: {err}")
         return jsonify({"error": "Database service is currently unavailable."}), 503
 
     try:
-        cursor.execute("INSERT INTO Users (email, password, role) VALUES (%s, %s, %s)", (email, hashed_pwd, role))
-        user_id = cursor.lastrowid
+        jwk = didkit.generate_ed25519_key() if role in ['holder', 'issuer'] else None
+        with span("db_insert"):
+            user_id = await async_db.run_sync(storage.create_user, email, hashed_pwd, role, jwk)
 
-        if role in ['holder', 'issuer']:
-            jwk = didkit.generate_ed25519_key()
-            cursor.execute("UPDATE Users SET private_key = %s WHERE user_id = %s", (jwk, user_id))
-        
-        db.commit()
+        invalidate_user(user_id)
+        invalidate_key_material(user_id)
         return jsonify({"message": f"User '{email}' registered successfully as a {role}.", "user_id": user_id}), 201
         
-    except mysql.connector.Error as err:
-        db.rollback()
-        if err.errno == 1062:
-            return jsonify({"error": "Email already exists"}), 409
+    except DuplicateError:
+        return jsonify({"error": "Email already exists"}), 409
+    except StorageError as err:
         print(f"DB EXECUTION ERROR in /register: {err}")
         return jsonify({"error": "A database error occurred."}), 500
-        
-    finally:
-        if 'cursor' in locals() and cursor:
-            cursor.close()
 
 
 @auth.route('/login', methods=['POST'])
-def login():
-    data = request.get_json()
+async def login():
+    data = await request.get_json()
     email = data.get('email')
     password = data.get('password')
 
@@ -130,19 +159,34 @@ def login():
     except (TypeError, IndexError):
         return jsonify({"error": "Invalid email format provided."}), 400
 
+    storage = get_storage()
     try:
-        db = get_db()
-        cursor = db.cursor(dictionary=True)
-    except mysql.connector.Error as err:
+        await async_db.run_sync(storage.check_connection)
+    except StorageError as err:
         # Handle failure to get a database connection
         print(f"DB CONNECTION ERROR in /login: {err}")
         return jsonify({"error": "Database service is currently unavailable."}), 503
 
+    hasher = get_password_hasher()
     try:
-        cursor.execute("SELECT * FROM Users WHERE email = %s", (email,))
-        user = cursor.fetchone()
+        with span("user_lookup"):
+            user = await async_db.run_sync(storage.get_user_by_email, email)
+
+        with span("bcrypt_check"):
+            valid = bool(user) and await hasher.check(password, user['password'])
+
+        if valid:
+            # Transparently upgrade hashes made with an outdated cost factor.
+            # This is best effort: a busy pool or a failed write just postpones it to a later login.
+            if hasher.needs_rehash(user['password']):
+                try:
+                    new_hash = await hasher.hash(password)
+                    await async_db.run_sync(storage.update_password, user['user_id'], new_hash)
+                except PasswordPoolSaturated:
+                    pass
+                except StorageError as err:
+                    print(f"Could not upgrade the password hash of user {user['user_id']}: {err}")
 
-        if user and check_password(password, user['password']):
             token_payload = {
                 'user_id': user['user_id'],
                 'role': user['role'],
@@ -157,17 +201,14 @@ def login():
         else:
             # For security, use a generic "Invalid credentials" message
             return jsonify({"error": "Invalid credentials"}), 401
-            
-    except mysql.connector.Error as err:
+
+    except PasswordPoolSaturated:
+        return _busy_response()
+    except StorageError as err:
         # Handle errors during query execution
         print(f"DB EXECUTION ERROR in /login: {err}")
         return jsonify({"error": "A database error occurred while trying to log in."}), 500
 
-    finally:
-        # Ensure the cursor is always closed
-        if 'cursor' in locals() and cursor:
-            cursor.close()
-
 @auth.route('/me', methods=['GET'])
 @token_required
 def get_current_user_profile():
@@ -1,67 +1,133 @@
+import base64
 import hashlib
 import json
-import didkit
-from flask import Blueprint, request, jsonify, g
-import mysql.connector
+from quart import Blueprint, request, jsonify, g, current_app
 import uuid
 from datetime import datetime
-from app.database import get_db
+from app import async_db
+from app.json_provider import dumps, json_response, loads
+from app.metrics import span
+from app.storage import get_storage, StorageError, DuplicateError
+from app.utils.credential_codec import decode_document, decode_rows
+from app.utils.credentials import insert_credentials
+from app.utils.crypto_pool import CryptoUnavailable, get_crypto_pool
+from app.utils.keys import get_key_material
+from app.utils import sd_jwt
 from .auth_routes import async_token_required, token_required
 
 holder = Blueprint('holder', __name__)
 
+def encode_cursor(row):
+    """Opaque keyset cursor pointing just past `row` in (issued_at, cred_id) order."""
+    raw = f"{row['issued_at'].isoformat()}|{row['cred_id']}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor_str):
+    issued_at, cred_id = base64.urlsafe_b64decode(cursor_str.encode('ascii')).decode('utf-8').split('|')
+    return datetime.fromisoformat(issued_at), int(cred_id)
+
 @holder.route('/list_credentials', methods=['GET'])
 @token_required
 def get_holder_credentials():
+    """
+    Lists the holder's credentials, newest first.
+
+    With no query parameters the full list (including credential_data) is
+    returned as before. Passing `limit`, `cursor` or `view` switches to keyset
+    pagination over (issued_at, cred_id): the response is
+    {"items": [...], "next_cursor": ...} and, unless view=full, items are lean
+    summaries without credential_data (see /credentials/<cred_id>).
+    """
     # The decorator puts the user's data in g.current_user
     holder_user = g.current_user
     if holder_user['role'] != 'holder':
         return jsonify({"error": "Unauthorized"}), 403
 
     holder_id = holder_user['user_id']
-    db = get_db()
-    cursor = db.cursor(dictionary=True)
+    paginated = any(param in request.args for param in ('limit', 'cursor', 'view'))
+
+    storage = get_storage()
+    if not paginated:
+        with span("db_list"):
+            rows = storage.list_holder_credentials(holder_id)
+        return jsonify(decode_rows(rows))
+
+    max_page = current_app.config["HOLDER_PAGE_SIZE_MAX"]
     try:
-        cursor.execute("SELECT * FROM Credentials WHERE holder_id = %s ORDER BY issued_at DESC", (holder_id,))
-        credentials = cursor.fetchall()
-        return jsonify(credentials)
-    finally:
-        cursor.close()
+        limit = min(max(int(request.args.get('limit', current_app.config["HOLDER_PAGE_SIZE"])), 1), max_page)
+        after = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except (ValueError, TypeError):
+        return jsonify({"error": "Invalid limit or cursor."}), 400
+
+    full = request.args.get('view') == 'full'
+    with span("db_list"):
+        rows = storage.list_holder_credentials(holder_id, full=full, limit=limit + 1, after=after)
+    if full:
+        decode_rows(rows)
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return jsonify({"items": rows[:limit], "next_cursor": next_cursor})
+
+@holder.route('/credentials/<int:cred_id>', methods=['GET'])
+@token_required
+def get_holder_credential(cred_id):
+    """Returns a single credential of the holder, including the full signed document."""
+    holder_user = g.current_user
+    if holder_user['role'] != 'holder':
+        return jsonify({"error": "Unauthorized"}), 403
+
+    with span("credential_lookup"):
+        credential = get_storage().get_holder_credential(holder_user['user_id'], cred_id)
+    if not credential:
+        return jsonify({"error": "Credential not found or you are not the holder."}), 404
+    return jsonify(decode_rows([credential])[0])
 
 @holder.route('/create_presentation', methods=['POST'])
 @async_token_required
 async def create_presentation():
+    """
+    Builds a presentation disclosing only the fields named in disclosure_frame.
+    JSON-LD credentials are reduced and re-signed by the holder. SD-JWT credentials
+    keep the issuer's signature: the presentation just omits the other disclosures
+    and is returned as {"format": "vc+sd-jwt", "presentation": ...}. An optional
+    "key_binding": {"nonce": ..., "aud": ...} appends a holder-signed key-binding JWT.
+    """
     holder_user = g.current_user
-    data = request.get_json()
+    data = await request.get_json()
     cred_id = data.get('cred_id')
     disclosure_frame = data.get('disclosure_frame')  # Should be a dict like: {"credentialSubject": ["name", "birthDate"]}
 
     if not cred_id or not disclosure_frame:
         return jsonify({"error": "cred_id and disclosure_frame are required"}), 400
 
-    db = get_db()
     try:
-        cursor = db.cursor(dictionary=True)
-
-        # Fetch credential and private key
-        query = """
-            SELECT c.credential_data, u.private_key 
-            FROM Credentials c
-            JOIN Users u ON c.holder_id = u.user_id
-            WHERE c.cred_id = %s AND c.holder_id = %s
-        """
-        cursor.execute(query, (cred_id, holder_user['user_id']))
-        record = cursor.fetchone()
-        cursor.close()
+        # Fetch credential; the holder's key material comes from the key cache
+        with span("credential_lookup"):
+            record = await async_db.run_sync(get_storage().get_holder_credential, holder_user['user_id'], cred_id)
 
         if not record:
             return jsonify({"error": "Credential not found or you are not the holder."}), 403
-        
-        if not record.get('private_key'):
+
+        if record['category'] == sd_jwt.CATEGORY:
+            # Selective disclosure without a new signature; only key binding needs the holder's key
+            presentation = sd_jwt.present(decode_document(record['credential_data']), disclosure_frame.get("credentialSubject", []))
+            key_binding = data.get('key_binding')
+            if key_binding:
+                if not isinstance(key_binding, dict) or not key_binding.get('nonce') or not key_binding.get('aud'):
+                    return jsonify({"error": "key_binding requires a nonce and an aud"}), 400
+                with span("key_material"):
+                    holder_key = await get_key_material(holder_user['user_id'])
+                if not holder_key:
+                    return jsonify({"error": "Holder's private key not found. Cannot sign key binding."}), 500
+                presentation = await sd_jwt.bind_key(presentation, holder_key, key_binding['nonce'], key_binding['aud'])
+            return jsonify({"format": sd_jwt.FORMAT, "presentation": presentation})
+
+        with span("key_material"):
+            holder_key = await get_key_material(holder_user['user_id'])
+        if not holder_key:
             return jsonify({"error": "Holder's private key not found. Cannot sign presentation."}), 500
 
-        original_vc = json.loads(record['credential_data'])
-        holder_jwk_str = record['private_key']
+        original_vc = loads(decode_document(record['credential_data']))
+        holder_jwk_str = holder_key.jwk
 
         # --- Manual Disclosure Frame Application ---
         def apply_disclosure(vc, frame):
@@ -73,6 +139,9 @@ async def create_presentation():
                 "credentialSubject": {},
                 "id": vc.get("id")
             }
+            # Keep the status entry so verifiers can still check revocation
+            if vc.get("credentialStatus"):
+                disclosed["credentialStatus"] = vc["credentialStatus"]
 
             requested_fields = frame.get("credentialSubject", [])
             for field in requested_fields:
@@ -90,22 +159,23 @@ async def create_presentation():
             "verifiableCredential": [framed_vc]
         }
 
-        # Generate verification method and proof options
-        verification_method = await didkit.key_to_verification_method("key", holder_jwk_str)
         proof_options = {
             "proofPurpose": "authentication",
-            "verificationMethod": verification_method
+            "verificationMethod": holder_key.verification_method
         }
 
         # Sign the presentation
-        presentation_str = await didkit.issue_presentation(
-            json.dumps(presentation_payload),
-            json.dumps(proof_options),
-            holder_jwk_str
-        )
+        with span("sign_presentation"):
+            presentation_str = await get_crypto_pool().issue_presentation(
+                dumps(presentation_payload),
+                dumps(proof_options),
+                holder_jwk_str
+            )
 
-        return jsonify(json.loads(presentation_str)), 200
+        return json_response(presentation_str)
 
+    except CryptoUnavailable:
+        raise
     except Exception as e:
         print(f"Error creating presentation: {e}")
         import traceback
@@ -120,12 +190,13 @@ async def upload_document():
     Prevents duplicates across all users.
     """
     holder_user = g.current_user
-    payload = request.get_json()
+    payload = await request.get_json()
 
     if not payload or not isinstance(payload, dict):
         return jsonify({"error": "Invalid JSON payload"}), 400
 
-    payload_str = json.dumps(payload)
+    # The body parsed, so didkit can be handed the original bytes instead of a re-encoding
+    raw_body = await request.get_data(as_text=True)
     doc_type_list = payload.get("type", [])
     category = None
     
@@ -133,32 +204,32 @@ async def upload_document():
     try:
         if "VerifiablePresentation" in doc_type_list:
             category = 'VP'
-            result_str = await didkit.verify_presentation(payload_str, "{}")
+            with span("didkit_verify"):
+                result_str = await get_crypto_pool().verify_presentation(raw_body, "{}")
         elif "VerifiableCredential" in doc_type_list:
             category = 'VC'
-            result_str = await didkit.verify_credential(payload_str, "{}")
+            with span("didkit_verify"):
+                result_str = await get_crypto_pool().verify_credential(raw_body, "{}")
         else:
             return jsonify({"error": "Document is not a valid VC or VP. The 'type' field is missing or invalid."}), 400
 
-        verification_result = json.loads(result_str)
+        verification_result = loads(result_str)
         if verification_result.get("errors"):
             return jsonify({"error": f"The provided {category} is not valid.", "details": verification_result["errors"]}), 400
             
+    except CryptoUnavailable:
+        raise
     except Exception as e:
         return jsonify({"error": f"Error during cryptographic verification: {str(e)}"}), 500
 
     # 2. If valid, proceed with database operations
-    db = get_db()
-    cursor = db.cursor()
     try:
-        # Generate a hash of the entire document for duplicate checking
+        # Generate a hash of the entire document for duplicate checking.
+        # uq_credentials_hash rejects a document that already exists anywhere in the system.
+        # The stdlib encoding is kept here: it is the stored form and existing hashes depend on it.
+        payload_str = json.dumps(payload)
         credential_hash = hashlib.sha256(payload_str.encode('utf-8')).hexdigest()
 
-        # Check if this exact document hash already exists anywhere in the system
-        cursor.execute("SELECT cred_id FROM Credentials WHERE credential_hash = %s", (credential_hash,))
-        if cursor.fetchone():
-            return jsonify({"error": "This document has already been imported into the system."}), 409
-
         # Use a placeholder ID for externally imported documents
         external_issuer_id = 1 # IMPORTANT: Ensure a user with ID=1 exists and is an issuer
 
@@ -170,30 +241,16 @@ async def upload_document():
             title = doc_type_list[-1]
 
         # 3. Insert the new record with all correct columns
-        query = """
-            INSERT INTO Credentials 
-            (issuer_id, holder_id, category, credential_hash, credential_data, title, status) 
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-        """
-        cursor.execute(query, (
-            external_issuer_id, 
-            holder_id, 
-            category, 
-            credential_hash, 
-            payload_str, 
-            title, 
-            'active'
-        ))
-        
-        db.commit()
+        row = (external_issuer_id, holder_id, category, credential_hash, title, 'active', payload_str, None)
+        with span("db_insert"):
+            duplicates = await async_db.run_sync(insert_credentials, [row], {holder_id: holder_user['email']})
+        if duplicates:
+            return jsonify({"error": "This document has already been imported into the system."}), 409
 
         return jsonify({"message": f"{category} successfully imported."}), 201
 
-    except mysql.connector.Error as err:
-        db.rollback()
-        # This handles the UNIQUE KEY constraint on (holder_id, credential_hash)
-        if err.errno == 1062:
-             return jsonify({"error": "This exact document has already been imported by you."}), 409
+    except DuplicateError:
+        # insert_credentials reports unique key violations itself; this is a last resort
+        return jsonify({"error": "This document has already been imported into the system."}), 409
+    except StorageError as err:
         return jsonify({"error": f"Database error: {str(err)}"}), 500
-    finally:
-        cursor.close()
@@ -1,117 +1,358 @@
+import asyncio
 import hashlib
-import json
-import didkit
-from flask import Blueprint, request, jsonify, g
-import mysql.connector
+from quart import Blueprint, request, jsonify, g, current_app, Response
 import uuid
 from datetime import datetime, date 
-from app.database import get_db
+from app import async_db
+from app.json_provider import dumps, json_response, loads
+from app.metrics import span
+from app.storage import get_storage, StorageError, DuplicateError
+from app.utils.credential_codec import decode_document
+from app.utils.credentials import insert_credentials
+from app.utils.crypto_pool import CryptoUnavailable, get_crypto_pool
+from app.utils.issuer_stats import get_issuer_stats
+from app.utils.keys import get_key_material
+from app.utils import issuance_jobs, sd_jwt
+from app.utils.status_list import (
+    STATUS_LIST_CONTEXT, StatusListFull, allocate_indexes, build_status_list_credential,
+    credential_status_entry, get_status_list, status_list_cache
+)
+from app.utils.verification_cache import verification_cache
 from .auth_routes import async_token_required, token_required
 
 issuer = Blueprint('issuer', __name__)
 
+# --- Issuance Helpers (shared by the single and batch endpoints) ---
+def validate_credential_request(data):
+    """Returns an error message if the credential subject data is invalid, otherwise None."""
+    required_fields = ["holder_email", "name", "course", "grade", "completionDate"]
+    if not isinstance(data, dict) or not all(field in data and data[field] for field in required_fields):
+        return f"Missing required fields. Required: {', '.join(required_fields)}"
+    # Values are hashed, used as lookup keys and embedded in the credential: only strings are accepted
+    invalid = [field for field in required_fields + ["university"] if field in data and not isinstance(data[field], str)]
+    if invalid:
+        return f"Fields must be strings: {', '.join(invalid)}"
+
+    # Server-side Date Validation
+    try:
+        completion_date = date.fromisoformat(data["completionDate"])
+        if completion_date > date.today():
+            return "Completion date cannot be in the future."
+    except (ValueError, TypeError):
+        return "Invalid date format for completionDate. Use YYYY-MM-DD."
+    return None
+
+CREDENTIAL_FORMATS = ("ldp_vc", sd_jwt.FORMAT)
+
+def credential_fingerprint(issuer_id, holder_id, data, credential_format="ldp_vc"):
+    """Unique content hash used to prevent issuing the same credential twice (per format)."""
+    fingerprint_str = f"{issuer_id}:{holder_id}:{data['course']}:{data['grade']}:{data['completionDate']}"
+    if credential_format != "ldp_vc":
+        fingerprint_str += f":{credential_format}"
+    return hashlib.sha256(fingerprint_str.encode('utf-8')).hexdigest()
+
+def build_vc_payload(issuer_did, holder_id, data, credential_status=None):
+    vc_payload = {
+        "@context": ["https://www.w3.org/2018/credentials/v1", STATUS_LIST_CONTEXT, {"name": "https://schema.org/name", "university": "https://schema.org/CollegeOrUniversity", "course": "https://schema.org/Course", "grade": "https://schema.org/grade", "completionDate": "https://schema.org/endDate"}],
+        "id": f"urn:uuid:{uuid.uuid4()}",
+        "type": ["VerifiableCredential", data.get("course", "AcademicCredential").replace(" ", "")],
+        "issuer": issuer_did,
+        "issuanceDate": datetime.utcnow().isoformat() + "Z",
+        "credentialSubject": {
+            "id": f"did:example:holder:{holder_id}",
+            "name": data.get("name"),
+            "university": data.get("university", "Universidade de Aveiro"),
+            "course": data.get("course"),
+            "grade": data.get("grade"),
+            "completionDate": data.get("completionDate")
+        }
+    }
+    if credential_status:
+        vc_payload["credentialStatus"] = credential_status
+    return vc_payload
+
+async def sign_credential(vc_payload, issuer_key):
+    """Signs a VC payload with the issuer's key and returns the signed VC string."""
+    proof_options = {"proofPurpose": "assertionMethod", "verificationMethod": issuer_key.verification_method}
+    with span("sign"):
+        return await get_crypto_pool().issue_credential(dumps(vc_payload), dumps(proof_options), issuer_key.jwk)
+
+class IssuanceRejected(Exception):
+    """A credential request that cannot be issued as sent; retrying it won't help."""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+async def issue_credential(issuer_id, data):
+    """
+    Validates, signs and stores one credential and returns the signed credential
+    string. Raises IssuanceRejected (with the HTTP status to answer) for requests
+    that cannot be issued; storage and signing errors propagate. Used by issue_vc
+    and by the issuance job workers (see utils/issuance_jobs.py).
+    """
+    # 1. Required fields, server-side date validation and format
+    validation_error = validate_credential_request(data)
+    if validation_error:
+        raise IssuanceRejected(validation_error)
+    credential_format = data.get("format", "ldp_vc")
+    if credential_format not in CREDENTIAL_FORMATS:
+        raise IssuanceRejected(f"Unsupported format. Use one of: {', '.join(CREDENTIAL_FORMATS)}")
+
+    # 2. Get Holder's Info (database I/O is awaited on the DB executor)
+    with span("holder_lookup"):
+        holders = await async_db.run_sync(get_storage().find_holders, [data['holder_email']])
+    if not holders:
+        raise IssuanceRejected(f"Holder with email '{data['holder_email']}' not found.", 404)
+    holder_id = next(iter(holders.values()))
+
+    # 3. PREVENT DUPLICATES: a unique content hash, enforced by uq_credentials_hash on insert
+    credential_hash = credential_fingerprint(issuer_id, holder_id, data, credential_format)
+
+    # 4. Get Issuer's Key, DID and verification method (cached per issuer)
+    with span("key_material"):
+        issuer_key = await get_key_material(issuer_id)
+    if not issuer_key:
+        raise IssuanceRejected("Issuer's cryptographic key not found.", 500)
+
+    # 5. Construct the VC Payload with its revocation status list entry
+    with span("status_allocate"):
+        status_index = await async_db.run_sync(allocate_indexes, issuer_id)
+    vc_payload = build_vc_payload(issuer_key.did, holder_id, data, credential_status_entry(issuer_id, status_index))
+
+    # 6. Sign the Credential with DIDKit
+    if credential_format == sd_jwt.FORMAT:
+        # Bind the credential to the holder's DID so presentations can carry a key-binding JWT
+        with span("key_material"):
+            holder_key = await get_key_material(holder_id)
+        if holder_key:
+            vc_payload["credentialSubject"]["id"] = holder_key.did
+        signed_vc_str = await sd_jwt.issue(vc_payload, issuer_key)
+        category = sd_jwt.CATEGORY
+    else:
+        signed_vc_str = await sign_credential(vc_payload, issuer_key)
+        category = "VC"
+
+    # 7. Store in Database using the pre-calculated hash (updates the issuer stats in the same transaction)
+    vc_type = vc_payload["type"][-1]
+    row = (issuer_id, holder_id, category, credential_hash, vc_type, "active", signed_vc_str, status_index)
+    with span("db_insert"):
+        duplicates = await async_db.run_sync(insert_credentials, [row], {holder_id: data['holder_email']})
+    if duplicates:
+        raise IssuanceRejected("This exact credential has already been issued to this holder.", 409)
+    return signed_vc_str
+
+def wants_async():
+    """True if the client asked for the request to be queued (?async=true or Prefer: respond-async)."""
+    return request.args.get('async', '').lower() == 'true' or 'respond-async' in request.headers.get('Prefer', '')
+
 @issuer.route('/issue_vc', methods=['POST'])
 @async_token_required # Protect this route
 async def issue_vc():
     """
     Issues a new Verifiable Credential to a holder, with validation and duplicate prevention.
+    "format" selects "ldp_vc" (default, JSON-LD with an embedded proof) or "vc+sd-jwt"
+    (selectively disclosable claims bound to the holder's DID, see utils/sd_jwt.py).
+
+    With ?async=true (or `Prefer: respond-async`) the subject, or a
+    {"credentials": [...]} list of them, is queued as an issuance job instead and
+    the response is 202 with the job id; progress is at /api/issuer/jobs/<job_id>.
     """
-    # 1. Authorization & Initial Data Validation
+    # 1. Authorization
     issuer_user = g.current_user
     if issuer_user['role'] != 'issuer':
         return jsonify({"error": "Only issuers can issue credentials"}), 403
-    
-    data = request.get_json()
-    required_fields = ["holder_email", "name", "course", "grade", "completionDate"]
-    if not all(field in data and data[field] for field in required_fields):
-        return jsonify({"error": f"Missing required fields. Required: {', '.join(required_fields)}"}), 400
 
-    # 2. Server-side Date Validation
-    try:
-        completion_date = date.fromisoformat(data["completionDate"])
-        if completion_date > date.today():
-            return jsonify({"error": "Completion date cannot be in the future."}), 400
-    except (ValueError, TypeError):
-        return jsonify({"error": "Invalid date format for completionDate. Use YYYY-MM-DD."}), 400
+    data = await request.get_json()
+    if wants_async():
+        return await enqueue_issuance(issuer_user['user_id'], data)
 
-    db = None
-    cursor = None
     try:
-        # 3. Establish Database Connection
-        db = get_db()
-        cursor = db.cursor(dictionary=True)
-
-        # 4. Get Holder's Info
-        cursor.execute("SELECT user_id FROM Users WHERE email = %s AND role = 'holder'", (data['holder_email'],))
-        holder = cursor.fetchone()
-        if not holder:
-            return jsonify({"error": f"Holder with email '{data['holder_email']}' not found."}), 404
-        holder_id = holder['user_id']
-        
-        # 5. PREVENT DUPLICATES: Create and check a unique content hash
-        fingerprint_str = f"{issuer_user['user_id']}:{holder_id}:{data['course']}:{data['grade']}:{data['completionDate']}"
-        credential_hash = hashlib.sha256(fingerprint_str.encode('utf-8')).hexdigest()
-        
-        cursor.execute("SELECT cred_id FROM Credentials WHERE holder_id = %s AND credential_hash = %s", (holder_id, credential_hash))
-        if cursor.fetchone():
-            return jsonify({"error": "This exact credential has already been issued to this holder."}), 409
-
-        # 6. Get Issuer's Key (must be done before closing cursor if not making new ones)
-        cursor.execute("SELECT private_key FROM Users WHERE user_id = %s", (issuer_user['user_id'],))
-        issuer_data = cursor.fetchone()
-        if not issuer_data or not issuer_data['private_key']:
-            return jsonify({"error": "Issuer's cryptographic key not found."}), 500
-        issuer_jwk_str = issuer_data['private_key']
+        # 2. Validate, sign and store
+        signed_vc_str = await issue_credential(issuer_user['user_id'], data)
 
-        # --- DB operations are done, we can now use await ---
-        
-        # 7. Perform DIDKit Operations
-        issuer_did = didkit.key_to_did("key", issuer_jwk_str)
-        verification_method = await didkit.key_to_verification_method("key", issuer_jwk_str)
-
-        # 8. Construct the VC Payload
-        vc_payload = {
-            "@context": ["https://www.w3.org/2018/credentials/v1", {"name": "https://schema.org/name", "university": "https://schema.org/CollegeOrUniversity", "course": "https://schema.org/Course", "grade": "https://schema.org/grade", "completionDate": "https://schema.org/endDate"}],
-            "id": f"urn:uuid:{uuid.uuid4()}",
-            "type": ["VerifiableCredential", data.get("course", "AcademicCredential").replace(" ", "")],
-            "issuer": issuer_did,
-            "issuanceDate": datetime.utcnow().isoformat() + "Z",
-            "credentialSubject": {
-                "id": f"did:example:holder:{holder_id}",
-                "name": data.get("name"),
-                "university": data.get("university", "Universidade de Aveiro"),
-                "course": data.get("course"),
-                "grade": data.get("grade"),
-                "completionDate": data.get("completionDate")
-            }
-        }
-        proof_options = {"proofPurpose": "assertionMethod", "verificationMethod": verification_method}
+        if data.get("format") == sd_jwt.FORMAT:
+            return jsonify({"format": sd_jwt.FORMAT, "credential": signed_vc_str}), 201
+        # didkit's output is already the JSON document: send it as is
+        return json_response(signed_vc_str, 201)
 
-        # 9. Sign the Credential with DIDKit
-        signed_vc_str = await didkit.issue_credential(json.dumps(vc_payload), json.dumps(proof_options), issuer_jwk_str)
-        
-        # 10. Store in Database using the pre-calculated hash
-        vc_type = vc_payload["type"][-1]
-        insert_query = "INSERT INTO Credentials (issuer_id, holder_id, credential_hash, title, status, credential_data) VALUES (%s, %s, %s, %s, %s, %s)"
-        cursor.execute(insert_query, (issuer_user['user_id'], holder_id, credential_hash, vc_type, "active", signed_vc_str))
-        db.commit()
-
-        return jsonify(json.loads(signed_vc_str)), 201
-
-    except mysql.connector.Error as err:
-        if db: db.rollback()
-        if err.errno == 1062:
-            return jsonify({"error": "This credential has already been issued (database constraint)."}), 409
+    except IssuanceRejected as e:
+        return jsonify({"error": str(e)}), e.status_code
+    except StatusListFull as e:
+        return jsonify({"error": str(e)}), 500
+    except DuplicateError:
+        return jsonify({"error": "This credential has already been issued (database constraint)."}), 409
+    except StorageError as err:
         print(f"Database error in issue_vc: {err}")
         return jsonify({"error": "A database error occurred."}), 500
+    except CryptoUnavailable:
+        raise
     except Exception as e:
-        if db: db.rollback()
         print(f"Generic error in issue_vc: {e}")
         return jsonify({"error": f"An unexpected error occurred: {str(e)}"}), 500
-    finally:
-        # This 'finally' block ensures the cursor is always closed.
-        if cursor:
-            cursor.close()
+
+
+# --- Asynchronous Issuance ---
+async def enqueue_issuance(issuer_id, data):
+    """Queues one subject or a {"credentials": [...]} list as an issuance job and answers 202."""
+    items = data.get("credentials") if isinstance(data, dict) and "credentials" in data else [data]
+    if not isinstance(items, list) or not items or not all(isinstance(item, dict) for item in items):
+        return jsonify({"error": "Expected a credential subject or 'credentials': a non-empty list of them."}), 400
+    max_items = current_app.config["ISSUE_JOB_MAX_ITEMS"]
+    if len(items) > max_items:
+        return jsonify({"error": f"A job may contain at most {max_items} credentials."}), 413
+
+    try:
+        job_id = await issuance_jobs.enqueue(issuer_id, items)
+    except StorageError as err:
+        print(f"Database error in enqueue_issuance: {err}")
+        return jsonify({"error": "A database error occurred. The job was not queued."}), 500
+
+    status_url = f"/api/issuer/jobs/{job_id}"
+    response = jsonify({"job_id": job_id, "status": "queued", "total": len(items), "status_url": status_url})
+    response.headers["Location"] = status_url
+    return response, 202
+
+@issuer.route('/jobs/<int:job_id>', methods=['GET'])
+@token_required
+def get_issuance_job(job_id):
+    """Reports the progress of one of the issuer's jobs, overall and per item."""
+    issuer_user = g.current_user
+    if issuer_user['role'] != 'issuer':
+        return jsonify({"error": "Access denied. Issuer role required."}), 403
+
+    try:
+        storage = get_storage()
+        job = storage.get_issuance_job(job_id)
+        if not job or job['issuer_id'] != issuer_user['user_id']:
+            return jsonify({"error": "Job not found."}), 404
+        items = storage.list_issuance_items(job_id)
+    except StorageError as err:
+        return jsonify({"error": f"Database error: {str(err)}"}), 500
+    return jsonify(issuance_jobs.job_status(job, items))
+
+
+@issuer.route('/issue_vc_batch', methods=['POST'])
+@async_token_required
+async def issue_vc_batch():
+    """
+    Issues a list of Verifiable Credentials in one request. Holders and duplicate
+    fingerprints are resolved with one query each, signing runs concurrently and
+    all new credentials are inserted in a single transaction.
+    Returns one result per item: created, duplicate or error.
+    """
+    # 1. Authorization & Initial Data Validation
+    issuer_user = g.current_user
+    if issuer_user['role'] != 'issuer':
+        return jsonify({"error": "Only issuers can issue credentials"}), 403
+
+    data = await request.get_json()
+    items = data.get("credentials") if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "'credentials' must be a non-empty list of credential subjects."}), 400
+    max_items = current_app.config["ISSUE_BATCH_MAX_ITEMS"]
+    if len(items) > max_items:
+        return jsonify({"error": f"A batch may contain at most {max_items} credentials."}), 413
+
+    results = [None] * len(items)
+    pending = []
+    for index, item in enumerate(items):
+        validation_error = validate_credential_request(item)
+        if validation_error:
+            results[index] = {"index": index, "status": "error", "error": validation_error}
+        else:
+            pending.append(index)
+
+    try:
+        # 2. Get the Issuer's Key once for the whole batch
+        with span("key_material"):
+            issuer_key = await get_key_material(issuer_user['user_id'])
+        if not issuer_key:
+            return jsonify({"error": "Issuer's cryptographic key not found."}), 500
+
+        # 3. Resolve all holders with one query
+        emails = sorted({items[i]['holder_email'] for i in pending})
+        with span("holder_lookup"):
+            holder_ids = await async_db.run_sync(get_storage().find_holders, emails)
+        # MariaDB compares emails case-insensitively: match the rows back the same way
+        holder_ids_by_email = {email.lower(): holder_id for email, holder_id in holder_ids.items()}
+
+        # 4. Fingerprint everything and check for duplicates with one query.
+        #    The unique key would catch them on insert too, but this avoids signing them.
+        hashes = {}
+        for index in list(pending):
+            item = items[index]
+            holder_id = holder_ids_by_email.get(item['holder_email'].lower())
+            if holder_id is None:
+                results[index] = {"index": index, "status": "error", "error": f"Holder with email '{item['holder_email']}' not found."}
+                pending.remove(index)
+                continue
+            hashes[index] = (holder_id, credential_fingerprint(issuer_user['user_id'], holder_id, item))
+
+        unique_hashes = sorted({h for _, h in hashes.values()})
+        with span("dedup_check"):
+            existing = await async_db.run_sync(get_storage().existing_credential_hashes, unique_hashes)
+
+        seen = set()
+        for index in list(pending):
+            credential_hash = hashes[index][1]
+            if credential_hash in existing or credential_hash in seen:
+                results[index] = {"index": index, "status": "duplicate", "error": "This exact credential has already been issued to this holder."}
+                pending.remove(index)
+            seen.add(credential_hash)
+
+        # 5. Reserve status list positions for the whole batch, then sign concurrently with bounded parallelism
+        with span("status_allocate"):
+            first_index = await async_db.run_sync(allocate_indexes, issuer_user['user_id'], len(pending)) if pending else 0
+        status_indexes = {index: first_index + offset for offset, index in enumerate(pending)}
+        semaphore = asyncio.Semaphore(current_app.config["ISSUE_BATCH_CONCURRENCY"])
+
+        async def sign_one(index):
+            async with semaphore:
+                credential_status = credential_status_entry(issuer_user['user_id'], status_indexes[index])
+                vc_payload = build_vc_payload(issuer_key.did, hashes[index][0], items[index], credential_status)
+                return vc_payload, await sign_credential(vc_payload, issuer_key)
+
+        signed = await asyncio.gather(*(sign_one(i) for i in pending), return_exceptions=True)
+
+        # 6. Insert every signed credential in one transaction
+        rows = []
+        signed_by_index = {}
+        for index, outcome in zip(pending, signed):
+            if isinstance(outcome, Exception):
+                results[index] = {"index": index, "status": "error", "error": f"Signing failed: {str(outcome)}"}
+                continue
+            vc_payload, signed_vc_str = outcome
+            holder_id, credential_hash = hashes[index]
+            rows.append((issuer_user['user_id'], holder_id, "VC", credential_hash, vc_payload["type"][-1], "active", signed_vc_str, status_indexes[index]))
+            signed_by_index[index] = signed_vc_str
+
+        holder_emails = {holder_id: email for email, holder_id in holder_ids.items()}
+        with span("db_insert"):
+            duplicates = await async_db.run_sync(insert_credentials, rows, holder_emails) if rows else set()
+
+        for index, signed_vc_str in signed_by_index.items():
+            if hashes[index][1] in duplicates:
+                results[index] = {"index": index, "status": "duplicate", "error": "This credential has already been issued (database constraint)."}
+            else:
+                results[index] = {"index": index, "status": "created"}
+
+    except StatusListFull as e:
+        return jsonify({"error": str(e)}), 500
+    except StorageError as err:
+        print(f"Database error in issue_vc_batch: {err}")
+        return jsonify({"error": "A database error occurred. No credentials from this batch were stored."}), 500
+
+    summary = {status: sum(1 for r in results if r["status"] == status) for status in ("created", "duplicate", "error")}
+
+    # Splice the signed documents into the response as they came from didkit instead of re-encoding them
+    parts = []
+    for result in results:
+        encoded = dumps(result)
+        if result["status"] == "created":
+            encoded = encoded[:-1] + ',"credential":' + signed_by_index[result["index"]] + "}"
+        parts.append(encoded)
+    return json_response('{"summary":' + dumps(summary) + ',"results":[' + ",".join(parts) + "]}")
 
 
 @issuer.route('/dashboard_data', methods=['GET'])
@@ -132,42 +373,13 @@ def get_issuer_dashboard_data():
         "recent_activity": []
     }
 
-    db = get_db()
-    cursor = db.cursor(dictionary=True)
     try:
-        # 2. Query for "Credentials Issued" stat
-        cursor.execute("SELECT COUNT(*) as total_issued FROM Credentials WHERE issuer_id = %s", (issuer_id,))
-        total_issued = cursor.fetchone()['total_issued']
-        dashboard_data['stats']['credentials_issued'] = total_issued
-
-        # 3. Query for "Active Students" stat (unique holders)
-        cursor.execute("SELECT COUNT(DISTINCT holder_id) as unique_holders FROM Credentials WHERE issuer_id = %s", (issuer_id,))
-        unique_holders = cursor.fetchone()['unique_holders']
-        dashboard_data['stats']['active_students'] = unique_holders
-
-        # 4. --- REPLACEMENT --- Query for "Revoked Credentials" stat
-        # This is a real, valuable metric derived from your schema.
-        query_revoked = """
-            SELECT COUNT(r.revoc_id) as total_revoked
-            FROM Revocations r
-            JOIN Credentials c ON r.cred_id = c.cred_id
-            WHERE c.issuer_id = %s
-        """
-        cursor.execute(query_revoked, (issuer_id,))
-        total_revoked = cursor.fetchone()['total_revoked']
-        dashboard_data['stats']['revoked_credentials'] = total_revoked
-
-        # 5. Query for "Recent Activity"
-        query_activity = """
-            SELECT c.title, c.issued_at, u.email as holder_email
-            FROM Credentials c
-            JOIN Users u ON c.holder_id = u.user_id
-            WHERE c.issuer_id = %s
-            ORDER BY c.issued_at DESC
-            LIMIT 5
-        """
-        cursor.execute(query_activity, (issuer_id,))
-        recent_activity_raw = cursor.fetchall()
+        # 2. Counters and recent activity are maintained incrementally (see utils/issuer_stats.py)
+        with span("db_stats"):
+            stats, recent_activity_raw = get_issuer_stats(issuer_id)
+        dashboard_data['stats']['credentials_issued'] = stats['credentials_issued']
+        dashboard_data['stats']['active_students'] = stats['active_students']
+        dashboard_data['stats']['revoked_credentials'] = stats['revoked_credentials']
         
         dashboard_data['recent_activity'] = [
             f"Issued \"{act['title']}\" to {act['holder_email']}" for act in recent_activity_raw
@@ -175,7 +387,90 @@ def get_issuer_dashboard_data():
 
         return jsonify(dashboard_data), 200
 
-    except mysql.connector.Error as err:
+    except StorageError as err:
         return jsonify({"error": f"Database error: {str(err)}"}), 500
-    finally:
-        cursor.close()
+
+
+# --- Revocation ---
+@issuer.route('/revoke', methods=['POST'])
+@async_token_required
+async def revoke_vc():
+    """
+    Revokes a credential issued by the logged-in issuer and flips its bit in the
+    issuer's status list.
+    """
+    issuer_user = g.current_user
+    if issuer_user['role'] != 'issuer':
+        return jsonify({"error": "Only issuers can revoke credentials"}), 403
+
+    data = await request.get_json()
+    cred_id = data.get('cred_id') if isinstance(data, dict) else None
+    if not cred_id:
+        return jsonify({"error": "cred_id is required"}), 400
+    if not isinstance(cred_id, int) or isinstance(cred_id, bool) or cred_id < 1:
+        return jsonify({"error": "cred_id must be a positive integer"}), 400
+
+    try:
+        with span("db_revoke"):
+            credential, revision = await async_db.run_sync(
+                get_storage().revoke_credential, issuer_user['user_id'], cred_id, current_app.config["STATUS_LIST_SIZE"]
+            )
+    except DuplicateError:
+        return jsonify({"error": "This credential has already been revoked."}), 409
+    except StorageError as err:
+        print(f"Database error in revoke_vc: {err}")
+        return jsonify({"error": "A database error occurred."}), 500
+
+    if credential is None:
+        if revision == "already_revoked":
+            return jsonify({"error": "This credential has already been revoked."}), 409
+        return jsonify({"error": "Credential not found or not issued by you."}), 404
+
+    # Keep this process's in-memory views consistent right away
+    if revision is not None:
+        status_list_cache.revoke(issuer_user['user_id'], credential['status_list_index'], revision)
+    try:
+        document = decode_document(credential['credential_data'])
+        # SD-JWT credentials are stored in their compact form, the others as JSON
+        vc = loads(document) if document.lstrip().startswith("{") else sd_jwt.credential_of(document)
+        credential_id = vc.get('id')
+    except (TypeError, ValueError, AttributeError):
+        credential_id = None
+    if credential_id:
+        verification_cache.evict_credential(credential_id)
+
+    return jsonify({"message": "Credential revoked.", "cred_id": credential['cred_id']}), 200
+
+@issuer.route('/status/<int:issuer_id>', methods=['GET'])
+async def get_status_list_credential(issuer_id):
+    """
+    Serves the issuer's revocation list as a signed StatusList2021Credential.
+    The document is re-signed only when the list revision changes and is
+    ETag-cached by revision. This endpoint does not require authentication.
+    """
+    try:
+        with span("status_list_load"):
+            status_list = await async_db.run_sync(get_status_list, issuer_id)
+    except StorageError as err:
+        print(f"Database error in get_status_list_credential: {err}")
+        return jsonify({"error": "A database error occurred."}), 500
+    if status_list is None:
+        return jsonify({"error": "Status list not found."}), 404
+    bits, revision = status_list
+
+    etag = f"{issuer_id}-{revision}"
+    if etag in request.if_none_match:
+        return Response(status=304, headers={"ETag": f'"{etag}"'})
+
+    document = status_list_cache.get_document(issuer_id, revision)
+    if document is None:
+        issuer_key = await get_key_material(issuer_id)
+        if not issuer_key:
+            return jsonify({"error": "Status list not found."}), 404
+        document = await sign_credential(build_status_list_credential(issuer_id, issuer_key.did, bits), issuer_key)
+        status_list_cache.put_document(issuer_id, revision, document)
+
+    response = Response(document, mimetype="application/json")
+    response.headers["ETag"] = f'"{etag}"'
+    response.headers["Cache-Control"] = f"public, max-age={int(current_app.config['STATUS_LIST_TTL'])}"
+    return response
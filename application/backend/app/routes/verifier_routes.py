@@ -1,44 +1,304 @@
-import didkit
+import asyncio
+import codecs
 import json
-from flask import Blueprint, request, jsonify
+import re
+from quart import Blueprint, request, jsonify, current_app, Request, Response, stream_with_context
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge
+from app.json_provider import dumps, loads
+from app.metrics import span
+from app.utils import sd_jwt
+from app.utils.batch_verify import batch_verifier
+from app.utils.crypto_pool import CryptoUnavailable
+from app.utils.status_list import revoked_entries
+from app.utils.verification_cache import verification_cache
 
 verifier = Blueprint('verifier', __name__)
-    
-@verifier.route('/verify', methods=['POST'])
-async def verify_any():
+
+SD_JWT_MIMETYPES = ("application/vc+sd-jwt", "application/sd-jwt")
+
+class UnsupportedDocument(ValueError):
+    """Raised when a payload is neither a VC nor a VP."""
+
+async def verify_document(payload, payload_str=None, nonce=None, audience=None):
     """
-    Verifies either a Verifiable Credential (VC) or a Verifiable Presentation (VP).
-    It inspects the 'type' field of the JSON payload to decide the verification method.
-    This endpoint does not require authentication.
+    Verifies a parsed VC or VP and returns {"verified": bool, "errors": [...]}.
+    `payload_str` may carry the original serialisation to avoid re-encoding.
+    Results are cached by document digest and identical in-flight checks are collapsed.
+    A string payload is an SD-JWT credential or presentation; its result also carries
+    the disclosed "credential", and `nonce`/`audience` make key binding mandatory.
     """
-    try:
-        payload = request.get_json()
-        if not payload or not isinstance(payload, dict):
-            return jsonify({"error": "Invalid JSON payload provided"}), 400
-
-        # Check the 'type' field to determine if it's a VP or VC
+    if isinstance(payload, str):
+        result = await sd_jwt.verify(payload, nonce, audience)
+        document = result.get("credential", {})
+    else:
         doc_type = payload.get("type", [])
-        payload_str = json.dumps(payload)
-        result_str = None
 
         if "VerifiablePresentation" in doc_type:
             # It's a Verifiable Presentation
-            proof_options = json.dumps({"proofPurpose": "authentication"})
-            result_str = await didkit.verify_presentation(payload_str, proof_options)
+            operation, proof_options = "verify_presentation", {"proofPurpose": "authentication"}
         elif "VerifiableCredential" in doc_type:
             # It's a Verifiable Credential
-            proof_options = json.dumps({"proofPurpose": "assertionMethod"})
-            result_str = await didkit.verify_credential(payload_str, proof_options)
+            operation, proof_options = "verify_credential", {"proofPurpose": "assertionMethod"}
         else:
-            return jsonify({"error": "Payload is not a valid VC or VP. 'type' field is missing or invalid."}), 400
-        
-        result_obj = json.loads(result_str)
-        is_verified = "errors" not in result_obj or len(result_obj["errors"]) == 0
+            raise UnsupportedDocument("Payload is not a valid VC or VP. 'type' field is missing or invalid.")
+
+        async def check():
+            with span("didkit_verify"):
+                result_str = await batch_verifier.verify(operation, payload_str or dumps(payload), dumps(proof_options))
+            result_obj = loads(result_str)
+            is_verified = "errors" not in result_obj or len(result_obj["errors"]) == 0
+            return {"verified": is_verified, "errors": result_obj.get("errors", [])}
 
-        return jsonify({"verified": is_verified, "errors": result_obj.get("errors", [])}), 200
+        result = await verification_cache.get_or_verify(payload, proof_options, check)
+        document = payload
 
+    # Revocation is checked outside the proof cache, against the in-memory status lists
+    if result["verified"]:
+        with span("revocation_check"):
+            revoked = await revoked_entries(document)
+        if revoked:
+            result = {"verified": False, "errors": [f"Credential has been revoked ({entry_id})" for entry_id in revoked]}
+    return result
+
+@verifier.route('/verify', methods=['POST'])
+async def verify_any():
+    """
+    Verifies either a Verifiable Credential (VC) or a Verifiable Presentation (VP).
+    It inspects the 'type' field of the JSON payload to decide the verification method.
+    SD-JWTs are accepted as a JSON string or as an application/vc+sd-jwt body; the
+    `nonce` and `aud` query parameters then require a matching key binding.
+    This endpoint does not require authentication.
+    """
+    try:
+        if request.mimetype in SD_JWT_MIMETYPES:
+            payload = (await request.get_data(as_text=True)).strip()
+        else:
+            payload = await request.get_json()
+        if not payload or not isinstance(payload, (dict, str)):
+            return jsonify({"error": "Invalid JSON payload provided"}), 400
+
+        # The body parsed, so didkit can be handed the original bytes instead of a re-encoding
+        payload_str = await request.get_data(as_text=True) if isinstance(payload, dict) else None
+        result = await verify_document(payload, payload_str, request.args.get('nonce'), request.args.get('aud'))
+        return jsonify(result), 200
+
+    except UnsupportedDocument as e:
+        return jsonify({"error": str(e)}), 400
     except json.JSONDecodeError:
         return jsonify({"error": "Invalid JSON format"}), 400
+    except (CryptoUnavailable, HTTPException):
+        # 503 / the body limit's 413
+        raise
     except Exception as e:
         print(f"Unexpected verification error: {str(e)}")
-        return jsonify({"error": "An internal error occurred during verification."}), 500
\ No newline at end of file
+        return jsonify({"error": "An internal error occurred during verification."}), 500
+
+# --- Bulk Verification ---
+async def _read_chunks(body):
+    """Yields the request body as text without buffering it whole."""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    async for chunk in body:
+        yield decoder.decode(chunk)
+    yield decoder.decode(b'', final=True)
+
+async def iter_ndjson(body, max_document):
+    """Yields the raw text of every non-empty line of an NDJSON body (lines are capped at `max_document` characters)."""
+    buffer = ""
+    async for text in _read_chunks(body):
+        buffer += text
+        # Only the new text can complete a line, so a long line is not split over and over
+        if "\n" not in text:
+            if len(buffer) > max_document:
+                raise json.JSONDecodeError(f"A document is longer than {max_document} characters", "", 0)
+            continue
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            if len(line) > max_document:
+                raise json.JSONDecodeError(f"A document is longer than {max_document} characters", "", 0)
+            if line.strip():
+                yield line
+    if len(buffer) > max_document:
+        raise json.JSONDecodeError(f"A document is longer than {max_document} characters", "", 0)
+    if buffer.strip():
+        yield buffer
+
+JSON_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+async def iter_json_array(body, max_document):
+    """
+    Yields the raw text of each element of a top-level JSON array, incrementally.
+    Elements are capped at `max_document` characters.
+    """
+    decoder = json.JSONDecoder()
+    chunks = _read_chunks(body)
+    buffer, pos = "", 0
+    started = expect_separator = exhausted = False
+    # An incomplete element is decoded again only once the buffer has doubled, so
+    # an element spanning many chunks costs linear rather than quadratic time
+    retry_at = 0
+
+    while True:
+        pos = JSON_WHITESPACE.match(buffer, pos).end()
+        char = buffer[pos:pos + 1]
+        if char and not started:
+            if char != "[":
+                raise json.JSONDecodeError("Expected a JSON array", buffer, pos)
+            pos += 1
+            started = True
+            continue
+        if char == "]":
+            return
+        if char and expect_separator:
+            if char != ",":
+                raise json.JSONDecodeError("Expected ',' or ']' between array elements", buffer, pos)
+            pos += 1
+            expect_separator = False
+            continue
+
+        pending = len(buffer) - pos
+        if char and (exhausted or pending >= min(retry_at, max_document + 1)):
+            try:
+                _, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Element not complete yet: read more below, or fail at EOF.
+                if exhausted:
+                    raise
+                if pending > max_document:
+                    raise json.JSONDecodeError(f"A document is longer than {max_document} characters", "", 0) from None
+                retry_at = 2 * pending
+            else:
+                if end - pos > max_document:
+                    raise json.JSONDecodeError(f"A document is longer than {max_document} characters", "", 0)
+                if not exhausted and char in "-0123456789" and buffer[JSON_WHITESPACE.match(buffer, end).end():][:1] not in (",", "]"):
+                    # A number is only complete once its separator has arrived ("12." may continue as "12.5")
+                    retry_at = pending + 1
+                else:
+                    yield buffer[pos:end]
+                    pos = end
+                    retry_at = 0
+                    expect_separator = True
+                    continue
+
+        if exhausted:
+            raise json.JSONDecodeError("Unterminated JSON array", buffer, pos)
+        try:
+            chunk = await anext(chunks)
+        except StopAsyncIteration:
+            exhausted = True
+            continue
+        buffer, pos = buffer[pos:] + chunk, 0
+
+async def _verify_raw(index, raw):
+    try:
+        payload = loads(raw)
+        if isinstance(payload, str):
+            result = await verify_document(payload)
+            return {"index": index, "id": result.get("credential", {}).get("id"), **result}
+        if not isinstance(payload, dict):
+            return {"index": index, "error": "Document must be a JSON object or an SD-JWT string."}
+        result = await verify_document(payload, raw)
+        return {"index": index, "id": payload.get("id"), **result}
+    except (UnsupportedDocument, CryptoUnavailable, json.JSONDecodeError) as e:
+        return {"index": index, "error": str(e)}
+    except Exception as e:
+        print(f"Unexpected verification error in batch item {index}: {str(e)}")
+        return {"index": index, "error": "An internal error occurred during verification."}
+
+async def verify_stream(documents, concurrency):
+    """
+    Verifies raw documents from an async iterator with at most `concurrency`
+    checks in flight and yields one result dict per document in completion
+    order. Documents are pulled only when a slot frees up, so memory stays flat.
+    """
+    in_flight = set()
+    index = 0
+    exhausted = False
+
+    try:
+        while in_flight or not exhausted:
+            while not exhausted and len(in_flight) < concurrency:
+                try:
+                    raw = await anext(documents)
+                except StopAsyncIteration:
+                    exhausted = True
+                    break
+                except json.JSONDecodeError as e:
+                    exhausted = True
+                    yield {"error": f"Malformed batch body: {str(e)}"}
+                    break
+                except RequestEntityTooLarge:
+                    exhausted = True
+                    yield {"error": "Batch body is larger than VERIFY_BATCH_MAX_BODY allows."}
+                    break
+                in_flight.add(asyncio.ensure_future(_verify_raw(index, raw)))
+                index += 1
+
+            if not in_flight:
+                break
+            done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        # The client went away mid-stream: don't leave checks running.
+        for task in in_flight:
+            task.cancel()
+
+@verifier.route('/verify_batch', methods=['POST'])
+async def verify_batch():
+    """
+    Verifies many VCs/VPs in one request. Accepts a JSON array or an NDJSON body
+    (Content-Type: application/x-ndjson) and streams back one NDJSON result line
+    per document as soon as its verification completes. Each line carries the
+    document's position in the input as 'index'. A document is a VC/VP object or an
+    SD-JWT string.
+    This endpoint does not require authentication.
+    """
+    max_body = current_app.config["VERIFY_BATCH_MAX_BODY"]
+    if max_body and (request.content_length or 0) > max_body:
+        return jsonify({"error": f"Batch body is larger than {max_body} bytes."}), 413
+
+    content_type = (request.mimetype or "").lower()
+    if content_type in ("application/x-ndjson", "application/jsonl", "application/ndjson"):
+        documents = iter_ndjson(request.body, current_app.config["VERIFY_BATCH_MAX_DOCUMENT"])
+    else:
+        documents = iter_json_array(request.body, current_app.config["VERIFY_BATCH_MAX_DOCUMENT"])
+
+    concurrency = current_app.config["VERIFY_BATCH_CONCURRENCY"]
+
+    @stream_with_context
+    async def ndjson_lines():
+        results = verify_stream(documents, concurrency)
+        try:
+            async for result in results:
+                yield dumps(result) + "\n"
+        finally:
+            await results.aclose()
+
+    response = Response(ndjson_lines(), mimetype="application/x-ndjson")
+    # Large batches may take longer to stream than RESPONSE_TIMEOUT allows
+    response.timeout = current_app.config["VERIFY_BATCH_TIMEOUT"]
+    return response
+
+
+class VerifierRequest(Request):
+    """
+    Request class of the app. The body limit is fixed when a request is created,
+    before routing, so the verify_batch limit has to be applied here by path.
+    """
+    batch_path = None
+    batch_max_body = None
+
+    def __init__(self, method, scheme, path, *args, max_content_length=None, **kwargs):
+        if path == self.batch_path:
+            max_content_length = self.batch_max_body
+        super().__init__(method, scheme, path, *args, max_content_length=max_content_length, **kwargs)
+        if path == self.batch_path:
+            # Explicit, so a None limit isn't read back from MAX_CONTENT_LENGTH
+            self.max_content_length = max_content_length
+
+def init_app(app):
+    """Gives /verify_batch its own body limit, VERIFY_BATCH_MAX_BODY. Call after the blueprint is registered."""
+    rule = next(rule for rule in app.url_map.iter_rules() if rule.endpoint == 'verifier.verify_batch')
+    VerifierRequest.batch_path = rule.rule
+    VerifierRequest.batch_max_body = app.config["VERIFY_BATCH_MAX_BODY"]
+    app.request_class = VerifierRequest
@@ -0,0 +1,43 @@
+"""
+Pluggable storage backends. STORAGE_BACKEND selects "mariadb" (default) or
+"sqlite" (embedded, WAL mode, no external service). Backends are imported
+lazily so each one only needs its own driver.
+"""
+import threading
+
+from quart import current_app
+
+from .base import Storage, StorageError, StorageUnavailable, DuplicateError
+
+_storage_lock = threading.Lock()
+
+def create_storage(config):
+    backend = config["STORAGE_BACKEND"]
+    if backend == "mariadb":
+        from .mariadb import MariaDBStorage
+        return MariaDBStorage()
+    if backend == "sqlite":
+        from .sqlite import SQLiteStorage
+        return SQLiteStorage(config["SQLITE_PATH"], pool_size=config["DB_POOL_SIZE"], busy_timeout=config["DB_POOL_TIMEOUT"])
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+
+def get_storage(app=None):
+    """Returns the app's storage backend, creating it on first use."""
+    app = app or current_app._get_current_object()
+    storage = app.extensions.get('storage')
+    if storage is None:
+        with _storage_lock:
+            storage = app.extensions.get('storage')
+            if storage is None:
+                storage = create_storage(app.config)
+                app.extensions['storage'] = storage
+    return storage
+
+def release_storage(e=None):
+    """Returns the connection held by the current application context."""
+    storage = current_app.extensions.get('storage')
+    if storage is not None:
+        storage.release()
+
+def init_app(app):
+    app.teardown_appcontext(release_storage)
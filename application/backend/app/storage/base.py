@@ -0,0 +1,199 @@
+"""
+Storage interface used by the routes and utilities.
+
+A backend owns every query for users, credentials, revocations, status lists,
+issuer statistics and issuance jobs. All methods are blocking; async routes call them through
+async_db.run_sync. Unless stated otherwise each write method is one transaction.
+Backend-specific database errors are raised as StorageError subclasses so
+callers never depend on a particular driver.
+"""
+from abc import ABC, abstractmethod
+
+# Size of the per-issuer recent activity ring (see utils/issuer_stats.py)
+RECENT_ACTIVITY_SIZE = 5
+
+
+class StorageError(Exception):
+    """A backend failed to run a query."""
+
+
+class StorageUnavailable(StorageError):
+    """The backend could not be reached (no connection available)."""
+
+
+class DuplicateError(StorageError):
+    """A write violated a unique constraint."""
+
+
+class Storage(ABC):
+    name = None
+
+    # --- Lifecycle ---
+    @abstractmethod
+    def check_connection(self):
+        """Makes sure a connection is available for this context, raising StorageUnavailable otherwise."""
+
+    @abstractmethod
+    def release(self):
+        """Returns the connection held by the current application context, if any."""
+
+    @abstractmethod
+    def migrate(self):
+        """Creates or upgrades the schema without dropping data. Returns the number of steps applied."""
+
+    @abstractmethod
+    def stats(self):
+        """Connection pool counters for /api/db/pool_stats."""
+
+    @abstractmethod
+    def prewarm(self, connections):
+        """Opens up to `connections` idle connections ahead of traffic. Returns the number opened."""
+
+    # --- Users ---
+    @abstractmethod
+    def get_user(self, user_id):
+        """Returns {user_id, email, role} or None."""
+
+    @abstractmethod
+    def get_user_by_email(self, email):
+        """Returns the full Users row (including the password hash) or None."""
+
+    @abstractmethod
+    def create_user(self, email, password_hash, role, private_key=None):
+        """Inserts a user and returns its user_id. Raises DuplicateError if the email exists."""
+
+    @abstractmethod
+    def update_password(self, user_id, password_hash):
+        """Replaces a user's password hash."""
+
+    @abstractmethod
+    def get_private_key(self, user_id):
+        """Returns the user's JWK string, or None."""
+
+    @abstractmethod
+    def issuers_with_keys(self, limit):
+        """User ids of up to `limit` issuers that have a signing key, for cache warm-up."""
+
+    @abstractmethod
+    def find_holders(self, emails):
+        """Returns {email: user_id} for the holders among `emails`."""
+
+    @abstractmethod
+    def existing_emails(self, emails):
+        """Returns the subset of `emails` that already belong to a user."""
+
+    @abstractmethod
+    def insert_users(self, rows):
+        """
+        Inserts (username, email, password, role, private_key) rows, skipping
+        rows that collide with an existing user. Returns the number inserted.
+        """
+
+    @abstractmethod
+    def users_without_key(self, after_id, limit):
+        """Returns up to `limit` ids of users without a private key, above `after_id`, in id order."""
+
+    @abstractmethod
+    def set_missing_keys(self, updates):
+        """Stores (private_key, user_id) pairs for users that still have no key. Returns the number written."""
+
+    # --- Credentials ---
+    @abstractmethod
+    def insert_credentials(self, rows, holder_emails):
+        """
+        Inserts (issuer_id, holder_id, category, credential_hash, title, status,
+        credential_data, status_list_index) rows and updates the issuer
+        statistics in the same transaction. Returns the set of credential
+        hashes rejected as duplicates. `holder_emails` maps holder_id to email.
+        """
+
+    @abstractmethod
+    def existing_credential_hashes(self, hashes):
+        """Returns the subset of `hashes` already stored."""
+
+    @abstractmethod
+    def list_holder_credentials(self, holder_id, full=True, limit=None, after=None):
+        """
+        Lists a holder's credentials newest first, ordered by (issued_at, cred_id).
+        Without `full` rows are summaries without credential_data. `after` is an
+        (issued_at, cred_id) keyset position.
+        """
+
+    @abstractmethod
+    def get_holder_credential(self, holder_id, cred_id):
+        """Returns the full credential row if `holder_id` holds it, otherwise None."""
+
+    @abstractmethod
+    def revoke_credential(self, issuer_id, cred_id, list_size):
+        """
+        Records a revocation in one transaction: Revocations row, credential
+        status, status list bit and the issuer's revoked counter.
+        Returns (credential, status list revision) or (None, "not_found" / "already_revoked").
+        """
+
+    @abstractmethod
+    def iter_credential_data(self, batch_size):
+        """Yields batches of (cred_id, credential_data) in cred_id order."""
+
+    @abstractmethod
+    def update_credential_data(self, updates):
+        """Stores (credential_data, cred_id) pairs in one transaction."""
+
+    # --- Status lists ---
+    @abstractmethod
+    def allocate_status_indexes(self, issuer_id, count, list_size):
+        """
+        Reserves `count` consecutive positions in the issuer's list and returns
+        the first one, or None (reserving nothing) if the list would overflow.
+        """
+
+    @abstractmethod
+    def load_status_list(self, issuer_id):
+        """Returns (bits or None, revision) for an issuer's list."""
+
+    # --- Issuer statistics ---
+    @abstractmethod
+    def get_issuer_stats(self, issuer_id):
+        """Returns (counters dict, recent activity rows newest first)."""
+
+    @abstractmethod
+    def rebuild_issuer_stats(self):
+        """Recomputes all issuer statistics from Credentials and Revocations. Returns the issuer count."""
+
+    # --- Issuance jobs ---
+    @abstractmethod
+    def create_issuance_job(self, issuer_id, payloads, now):
+        """Queues a job with one item per JSON payload, in one transaction. Returns the job id."""
+
+    @abstractmethod
+    def claim_issuance_items(self, limit, now, lease_expired_before, max_attempts):
+        """
+        Marks up to `limit` items as running and returns them (with the job's
+        issuer_id and their new claimed_at), counting the attempt. Claimable
+        items are queued ones that are due and running ones claimed before
+        `lease_expired_before` with attempts left; running ones past the lease
+        without attempts left are marked "error".
+        """
+
+    @abstractmethod
+    def finish_issuance_item(self, item_id, claimed_at, status, error, now):
+        """
+        Records the final status ("created", "duplicate" or "error") of an item
+        still held under the claim made at `claimed_at`. Returns False, changing
+        nothing, if the lease was lost to another claim.
+        """
+
+    @abstractmethod
+    def retry_issuance_item(self, item_id, claimed_at, error, available_at):
+        """
+        Puts an item held under the claim made at `claimed_at` back in the
+        queue, due at `available_at`. Returns False if the lease was lost.
+        """
+
+    @abstractmethod
+    def get_issuance_job(self, job_id):
+        """Returns the job row or None."""
+
+    @abstractmethod
+    def list_issuance_items(self, job_id):
+        """Returns the items of a job (without payloads) in item_index order."""
@@ -0,0 +1,50 @@
+import mysql.connector
+
+from app.database import close_db, get_db, get_pool, get_pool_stats, migrate_db
+from .base import StorageUnavailable
+from .sql import SQLStorage
+
+
+class MariaDBStorage(SQLStorage):
+    """MariaDB backend on the pooled connection checked out by get_db()."""
+
+    name = "mariadb"
+    driver_errors = (mysql.connector.Error,)
+
+    def _connection(self):
+        try:
+            return get_db()
+        except mysql.connector.Error as err:
+            raise StorageUnavailable(str(err)) from err
+
+    def _is_duplicate(self, err):
+        return getattr(err, 'errno', None) == 1062
+
+    def _upsert_add(self, table, key, columns):
+        names = ", ".join([key] + columns)
+        values = ", ".join(["%s"] * (len(columns) + 1))
+        updates = ", ".join(f"{column} = {column} + VALUES({column})" for column in columns)
+        return f"INSERT INTO {table} ({names}) VALUES ({values}) ON DUPLICATE KEY UPDATE {updates}"
+
+    def release(self):
+        close_db()
+
+    def migrate(self):
+        return migrate_db()
+
+    def stats(self):
+        return get_pool_stats()
+
+    def prewarm(self, connections):
+        try:
+            return get_pool().prewarm(connections)
+        except mysql.connector.Error as err:
+            raise StorageUnavailable(str(err)) from err
+
+    def _reserve_indexes(self, cursor, issuer_id, count):
+        cursor.execute("""
+            INSERT INTO StatusLists (issuer_id, next_index) VALUES (%s, LAST_INSERT_ID(%s))
+            ON DUPLICATE KEY UPDATE next_index = LAST_INSERT_ID(next_index + %s)
+        """, (issuer_id, count, count))
+        cursor.execute("SELECT LAST_INSERT_ID()")
+        return cursor.fetchone()[0]
@@ -0,0 +1,491 @@
+"""
+Shared SQL implementation of the storage interface.
+
+Queries are written once with %s placeholders. Subclasses supply connections,
+error translation and the few statements whose syntax differs between
+dialects (insert-or-ignore, counter upserts, row locks, index allocation).
+"""
+from abc import abstractmethod
+from contextlib import contextmanager
+
+from app.metrics import record_query
+from app.utils.status_list import set_bit
+from .base import Storage, StorageError, DuplicateError, RECENT_ACTIVITY_SIZE
+
+CREDENTIAL_SUMMARY_COLUMNS = "cred_id, issuer_id, holder_id, category, credential_hash, title, status, issued_at"
+
+INSERT_CREDENTIAL_QUERY = """
+    INSERT INTO Credentials
+    (issuer_id, holder_id, category, credential_hash, title, status, credential_data, status_list_index)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+
+class _ListOverflow(Exception):
+    """Aborts an index reservation that would run past the end of a status list."""
+
+
+class _CountingCursor:
+    """Cursor proxy that reports every statement to the request metrics."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, params=()):
+        record_query()
+        return self._cursor.execute(query, params)
+
+    def executemany(self, query, rows):
+        record_query()
+        return self._cursor.executemany(query, rows)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def _placeholders(values):
+    return ", ".join(["%s"] * len(values))
+
+
+class SQLStorage(Storage):
+    # Dialect fragments
+    insert_ignore = "INSERT IGNORE"
+    for_update = " FOR UPDATE"
+
+    # Driver exception types translated into StorageError
+    driver_errors = ()
+
+    # --- Hooks for subclasses ---
+    @abstractmethod
+    def _connection(self):
+        """The connection held by the current application context, opened on first use."""
+
+    @abstractmethod
+    def _is_duplicate(self, err):
+        """True if the driver error `err` is a unique-constraint violation."""
+
+    def _begin(self, cursor):
+        """Starts a write transaction (no-op where the driver opens one implicitly)."""
+
+    def _mod(self, dividend, divisor):
+        return f"MOD({dividend}, {divisor})"
+
+    @abstractmethod
+    def _upsert_add(self, table, key, columns):
+        """INSERT that adds `columns` to the existing row when `key` already exists."""
+
+    @abstractmethod
+    def _reserve_indexes(self, cursor, issuer_id, count):
+        """Advances the issuer's next_index by `count` and returns the new value."""
+
+    # --- Connection helpers ---
+    def _open_cursor(self, db, dictionary=False):
+        return _CountingCursor(db.cursor(dictionary=dictionary))
+
+    @contextmanager
+    def _errors(self):
+        try:
+            yield
+        except self.driver_errors as err:
+            if self._is_duplicate(err):
+                raise DuplicateError(str(err)) from err
+            raise StorageError(str(err)) from err
+
+    @contextmanager
+    def _cursor(self, dictionary=False):
+        """Cursor for reads outside an explicit transaction."""
+        with self._errors():
+            cursor = self._open_cursor(self._connection(), dictionary)
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+
+    @contextmanager
+    def _transaction(self, dictionary=False):
+        """Cursor whose work is committed on success and rolled back on any error."""
+        with self._errors():
+            db = self._connection()
+            cursor = self._open_cursor(db, dictionary)
+            try:
+                self._begin(cursor)
+                yield cursor
+                db.commit()
+            except BaseException:
+                db.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def check_connection(self):
+        with self._errors():
+            self._connection()
+
+    # --- Users ---
+    def get_user(self, user_id):
+        with self._cursor(dictionary=True) as cursor:
+            cursor.execute("SELECT user_id, email, role FROM Users WHERE user_id = %s", (user_id,))
+            return cursor.fetchone()
+
+    def get_user_by_email(self, email):
+        with self._cursor(dictionary=True) as cursor:
+            cursor.execute("SELECT * FROM Users WHERE email = %s", (email,))
+            return cursor.fetchone()
+
+    def create_user(self, email, password_hash, role, private_key=None):
+        with self._transaction() as cursor:
+            cursor.execute(
+                "INSERT INTO Users (email, password, role, private_key) VALUES (%s, %s, %s, %s)",
+                (email, password_hash, role, private_key)
+            )
+            return cursor.lastrowid
+
+    def update_password(self, user_id, password_hash):
+        with self._transaction() as cursor:
+            cursor.execute("UPDATE Users SET password = %s WHERE user_id = %s", (password_hash, user_id))
+
+    def get_private_key(self, user_id):
+        with self._cursor() as cursor:
+            cursor.execute("SELECT private_key FROM Users WHERE user_id = %s", (user_id,))
+            row = cursor.fetchone()
+        return row[0] if row and row[0] else None
+
+    def issuers_with_keys(self, limit):
+        with self._cursor() as cursor:
+            cursor.execute(
+                "SELECT user_id FROM Users WHERE role = 'issuer' AND private_key IS NOT NULL AND private_key <> '' "
+                "ORDER BY user_id LIMIT %s",
+                (limit,)
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def find_holders(self, emails):
+        emails = list(emails)
+        if not emails:
+            return {}
+        with self._cursor() as cursor:
+            cursor.execute(
+                f"SELECT email, user_id FROM Users WHERE role = 'holder' AND email IN ({_placeholders(emails)})",
+                tuple(emails)
+            )
+            return dict(cursor.fetchall())
+
+    def existing_emails(self, emails):
+        emails = list(emails)
+        if not emails:
+            return set()
+        with self._cursor() as cursor:
+            cursor.execute(f"SELECT email FROM Users WHERE email IN ({_placeholders(emails)})", tuple(emails))
+            return {email for (email,) in cursor.fetchall()}
+
+    def insert_users(self, rows):
+        with self._transaction() as cursor:
+            cursor.executemany(
+                f"{self.insert_ignore} INTO Users (username, email, password, role, private_key) VALUES (%s, %s, %s, %s, %s)",
+                rows
+            )
+            return max(cursor.rowcount, 0)
+
+    def users_without_key(self, after_id, limit):
+        with self._cursor() as cursor:
+            cursor.execute(
+                "SELECT user_id FROM Users WHERE (private_key IS NULL OR private_key = '') AND user_id > %s "
+                "ORDER BY user_id LIMIT %s",
+                (after_id, limit)
+            )
+            return [user_id for (user_id,) in cursor.fetchall()]
+
+    def set_missing_keys(self, updates):
+        with self._transaction() as cursor:
+            cursor.executemany(
+                "UPDATE Users SET private_key = %s WHERE user_id = %s AND (private_key IS NULL OR private_key = '')",
+                updates
+            )
+            return max(cursor.rowcount, 0)
+
+    # --- Credentials ---
+    def insert_credentials(self, rows, holder_emails):
+        duplicates = set()
+        with self._errors():
+            db = self._connection()
+            cursor = self._open_cursor(db)
+            try:
+                self._begin(cursor)
+                try:
+                    cursor.executemany(INSERT_CREDENTIAL_QUERY, rows)
+                except self.driver_errors as err:
+                    if not self._is_duplicate(err):
+                        raise
+                    # A concurrent insert hit the unique key mid-batch: redo row by row
+                    db.rollback()
+                    self._begin(cursor)
+                    for row in rows:
+                        try:
+                            cursor.execute(INSERT_CREDENTIAL_QUERY, row)
+                        except self.driver_errors as row_err:
+                            if not self._is_duplicate(row_err):
+                                raise
+                            duplicates.add(row[3])
+
+                issued_by_issuer = {}
+                for issuer_id, holder_id, _, credential_hash, title, *_ in rows:
+                    if credential_hash not in duplicates:
+                        issued_by_issuer.setdefault(issuer_id, []).append((holder_id, holder_emails.get(holder_id), title))
+                for issuer_id, issued in issued_by_issuer.items():
+                    self._record_issuance(cursor, issuer_id, issued)
+
+                db.commit()
+                return duplicates
+            except BaseException:
+                db.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def existing_credential_hashes(self, hashes):
+        hashes = list(hashes)
+        if not hashes:
+            return set()
+        with self._cursor() as cursor:
+            cursor.execute(
+                f"SELECT credential_hash FROM Credentials WHERE credential_hash IN ({_placeholders(hashes)})",
+                tuple(hashes)
+            )
+            return {credential_hash for (credential_hash,) in cursor.fetchall()}
+
+    def list_holder_credentials(self, holder_id, full=True, limit=None, after=None):
+        columns = "*" if full else CREDENTIAL_SUMMARY_COLUMNS
+        query = f"SELECT {columns} FROM Credentials WHERE holder_id = %s"
+        params = [holder_id]
+        if after:
+            # Expanded form of (issued_at, cred_id) < (%s, %s) so the composite index is used
+            query += " AND (issued_at < %s OR (issued_at = %s AND cred_id < %s))"
+            params += [after[0], after[0], after[1]]
+        query += " ORDER BY issued_at DESC, cred_id DESC"
+        if limit is not None:
+            query += " LIMIT %s"
+            params.append(limit)
+        with self._cursor(dictionary=True) as cursor:
+            cursor.execute(query, tuple(params))
+            return cursor.fetchall()
+
+    def get_holder_credential(self, holder_id, cred_id):
+        with self._cursor(dictionary=True) as cursor:
+            cursor.execute("SELECT * FROM Credentials WHERE cred_id = %s AND holder_id = %s", (cred_id, holder_id))
+            return cursor.fetchone()
+
+    def revoke_credential(self, issuer_id, cred_id, list_size):
+        with self._transaction(dictionary=True) as cursor:
+            cursor.execute(
+                "SELECT cred_id, status, status_list_index, credential_data FROM Credentials "
+                f"WHERE cred_id = %s AND issuer_id = %s{self.for_update}",
+                (cred_id, issuer_id)
+            )
+            credential = cursor.fetchone()
+            if not credential:
+                return None, "not_found"
+            if credential['status'] == 'revoked':
+                return None, "already_revoked"
+
+            cursor.execute("INSERT INTO Revocations (cred_id) VALUES (%s)", (cred_id,))
+            cursor.execute("UPDATE Credentials SET status = 'revoked' WHERE cred_id = %s", (cred_id,))
+            revision = None
+            if credential['status_list_index'] is not None:
+                revision = self._mark_revoked(cursor, issuer_id, credential['status_list_index'], list_size)
+            cursor.execute(self._upsert_add("IssuerStats", "issuer_id", ["revoked_credentials"]), (issuer_id, 1))
+            return credential, revision
+
+    def iter_credential_data(self, batch_size):
+        last_id = 0
+        while True:
+            with self._cursor() as cursor:
+                cursor.execute(
+                    "SELECT cred_id, credential_data FROM Credentials WHERE cred_id > %s ORDER BY cred_id LIMIT %s",
+                    (last_id, batch_size)
+                )
+                rows = cursor.fetchall()
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1][0]
+
+    def update_credential_data(self, updates):
+        with self._transaction() as cursor:
+            cursor.executemany("UPDATE Credentials SET credential_data = %s WHERE cred_id = %s", updates)
+
+    # --- Status lists ---
+    def _mark_revoked(self, cursor, issuer_id, index, list_size):
+        """Sets the revocation bit inside the caller's transaction. Returns the new list revision."""
+        cursor.execute(f"SELECT bits, revision FROM StatusLists WHERE issuer_id = %s{self.for_update}", (issuer_id,))
+        row = cursor.fetchone()
+        bits = bytearray(row['bits'] or b'') if row else bytearray()
+        bits.extend(b'\x00' * (list_size // 8 - len(bits)))
+        set_bit(bits, index)
+        cursor.execute(
+            "UPDATE StatusLists SET bits = %s, revision = revision + 1 WHERE issuer_id = %s",
+            (bytes(bits), issuer_id)
+        )
+        return (row['revision'] if row else 0) + 1
+
+    def allocate_status_indexes(self, issuer_id, count, list_size):
+        try:
+            with self._transaction() as cursor:
+                end = self._reserve_indexes(cursor, issuer_id, count)
+                if end > list_size:
+                    raise _ListOverflow()
+                return end - count
+        except _ListOverflow:
+            return None
+
+    def load_status_list(self, issuer_id):
+        with self._cursor() as cursor:
+            cursor.execute("SELECT bits, revision FROM StatusLists WHERE issuer_id = %s", (issuer_id,))
+            row = cursor.fetchone()
+        return (row[0], row[1]) if row else (None, 0)
+
+    # --- Issuer statistics ---
+    def _record_issuance(self, cursor, issuer_id, issued):
+        """
+        Updates the counters and activity ring for newly inserted credentials.
+        `issued` is a list of (holder_id, holder_email, title) in issuance order.
+        """
+        if not issued:
+            return
+        holder_ids = list(dict.fromkeys(holder_id for holder_id, _, _ in issued))
+        cursor.executemany(
+            f"{self.insert_ignore} INTO IssuerHolders (issuer_id, holder_id) VALUES (%s, %s)",
+            [(issuer_id, holder_id) for holder_id in holder_ids]
+        )
+        new_holders = max(cursor.rowcount, 0)
+
+        cursor.execute(
+            self._upsert_add("IssuerStats", "issuer_id", ["credentials_issued", "active_students"]),
+            (issuer_id, len(issued), new_holders)
+        )
+        cursor.execute("SELECT credentials_issued FROM IssuerStats WHERE issuer_id = %s", (issuer_id,))
+        total = cursor.fetchone()[0]
+
+        # Only the newest entries survive in the ring; slot = seq mod ring size.
+        first_seq = total - len(issued) + 1
+        ring_rows = [
+            (issuer_id, seq % RECENT_ACTIVITY_SIZE, seq, title, holder_email)
+            for seq, (_, holder_email, title) in enumerate(issued, start=first_seq)
+        ][-RECENT_ACTIVITY_SIZE:]
+        cursor.executemany(
+            "REPLACE INTO IssuerActivity (issuer_id, slot, seq, title, holder_email) VALUES (%s, %s, %s, %s, %s)",
+            ring_rows
+        )
+
+    def get_issuer_stats(self, issuer_id):
+        with self._cursor(dictionary=True) as cursor:
+            cursor.execute(
+                "SELECT credentials_issued, active_students, revoked_credentials FROM IssuerStats WHERE issuer_id = %s",
+                (issuer_id,)
+            )
+            stats = cursor.fetchone() or {"credentials_issued": 0, "active_students": 0, "revoked_credentials": 0}
+            cursor.execute(
+                "SELECT title, holder_email FROM IssuerActivity WHERE issuer_id = %s ORDER BY seq DESC",
+                (issuer_id,)
+            )
+            return stats, cursor.fetchall()
+
+    def rebuild_issuer_stats(self):
+        with self._transaction() as cursor:
+            cursor.execute("DELETE FROM IssuerActivity")
+            cursor.execute("DELETE FROM IssuerHolders")
+            cursor.execute("DELETE FROM IssuerStats")
+            cursor.execute("INSERT INTO IssuerHolders (issuer_id, holder_id) SELECT DISTINCT issuer_id, holder_id FROM Credentials")
+            cursor.execute("""
+                INSERT INTO IssuerStats (issuer_id, credentials_issued, active_students, revoked_credentials)
+                SELECT c.issuer_id, COUNT(*), COUNT(DISTINCT c.holder_id), COUNT(r.revoc_id)
+                FROM Credentials c
+                LEFT JOIN Revocations r ON r.cred_id = c.cred_id
+                GROUP BY c.issuer_id
+            """)
+            cursor.execute(f"""
+                INSERT INTO IssuerActivity (issuer_id, slot, seq, title, holder_email)
+                SELECT ranked.issuer_id, {self._mod('s.credentials_issued - ranked.rn + 1', '%s')}, s.credentials_issued - ranked.rn + 1,
+                       ranked.title, ranked.holder_email
+                FROM (
+                    SELECT c.issuer_id, c.title, u.email AS holder_email,
+                           ROW_NUMBER() OVER (PARTITION BY c.issuer_id ORDER BY c.issued_at DESC, c.cred_id DESC) AS rn
+                    FROM Credentials c
+                    JOIN Users u ON c.holder_id = u.user_id
+                ) ranked
+                JOIN IssuerStats s ON s.issuer_id = ranked.issuer_id
+                WHERE ranked.rn <= %s
+            """, (RECENT_ACTIVITY_SIZE, RECENT_ACTIVITY_SIZE))
+            cursor.execute("SELECT COUNT(*) FROM IssuerStats")
+            return cursor.fetchone()[0]
+
+    # --- Issuance jobs ---
+    def create_issuance_job(self, issuer_id, payloads, now):
+        with self._transaction() as cursor:
+            cursor.execute("INSERT INTO IssuanceJobs (issuer_id, total) VALUES (%s, %s)", (issuer_id, len(payloads)))
+            job_id = cursor.lastrowid
+            cursor.executemany(
+                "INSERT INTO IssuanceJobItems (job_id, item_index, payload, available_at) VALUES (%s, %s, %s, %s)",
+                [(job_id, index, payload, now) for index, payload in enumerate(payloads)]
+            )
+            return job_id
+
+    def claim_issuance_items(self, limit, now, lease_expired_before, max_attempts):
+        with self._transaction(dictionary=True) as cursor:
+            # Lost items that already used up their attempts are not claimed again: they failed
+            cursor.execute(
+                "UPDATE IssuanceJobItems SET status = 'error', error = %s, finished_at = %s "
+                "WHERE status = 'running' AND claimed_at < %s AND attempts >= %s",
+                (f"Lease expired on all {max_attempts} attempts.", now, lease_expired_before, max_attempts)
+            )
+            cursor.execute(f"""
+                SELECT i.item_id, i.job_id, i.item_index, i.payload, i.attempts, j.issuer_id
+                FROM IssuanceJobItems i
+                JOIN IssuanceJobs j ON j.job_id = i.job_id
+                WHERE (i.status = 'queued' AND i.available_at <= %s)
+                   OR (i.status = 'running' AND i.claimed_at < %s AND i.attempts < %s)
+                ORDER BY i.item_id
+                LIMIT %s{self.for_update}
+            """, (now, lease_expired_before, max_attempts, limit))
+            items = cursor.fetchall()
+            if items:
+                item_ids = [item['item_id'] for item in items]
+                cursor.execute(
+                    f"UPDATE IssuanceJobItems SET status = 'running', claimed_at = %s, attempts = attempts + 1 "
+                    f"WHERE item_id IN ({_placeholders(item_ids)})",
+                    (now, *item_ids)
+                )
+                for item in items:
+                    item['attempts'] += 1
+                    item['claimed_at'] = now
+            return items
+
+    def finish_issuance_item(self, item_id, claimed_at, status, error, now):
+        with self._transaction() as cursor:
+            cursor.execute(
+                "UPDATE IssuanceJobItems SET status = %s, error = %s, finished_at = %s "
+                "WHERE item_id = %s AND status = 'running' AND claimed_at = %s",
+                (status, error, now, item_id, claimed_at)
+            )
+            return cursor.rowcount == 1
+
+    def retry_issuance_item(self, item_id, claimed_at, error, available_at):
+        with self._transaction() as cursor:
+            cursor.execute(
+                "UPDATE IssuanceJobItems SET status = 'queued', error = %s, available_at = %s, claimed_at = NULL "
+                "WHERE item_id = %s AND status = 'running' AND claimed_at = %s",
+                (error, available_at, item_id, claimed_at)
+            )
+            return cursor.rowcount == 1
+
+    def get_issuance_job(self, job_id):
+        with self._cursor(dictionary=True) as cursor:
+            cursor.execute("SELECT job_id, issuer_id, total, created_at FROM IssuanceJobs WHERE job_id = %s", (job_id,))
+            return cursor.fetchone()
+
+    def list_issuance_items(self, job_id):
+        with self._cursor(dictionary=True) as cursor:
+            cursor.execute(
+                "SELECT item_index, status, attempts, error, finished_at FROM IssuanceJobItems WHERE job_id = %s ORDER BY item_index",
+                (job_id,)
+            )
+            return cursor.fetchall()
@@ -0,0 +1,191 @@
+"""
+Embedded SQLite backend.
+
+Runs in WAL mode so readers never block the single writer. Every application
+context gets its own connection (reused through a small idle list), and write
+transactions start with BEGIN IMMEDIATE so concurrent writers queue on the
+database lock (up to `busy_timeout` seconds) instead of failing mid-transaction.
+"""
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import click
+from quart import g
+
+from app.metrics import record_connection
+from .base import StorageUnavailable
+from .sql import SQLStorage
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), 'sqlite_schema.sql')
+
+# TIMESTAMP columns round-trip as datetime, in the same text form CURRENT_TIMESTAMP writes
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+sqlite3.register_converter("TIMESTAMP", lambda value: datetime.fromisoformat(value.decode('ascii')))
+
+
+class _Cursor:
+    """sqlite3 cursor with the mysql.connector calling conventions used by SQLStorage."""
+
+    def __init__(self, cursor, dictionary):
+        self._cursor = cursor
+        self._dictionary = dictionary
+
+    @staticmethod
+    def _sql(query):
+        return query.replace("%s", "?")
+
+    def execute(self, query, params=()):
+        self._cursor.execute(self._sql(query), params)
+
+    def executemany(self, query, rows):
+        self._cursor.executemany(self._sql(query), rows)
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return {column[0]: value for column, value in zip(self._cursor.description, row)}
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def close(self):
+        self._cursor.close()
+
+
+class _Connection:
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self, dictionary=False):
+        return _Cursor(self._conn.cursor(), dictionary)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    @property
+    def in_transaction(self):
+        return self._conn.in_transaction
+
+    def close(self):
+        self._conn.close()
+
+
+class SQLiteStorage(SQLStorage):
+    name = "sqlite"
+    insert_ignore = "INSERT OR IGNORE"
+    for_update = ""
+    driver_errors = (sqlite3.Error,)
+
+    def __init__(self, path, pool_size=10, busy_timeout=5.0):
+        self.path = path
+        self.pool_size = pool_size
+        self.busy_timeout = busy_timeout
+        self._idle = []
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._opened = 0
+
+    def _connect(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        # isolation_level=None: transactions are opened explicitly by _begin()
+        conn = sqlite3.connect(
+            self.path, timeout=self.busy_timeout, isolation_level=None,
+            check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        self._opened += 1
+        return _Connection(conn)
+
+    def _connection(self):
+        if 'sqlite_db' not in g:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+                self._in_use += 1
+            try:
+                g.sqlite_db = conn or self._connect()
+                record_connection()
+            except sqlite3.Error as err:
+                with self._lock:
+                    self._in_use -= 1
+                raise StorageUnavailable(str(err)) from err
+        return g.sqlite_db
+
+    def release(self):
+        conn = g.pop('sqlite_db', None)
+        if conn is None:
+            return
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            self._in_use -= 1
+            if len(self._idle) < self.pool_size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def stats(self):
+        with self._lock:
+            return {"backend": self.name, "path": self.path, "in_use": self._in_use,
+                    "idle": len(self._idle), "opened": self._opened}
+
+    def prewarm(self, connections):
+        with self._lock:
+            wanted = max(0, min(connections, self.pool_size) - len(self._idle))
+        opened = []
+        with self._errors():
+            for _ in range(wanted):
+                opened.append(self._connect())
+        with self._lock:
+            self._idle.extend(opened)
+        return len(opened)
+
+    def migrate(self):
+        with open(SCHEMA_PATH, 'r') as f:
+            script = f.read()
+        with self._errors():
+            self._connection()._conn.executescript(script)
+        click.echo(click.style(f"SQLite schema is up to date ({self.path}).", fg="green"))
+        return 0
+
+    # --- Dialect ---
+    def _is_duplicate(self, err):
+        return isinstance(err, sqlite3.IntegrityError) and "UNIQUE" in str(err)
+
+    def _begin(self, cursor):
+        cursor.execute("BEGIN IMMEDIATE")
+
+    def _mod(self, dividend, divisor):
+        return f"(({dividend}) % ({divisor}))"
+
+    def _upsert_add(self, table, key, columns):
+        names = ", ".join([key] + columns)
+        values = ", ".join(["%s"] * (len(columns) + 1))
+        updates = ", ".join(f"{column} = {column} + excluded.{column}" for column in columns)
+        return f"INSERT INTO {table} ({names}) VALUES ({values}) ON CONFLICT({key}) DO UPDATE SET {updates}"
+
+    def _reserve_indexes(self, cursor, issuer_id, count):
+        cursor.execute("""
+            INSERT INTO StatusLists (issuer_id, next_index) VALUES (%s, %s)
+            ON CONFLICT(issuer_id) DO UPDATE SET next_index = next_index + excluded.next_index
+            RETURNING next_index
+        """, (issuer_id, count))
+        return cursor.fetchone()[0]
@@ -0,0 +1,98 @@
+-- Schema of the embedded SQLite backend. Mirrors app/migrations (MariaDB) and is
+-- re-runnable: every statement uses IF NOT EXISTS.
+
+CREATE TABLE IF NOT EXISTS Users (
+    user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username VARCHAR(255) UNIQUE,
+    email VARCHAR(255) UNIQUE NOT NULL,
+    password VARCHAR(255) NOT NULL,
+    private_key TEXT,
+    role VARCHAR(50)
+);
+
+CREATE TABLE IF NOT EXISTS Credentials (
+    cred_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    issuer_id INT NOT NULL,
+    holder_id INT NOT NULL,
+    category VARCHAR(10) NOT NULL DEFAULT 'VC',
+    credential_hash VARCHAR(255) NOT NULL,
+    credential_data BLOB NOT NULL,
+    title VARCHAR(100),
+    status VARCHAR(50) DEFAULT 'active',
+    issued_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    status_list_index INT NULL,
+    FOREIGN KEY(issuer_id) REFERENCES Users(user_id) ON DELETE RESTRICT,
+    FOREIGN KEY(holder_id) REFERENCES Users(user_id) ON DELETE RESTRICT
+);
+
+CREATE TABLE IF NOT EXISTS Revocations (
+    revoc_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    cred_id INT UNIQUE NOT NULL,
+    revoked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY(cred_id) REFERENCES Credentials(cred_id) ON DELETE CASCADE
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_credentials_hash ON Credentials(credential_hash);
+CREATE INDEX IF NOT EXISTS idx_credentials_issuer_id ON Credentials(issuer_id);
+CREATE INDEX IF NOT EXISTS idx_credentials_holder_issued ON Credentials(holder_id, issued_at, cred_id);
+CREATE INDEX IF NOT EXISTS idx_credentials_status ON Credentials(status);
+
+CREATE TABLE IF NOT EXISTS StatusLists (
+    issuer_id INT PRIMARY KEY,
+    next_index INT NOT NULL DEFAULT 0,
+    revision INT NOT NULL DEFAULT 0,
+    bits BLOB,
+    FOREIGN KEY(issuer_id) REFERENCES Users(user_id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS IssuerStats (
+    issuer_id INT PRIMARY KEY,
+    credentials_issued INT NOT NULL DEFAULT 0,
+    active_students INT NOT NULL DEFAULT 0,
+    revoked_credentials INT NOT NULL DEFAULT 0,
+    FOREIGN KEY(issuer_id) REFERENCES Users(user_id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS IssuerHolders (
+    issuer_id INT NOT NULL,
+    holder_id INT NOT NULL,
+    PRIMARY KEY (issuer_id, holder_id),
+    FOREIGN KEY(issuer_id) REFERENCES Users(user_id) ON DELETE CASCADE,
+    FOREIGN KEY(holder_id) REFERENCES Users(user_id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS IssuerActivity (
+    issuer_id INT NOT NULL,
+    slot TINYINT NOT NULL,
+    seq INT NOT NULL,
+    title VARCHAR(100),
+    holder_email VARCHAR(255),
+    issued_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (issuer_id, slot),
+    FOREIGN KEY(issuer_id) REFERENCES Users(user_id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS IssuanceJobs (
+    job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    issuer_id INT NOT NULL,
+    total INT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY(issuer_id) REFERENCES Users(user_id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS IssuanceJobItems (
+    item_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id INT NOT NULL,
+    item_index INT NOT NULL,
+    payload TEXT NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+    attempts INT NOT NULL DEFAULT 0,
+    available_at TIMESTAMP NOT NULL,
+    claimed_at TIMESTAMP NULL,
+    finished_at TIMESTAMP NULL,
+    error VARCHAR(500) NULL,
+    UNIQUE (job_id, item_index),
+    FOREIGN KEY(job_id) REFERENCES IssuanceJobs(job_id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_issuance_items_claim ON IssuanceJobItems(status, available_at);
@@ -0,0 +1,213 @@
+"""
+Batched proof verification for /api/verifier/verify, verify_batch and SD-JWTs.
+
+Verifications requested during one event loop iteration (up to
+VERIFY_BATCH_SIZE) are coalesced and sent to a crypto worker as one operation
+instead of one round trip each. In the worker, identical documents are checked
+once, and:
+
+- EdDSA JWTs issued by a did:key (SD-JWT issuer JWTs, key bindings, VC-JWTs) are
+  checked locally when `cryptography` is installed: the did:key is decoded to its
+  Ed25519 key (cached) and the signature verified over the JWS signing input.
+- Everything else (JSON-LD proofs) goes through didkit, concurrently.
+
+The local check only ever accepts. A JWT it cannot accept is handed to didkit,
+so rejections and their errors are always didkit's. If a whole batch fails (a
+worker died on one of its documents) it is split in halves and retried until
+the offending document is isolated, so one bad document cannot fail the rest.
+
+Python's Ed25519 bindings verify one signature per call; there is no batch
+equation here. What the batch saves is the hand-off to the worker, which costs
+more than a signature check.
+"""
+import asyncio
+import base64
+import time
+from functools import lru_cache
+
+import didkit
+
+from app.config import Config
+from app.json_provider import dumps, loads
+from app.metrics import verify_batch_size
+from app.utils.crypto_pool import CryptoPoolSaturated, CryptoTimeout, get_crypto_pool
+
+try:
+    from cryptography.exceptions import InvalidSignature
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
+except ImportError:  # optional dependency: without it every proof is checked by didkit
+    Ed25519PublicKey = None
+
+OPERATIONS = ("verify_credential", "verify_presentation")
+BASE58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+ED25519_MULTICODEC = b"\xed\x01"
+CREDENTIALS_CONTEXT = "https://www.w3.org/2018/credentials/v1"
+# Proof options the local JWT check understands; anything else goes to didkit
+LOCAL_OPTIONS = {"proofFormat", "challenge", "domain"}
+VERIFIED = dumps({"checks": ["JWS"], "warnings": [], "errors": []})
+
+
+# --- did:key ---
+def _b58decode(text):
+    number = 0
+    for char in text:
+        number = number * 58 + BASE58_ALPHABET.index(char)
+    raw = number.to_bytes((number.bit_length() + 7) // 8, "big")
+    return b"\0" * (len(text) - len(text.lstrip("1"))) + raw
+
+@lru_cache(maxsize=Config.DID_KEY_CACHE_SIZE)
+def did_key_public_key(did):
+    """The Ed25519 public key of a `did:key:z6Mk...` DID, or None for any other DID."""
+    if not did.startswith("did:key:z"):
+        return None
+    try:
+        decoded = _b58decode(did[len("did:key:z"):])
+    except ValueError:
+        return None
+    if len(decoded) != 34 or decoded[:2] != ED25519_MULTICODEC:
+        return None
+    return Ed25519PublicKey.from_public_bytes(decoded[2:])
+
+
+# --- Worker side ---
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def verify_jwt_locally(operation, jwt, options):
+    """True if `jwt` is an EdDSA VC/VP-JWT whose did:key issuer signed it; False means "ask didkit"."""
+    if Ed25519PublicKey is None or not isinstance(jwt, str) or jwt.count(".") != 2:
+        return False
+    try:
+        options = loads(options)
+        header_b64, payload_b64, signature_b64 = jwt.split(".")
+        header, claims = loads(_b64decode(header_b64)), loads(_b64decode(payload_b64))
+        signature = _b64decode(signature_b64)
+    except (TypeError, ValueError):
+        return False
+    if not all(isinstance(part, dict) for part in (options, header, claims)):
+        return False
+    if options.get("proofFormat") != "jwt" or not set(options) <= LOCAL_OPTIONS:
+        return False
+
+    # 1. Header and issuer: the key must be the issuer's own did:key
+    issuer = claims.get("iss")
+    if header.get("alg") != "EdDSA" or "crit" in header or len(signature) != 64 or not isinstance(issuer, str):
+        return False
+    if header.get("kid", issuer) not in (issuer, f"{issuer}#{issuer[len('did:key:'):]}"):
+        return False
+
+    # 2. Claims didkit validates
+    kind, document_type = ("vc", "VerifiableCredential") if operation == "verify_credential" else ("vp", "VerifiablePresentation")
+    document = claims.get(kind)
+    if not isinstance(document, dict) or not isinstance(document.get("@context"), list) or not document["@context"] \
+            or document["@context"][0] != CREDENTIALS_CONTEXT:
+        return False
+    types = document.get("type")
+    if document_type not in (types if isinstance(types, list) else [types]):
+        return False
+    now = time.time()
+    if "nbf" in claims and not (_is_number(claims["nbf"]) and claims["nbf"] <= now):
+        return False
+    if "exp" in claims and not (_is_number(claims["exp"]) and claims["exp"] > now):
+        return False
+    if "challenge" in options and claims.get("nonce") != options["challenge"]:
+        return False
+    if "domain" in options and claims.get("aud") != options["domain"]:
+        return False
+
+    # 3. Signature over the JWS signing input
+    key = did_key_public_key(issuer)
+    if key is None:
+        return False
+    try:
+        key.verify(signature, f"{header_b64}.{payload_b64}".encode("ascii"))
+    except InvalidSignature:
+        return False
+    return True
+
+async def verify_documents(items):
+    """
+    Runs on a crypto worker: verifies (operation, document, options) items and
+    returns, for each, didkit's JSON result or the exception it raised.
+    """
+    results = [VERIFIED if verify_jwt_locally(*item) else None for item in items]
+    pending = [index for index, result in enumerate(results) if result is None]
+    outcomes = await asyncio.gather(*(getattr(didkit, items[index][0])(*items[index][1:]) for index in pending),
+                                    return_exceptions=True)
+    for index, outcome in zip(pending, outcomes):
+        results[index] = outcome
+    return results
+
+
+# --- Server side ---
+class BatchVerifier:
+    """Coalesces this process's verifications into batches, one per event loop iteration."""
+
+    def __init__(self, max_size=64):
+        self.max_size = max_size
+        self._pending = []
+        self._scheduled = False
+        self._tasks = set()
+
+    async def verify(self, operation, document, options):
+        """Same contract as didkit.verify_credential / verify_presentation: returns the JSON result."""
+        if operation not in OPERATIONS:
+            raise ValueError(f"Unsupported verification: {operation}")
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append(((operation, document, options), future))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif not self._scheduled:
+            self._scheduled = True
+            loop.call_soon(self._flush)
+        return await future
+
+    def _flush(self):
+        self._scheduled = False
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        # Identical documents (one credential presented many times) are verified once
+        waiters = {}
+        for item, future in batch:
+            waiters.setdefault(item, []).append(future)
+        items = list(waiters)
+        verify_batch_size.observe(len(items))
+        try:
+            results = await self._verify(items)
+        except Exception as e:
+            results = [e] * len(items)
+
+        for item, result in zip(items, results):
+            for future in waiters[item]:
+                if future.done():  # the caller went away
+                    continue
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    async def _verify(self, items):
+        try:
+            # Admitted as one pool operation per proof: see crypto_pool.py for why CRYPTO_TIMEOUT is not scaled
+            return await get_crypto_pool().run("verify_batch", verify_documents, items, slots=len(items))
+        except (CryptoPoolSaturated, CryptoTimeout):
+            raise
+        except Exception as e:
+            if len(items) == 1:
+                return [e]
+            # Something in this batch took the whole operation down: split it to isolate the document
+            middle = len(items) // 2
+            first, second = await asyncio.gather(self._verify(items[:middle]), self._verify(items[middle:]))
+            return first + second
+
+
+batch_verifier = BatchVerifier(Config.VERIFY_BATCH_SIZE)
@@ -0,0 +1,125 @@
+"""
+Storage format for Credentials.credential_data.
+
+Documents are stored either as plain JSON (the original format, still readable)
+or compressed behind a small header: MAGIC followed by one byte naming the
+codec. Compression is opt-in through CREDENTIAL_COMPRESSION ("none", "zlib" or
+"zstd") and only applies to new writes; `quart reencode-credentials` converts
+existing rows in the background and `quart credential-storage-stats` reports
+sizes and ratios.
+"""
+import zlib
+
+import click
+from quart import current_app
+from quart.cli import with_appcontext
+
+from app.storage import get_storage
+
+try:
+    import zstandard
+except ImportError:  # optional dependency, only needed for CREDENTIAL_COMPRESSION=zstd
+    zstandard = None
+
+MAGIC = b"\x00VC"
+CODEC_IDS = {"zlib": b"z", "zstd": b"s"}
+CODEC_NAMES = {v: k for k, v in CODEC_IDS.items()}
+
+
+def codec_of(stored):
+    """Returns the codec name of a stored value ("none" for plain JSON)."""
+    if isinstance(stored, (bytes, bytearray)) and stored[:len(MAGIC)] == MAGIC:
+        return CODEC_NAMES.get(bytes(stored[len(MAGIC):len(MAGIC) + 1]), "unknown")
+    return "none"
+
+def encode_document(text, codec=None, level=None):
+    """Encodes a JSON document for storage with the given (or configured) codec."""
+    codec = codec or current_app.config["CREDENTIAL_COMPRESSION"]
+    level = level if level is not None else current_app.config["CREDENTIAL_COMPRESSION_LEVEL"]
+    raw = text.encode('utf-8') if isinstance(text, str) else bytes(text)
+
+    if codec == "none":
+        return raw
+    if codec == "zlib":
+        return MAGIC + CODEC_IDS["zlib"] + zlib.compress(raw, level)
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("CREDENTIAL_COMPRESSION=zstd requires the 'zstandard' package.")
+        return MAGIC + CODEC_IDS["zstd"] + zstandard.ZstdCompressor(level=level).compress(raw)
+    raise ValueError(f"Unknown credential compression codec: {codec}")
+
+def decode_document(stored):
+    """Returns the JSON text of a stored document, decompressing it if needed."""
+    if stored is None or isinstance(stored, str):
+        return stored
+    stored = bytes(stored)
+    codec = codec_of(stored)
+    body = stored[len(MAGIC) + 1:]
+    if codec == "none":
+        return stored.decode('utf-8')
+    if codec == "zlib":
+        return zlib.decompress(body).decode('utf-8')
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Reading zstd-compressed credentials requires the 'zstandard' package.")
+        return zstandard.ZstdDecompressor().decompress(body).decode('utf-8')
+    raise ValueError("Unknown credential storage format.")
+
+def decode_rows(rows):
+    """Decodes credential_data in place for rows about to be returned in full."""
+    for row in rows:
+        if 'credential_data' in row:
+            row['credential_data'] = decode_document(row['credential_data'])
+    return rows
+
+# --- Maintenance commands ---
+def reencode_credentials(codec, batch_size=500):
+    """Rewrites every stored document not already in `codec`, one committed batch at a time."""
+    storage = get_storage()
+    converted = 0
+    for rows in storage.iter_credential_data(batch_size):
+        updates = [
+            (encode_document(decode_document(data), codec), cred_id)
+            for cred_id, data in rows if codec_of(data) != codec
+        ]
+        if updates:
+            storage.update_credential_data(updates)
+            converted += len(updates)
+    return converted
+
+def credential_storage_stats(batch_size=500):
+    """Per-codec row counts with stored and decoded sizes."""
+    stats = {}
+    for rows in get_storage().iter_credential_data(batch_size):
+        for _, data in rows:
+            entry = stats.setdefault(codec_of(data), {"rows": 0, "stored_bytes": 0, "json_bytes": 0})
+            entry["rows"] += 1
+            entry["stored_bytes"] += len(data)
+            entry["json_bytes"] += len(decode_document(data).encode('utf-8'))
+    for entry in stats.values():
+        entry["ratio"] = round(entry["stored_bytes"] / entry["json_bytes"], 3) if entry["json_bytes"] else 0.0
+    return stats
+
+@click.command('reencode-credentials')
+@click.option('--codec', type=click.Choice(["none", "zlib", "zstd"]), default=None,
+              help="Target format (defaults to CREDENTIAL_COMPRESSION).")
+@click.option('--batch-size', default=500, show_default=True)
+@with_appcontext
+def reencode_credentials_command(codec, batch_size):
+    """CLI command to convert stored credentials to another storage format."""
+    codec = codec or current_app.config["CREDENTIAL_COMPRESSION"]
+    converted = reencode_credentials(codec, batch_size)
+    click.echo(click.style(f"Re-encoded {converted} credential(s) as '{codec}'.", fg="green"))
+
+@click.command('credential-storage-stats')
+@with_appcontext
+def credential_storage_stats_command():
+    """CLI command reporting credential storage size and compression ratio."""
+    stats = credential_storage_stats()
+    if not stats:
+        click.echo("No credentials stored.")
+    for codec, entry in sorted(stats.items()):
+        click.echo(
+            f"{codec:>6}: {entry['rows']} row(s), {entry['stored_bytes']} bytes stored, "
+            f"{entry['json_bytes']} bytes JSON, ratio {entry['ratio']}"
+        )
@@ -0,0 +1,14 @@
+from app.storage import get_storage
+from app.utils.credential_codec import encode_document
+
+def insert_credentials(rows, holder_emails):
+    """
+    Inserts credential rows (issuer_id, holder_id, category, credential_hash,
+    title, status, credential_data, status_list_index) and updates the issuer
+    statistics in one transaction. Returns the credential hashes that were
+    rejected as duplicates by the database.
+    `holder_emails` maps holder_id to email for the recent-activity ring.
+    credential_data is stored in the configured CREDENTIAL_COMPRESSION format.
+    """
+    rows = [(*row[:6], encode_document(row[6]), *row[7:]) for row in rows]
+    return get_storage().insert_credentials(rows, holder_emails)
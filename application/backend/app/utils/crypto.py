@@ -1,8 +1,73 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import bcrypt
+from quart import current_app
 
 # --- Password Hashing Utilities ---
-def hash_password(password):
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+def hash_password(password, rounds=12):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
 
 def check_password(plain_password, hashed_password):
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+def needs_rehash(hashed_password, rounds):
+    """True if the hash was made with a different bcrypt cost than `rounds`."""
+    try:
+        return int(hashed_password.split('$')[2]) != rounds
+    except (IndexError, ValueError):
+        return True
+
+# --- Bounded bcrypt Worker Pool ---
+class PasswordPoolSaturated(Exception):
+    """Raised when the bcrypt pool already has its maximum number of queued jobs."""
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a fixed-size thread pool (bcrypt releases the GIL) so a burst
+    of logins cannot pin the request workers. At most `workers + max_queue` jobs
+    are admitted at once; anything beyond that fails fast with
+    PasswordPoolSaturated instead of queueing without bound.
+    """
+
+    def __init__(self, rounds=12, workers=4, max_queue=32):
+        self.rounds = rounds
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+
+    async def _submit(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordPoolSaturated("Too many password operations in progress.")
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self._slots.release()
+
+    async def hash(self, password):
+        return await self._submit(hash_password, password, self.rounds)
+
+    async def check(self, plain_password, hashed_password):
+        return await self._submit(check_password, plain_password, hashed_password)
+
+    def needs_rehash(self, hashed_password):
+        return needs_rehash(hashed_password, self.rounds)
+
+
+_hasher = None
+_hasher_lock = threading.Lock()
+
+def get_password_hasher():
+    """Returns the process-wide PasswordHasher configured from the app config."""
+    global _hasher
+    if _hasher is None:
+        with _hasher_lock:
+            if _hasher is None:
+                _hasher = PasswordHasher(
+                    rounds=current_app.config["BCRYPT_ROUNDS"],
+                    workers=current_app.config["BCRYPT_WORKERS"],
+                    max_queue=current_app.config["BCRYPT_MAX_QUEUE"],
+                )
+    return _hasher
@@ -0,0 +1,226 @@
+"""
+Crypto execution service: every didkit signature and proof verification runs here.
+
+Signing and verifying are CPU-bound. Run on the event loop they stall every
+other request of the process; with no limit a burst queues without bound. The
+pool runs them on CRYPTO_WORKERS worker processes (0: on the event loop, still
+bounded) and admits at most CRYPTO_WORKERS + CRYPTO_MAX_QUEUE operations at once.
+A batch (see batch_verify.py) counts as one operation per proof in it, so
+nothing waits behind more than that many proofs and CRYPTO_TIMEOUT bounds the
+same amount of work whether or not verifications are batched. Anything beyond
+that fails fast with CryptoPoolSaturated, and an operation that has not
+completed after CRYPTO_TIMEOUT seconds fails with CryptoTimeout; both are
+answered 503 with Retry-After. Queue depth, wait and service times are exported
+on /metrics.
+
+The workers are forked from a forkserver that never started didkit's runtime
+(forking a process that has would copy a runtime without its threads), and the
+pool is created lazily in each server process, never in the launcher's master.
+"""
+import asyncio
+import functools
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import didkit
+from quart import current_app, jsonify
+
+from app.metrics import crypto_queue_depth, crypto_queue_wait, crypto_rejected, crypto_service_time
+
+
+class CryptoUnavailable(Exception):
+    """Raised when a didkit operation could not be run in time; the request may be retried."""
+
+
+class CryptoPoolSaturated(CryptoUnavailable):
+    """Raised when the crypto pool already has its maximum number of queued operations."""
+
+
+class CryptoTimeout(CryptoUnavailable):
+    """Raised when an operation did not complete within CRYPTO_TIMEOUT."""
+
+
+# --- Worker process side ---
+_worker_loop = None
+
+def _exit_with_server(server_pid):
+    # A server process that was killed never shuts its pool down (and the forkserver
+    # lives as long as its children do): don't outlive it
+    while True:
+        time.sleep(1)
+        try:
+            os.kill(server_pid, 0)
+        except ProcessLookupError:
+            os._exit(0)
+
+def _init_worker(server_pid):
+    global _worker_loop
+    # Ctrl-C reaches the whole process group; the server shuts the pool down itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    threading.Thread(target=_exit_with_server, args=(server_pid,), daemon=True).start()
+    _worker_loop = asyncio.new_event_loop()
+
+async def _run(func, args):
+    started = time.perf_counter()
+    result = await func(*args)
+    return result, time.perf_counter() - started
+
+def _call(func, args):
+    """Entry point in the worker: awaits `func(*args)` and returns (result, service time)."""
+    return _worker_loop.run_until_complete(_run(func, args))
+
+
+# --- Server process side ---
+class CryptoPool:
+    """Bounded, timed execution of didkit operations on a pool of worker processes."""
+
+    def __init__(self, workers=1, max_queue=64, timeout=10):
+        self.workers = workers
+        self.timeout = timeout
+        self.capacity = max(workers, 1) + max_queue
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                try:
+                    context = multiprocessing.get_context("forkserver")
+                    context.set_forkserver_preload(["__main__", __name__])
+                except ValueError:
+                    context = multiprocessing.get_context("spawn")
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=context,
+                                                     initializer=_init_worker, initargs=(os.getpid(),))
+            return self._executor
+
+    def _admit(self, slots):
+        with self._lock:
+            if self._in_flight + slots > self.capacity:
+                return None
+            self._in_flight += slots
+            return self._in_flight
+
+    def _release(self, slots, _future=None):
+        with self._lock:
+            self._in_flight -= slots
+
+    async def run(self, operation, func, *args, slots=1):
+        """
+        Awaits the coroutine function `func(*args)` on a worker and returns its
+        result. `func` and its arguments are pickled, so it must be a module-level
+        function; `operation` labels the metrics. `slots` is the number of
+        operations the call stands for (the proofs of a batch); one larger than
+        the whole pool is admitted only when the pool is idle.
+        """
+        slots = min(slots, self.capacity)
+        admitted = self._admit(slots)
+        if admitted is None:
+            crypto_rejected.inc(1, operation, "saturated")
+            raise CryptoPoolSaturated("Too many signing and verification operations in progress.")
+        crypto_queue_depth.observe(max(admitted - max(self.workers, 1), 0))
+
+        started = time.perf_counter()
+        try:
+            if self.workers > 0:
+                try:
+                    future = self._get_executor().submit(_call, func, args)
+                except BrokenProcessPool:
+                    self._release(slots)
+                    raise
+                # The slots are freed when the worker is done, even if the caller stopped waiting
+                future.add_done_callback(functools.partial(self._release, slots))
+                waiter = asyncio.wrap_future(future)
+            else:
+                waiter = _run(func, args)
+            try:
+                result, service_time = await asyncio.wait_for(waiter, self.timeout)
+            finally:
+                if self.workers <= 0:
+                    self._release(slots)
+        except asyncio.TimeoutError:
+            crypto_rejected.inc(1, operation, "timeout")
+            raise CryptoTimeout(f"{operation} did not complete within {self.timeout:g}s.") from None
+        except BrokenProcessPool:
+            # A worker died (and took the pool with it): start a fresh pool for the next operation
+            with self._lock:
+                self._executor = None
+            crypto_rejected.inc(1, operation, "worker_lost")
+            raise CryptoUnavailable("A crypto worker stopped unexpectedly.") from None
+
+        crypto_service_time.observe(service_time, operation)
+        crypto_queue_wait.observe(max(time.perf_counter() - started - service_time, 0.0), operation)
+        return result
+
+    async def start(self):
+        """Starts every worker ahead of traffic instead of on the first operations."""
+        if self.workers > 0:
+            executor = self._get_executor()
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*(loop.run_in_executor(executor, time.sleep, 0.05) for _ in range(self.workers)))
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self):
+        with self._lock:
+            in_flight = self._in_flight
+        return {"workers": self.workers, "capacity": self.capacity, "in_flight": in_flight,
+                "queued": max(in_flight - max(self.workers, 1), 0)}
+
+    # --- didkit operations (arguments and results are the JSON strings didkit takes) ---
+    async def issue_credential(self, credential, options, key):
+        return await self.run("issue_credential", didkit.issue_credential, credential, options, key)
+
+    async def issue_presentation(self, presentation, options, key):
+        return await self.run("issue_presentation", didkit.issue_presentation, presentation, options, key)
+
+    async def verify_credential(self, credential, options):
+        return await self.run("verify_credential", didkit.verify_credential, credential, options)
+
+    async def verify_presentation(self, presentation, options):
+        return await self.run("verify_presentation", didkit.verify_presentation, presentation, options)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_crypto_pool():
+    """Returns the process-wide CryptoPool configured from the app config."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = CryptoPool(
+                    workers=current_app.config["CRYPTO_WORKERS"],
+                    max_queue=current_app.config["CRYPTO_MAX_QUEUE"],
+                    timeout=current_app.config["CRYPTO_TIMEOUT"],
+                )
+    return _pool
+
+def crypto_pool_stats():
+    """Counters of this process's pool, or None if it was never used."""
+    return _pool.stats() if _pool is not None else None
+
+
+async def _busy_response(error):
+    """Fast rejection for requests that could not get their signature or verification run."""
+    response = jsonify({"error": f"Signing and verification service is busy. Please retry shortly. ({str(error)})"})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+async def _shutdown():
+    if _pool is not None:
+        _pool.shutdown()
+
+def init_app(app):
+    app.register_error_handler(CryptoUnavailable, _busy_response)
+    app.after_serving(_shutdown)
@@ -0,0 +1,159 @@
+"""
+Asynchronous issuance: a durable job queue in the database and the workers that drain it.
+
+POST /api/issuer/issue_vc?async=true stores the request as a job with one item
+per credential subject and answers 202 at once. Every server process runs
+ISSUE_JOB_CONCURRENCY workers that claim due items, issue each one exactly like
+issue_vc and record the outcome, so issuance throughput no longer depends on
+clients holding connections open. Claims are atomic, so any number of processes
+can share the queue.
+
+Transient failures (database or signing errors) are retried with exponential
+backoff up to ISSUE_JOB_MAX_ATTEMPTS attempts. Rejections (invalid data, unknown
+holder, duplicates) are final. An item whose worker died stays "running" until
+its ISSUE_JOB_LEASE runs out and is then claimed again (or marked "error" once
+it has used up its attempts); the credential fingerprint turns a repeated
+issuance into a duplicate, never a second credential. Outcomes are only recorded
+while the worker still holds the item's lease, so a slow worker whose item was
+claimed again cannot overwrite the newer claim's result.
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+from app import async_db
+from app.json_provider import dumps, loads
+from app.storage import get_storage, DuplicateError, StorageError
+from app.utils.status_list import StatusListFull
+
+ITEM_STATUSES = ("queued", "running", "created", "duplicate", "error")
+ERROR_MAX_LENGTH = 500
+
+# Set when this process queues a job so idle workers don't wait for the next poll
+_wake = None
+
+
+async def enqueue(issuer_id, items):
+    """Stores a job for the given credential subjects and returns its id."""
+    payloads = [dumps(item) for item in items]
+    job_id = await async_db.run_sync(get_storage().create_issuance_job, issuer_id, payloads, datetime.utcnow())
+    if _wake is not None:
+        _wake.set()
+    return job_id
+
+def job_status(job, items):
+    """The status document of a job: overall state, counts per item status and the items."""
+    counts = dict.fromkeys(ITEM_STATUSES, 0)
+    for item in items:
+        counts[item['status']] += 1
+    pending = counts["queued"] + counts["running"]
+    if not pending:
+        status = "completed"
+    elif counts["queued"] == job['total'] and not any(item['attempts'] for item in items):
+        status = "queued"
+    else:
+        status = "running"
+    return {
+        "job_id": job['job_id'],
+        "status": status,
+        "total": job['total'],
+        "created_at": job['created_at'],
+        "counts": counts,
+        "items": [
+            {"index": item['item_index'], "status": item['status'], "attempts": item['attempts'],
+             "error": item['error'], "finished_at": item['finished_at']}
+            for item in items
+        ],
+    }
+
+
+class IssuanceWorkers:
+    """The queue consumers of one server process, started and stopped with the server."""
+
+    def __init__(self, app):
+        self.app = app
+        self.tasks = []
+        self.stopping = False
+
+    async def start(self):
+        global _wake
+        _wake = asyncio.Event()
+        self.stopping = False
+        self.tasks = [asyncio.create_task(self._run()) for _ in range(self.app.config["ISSUE_JOB_CONCURRENCY"])]
+
+    async def stop(self):
+        """Lets items in progress finish, then stops."""
+        self.stopping = True
+        _wake.set()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    async def _claim(self):
+        now = datetime.utcnow()
+        lease_expired_before = now - timedelta(seconds=self.app.config["ISSUE_JOB_LEASE"])
+        # Each claim and each item runs in its own app context, so each holds its own connection
+        async with self.app.app_context():
+            return await async_db.run_sync(get_storage().claim_issuance_items, 1, now, lease_expired_before,
+                                           self.app.config["ISSUE_JOB_MAX_ATTEMPTS"])
+
+    async def _run(self):
+        while not self.stopping:
+            _wake.clear()
+            try:
+                items = await self._claim()
+            except StorageError as err:
+                print(f"Issuance worker could not claim work: {err}")
+                items = []
+
+            if items:
+                await self._process(items[0])
+                continue
+            # Idle: woken by a job queued in this process, otherwise poll for other processes' jobs and due retries
+            try:
+                await asyncio.wait_for(_wake.wait(), self.app.config["ISSUE_JOB_POLL_INTERVAL"])
+            except asyncio.TimeoutError:
+                pass
+
+    async def _process(self, item):
+        from app.routes.issuer_routes import IssuanceRejected, issue_credential
+
+        config = self.app.config
+        async with self.app.app_context():
+            storage = get_storage()
+            try:
+                await issue_credential(item['issuer_id'], loads(item['payload']))
+                status, error = "created", None
+            except IssuanceRejected as e:
+                status, error = ("duplicate" if e.status_code == 409 else "error"), str(e)
+            except DuplicateError:
+                status, error = "duplicate", "This credential has already been issued (database constraint)."
+            except StatusListFull as e:
+                status, error = "error", str(e)
+            except Exception as e:
+                if item['attempts'] < config["ISSUE_JOB_MAX_ATTEMPTS"]:
+                    delay = config["ISSUE_JOB_RETRY_DELAY"] * 2 ** (item['attempts'] - 1)
+                    print(f"Issuance job {item['job_id']} item {item['item_index']} failed (attempt {item['attempts']}), retrying in {delay:g}s: {e}")
+                    try:
+                        held = await async_db.run_sync(storage.retry_issuance_item, item['item_id'], item['claimed_at'],
+                                                       str(e)[:ERROR_MAX_LENGTH], datetime.utcnow() + timedelta(seconds=delay))
+                    except StorageError as err:
+                        print(f"Could not requeue issuance item {item['item_id']} (its lease will expire): {err}")
+                        return
+                    if not held:
+                        print(f"Issuance item {item['item_id']} was not requeued: its lease expired and it was claimed again")
+                    return
+                status, error = "error", f"Failed after {item['attempts']} attempts: {e}"
+
+            try:
+                held = await async_db.run_sync(storage.finish_issuance_item, item['item_id'], item['claimed_at'], status,
+                                               error[:ERROR_MAX_LENGTH] if error else None, datetime.utcnow())
+            except StorageError as err:
+                print(f"Could not record the outcome of issuance item {item['item_id']} (its lease will expire): {err}")
+                return
+            if not held:
+                print(f"Outcome of issuance item {item['item_id']} not recorded: its lease expired and it was claimed again")
+
+
+def init_app(app):
+    if app.config["ISSUE_JOB_CONCURRENCY"] > 0:
+        workers = IssuanceWorkers(app)
+        app.before_serving(workers.start)
+        app.after_serving(workers.stop)
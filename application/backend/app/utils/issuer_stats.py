@@ -0,0 +1,28 @@
+"""
+Incrementally maintained issuer dashboard statistics.
+
+IssuerStats holds the counters shown on the dashboard, IssuerHolders the set of
+distinct holders per issuer (so "active students" can be kept without COUNT
+DISTINCT) and IssuerActivity a small ring of the most recent issuances. The
+storage backend updates them inside the transaction that inserts the
+credentials or revocations, so the counters never drift from the data.
+"""
+import click
+from quart.cli import with_appcontext
+
+from app.storage import get_storage
+
+def get_issuer_stats(issuer_id):
+    """Reads the dashboard counters and recent activity for one issuer (constant-size reads)."""
+    return get_storage().get_issuer_stats(issuer_id)
+
+def rebuild_issuer_stats():
+    """Recomputes every counter and activity ring from Credentials and Revocations."""
+    return get_storage().rebuild_issuer_stats()
+
+@click.command('rebuild-issuer-stats')
+@with_appcontext
+def rebuild_issuer_stats_command():
+    """CLI command to recompute the issuer dashboard statistics from scratch."""
+    issuers = rebuild_issuer_stats()
+    click.echo(click.style(f"Issuer statistics rebuilt for {issuers} issuer(s).", fg="green"))
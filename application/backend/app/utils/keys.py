@@ -0,0 +1,39 @@
+from collections import namedtuple
+
+import didkit
+
+from app import async_db
+from app.cache import TTLCache
+from app.config import Config
+from app.metrics import span
+from app.storage import get_storage
+
+# Parsed signing key plus everything didkit derives from it.
+KeyMaterial = namedtuple("KeyMaterial", ["jwk", "did", "verification_method"])
+
+# Keyed by user_id. Keys are only ever written for users that have none
+# (registration, provide_keys.py), so a cached entry can't go stale unless a
+# key is rotated, in which case invalidate_key_material() must be called.
+key_cache = TTLCache("key_material", maxsize=Config.KEY_CACHE_SIZE, ttl=Config.KEY_CACHE_TTL)
+
+async def derive_key_material(jwk_str):
+    """Computes the did:key DID and verification method for a JWK."""
+    with span("key_derivation"):
+        did = didkit.key_to_did("key", jwk_str)
+        verification_method = await didkit.key_to_verification_method("key", jwk_str)
+    return KeyMaterial(jwk_str, did, verification_method)
+
+async def get_key_material(user_id):
+    """Returns the cached KeyMaterial for a user, or None if the user has no key."""
+    material = key_cache.get(user_id)
+    if material is None:
+        private_key = await async_db.run_sync(get_storage().get_private_key, user_id)
+        if not private_key:
+            return None
+        material = await derive_key_material(private_key)
+        key_cache.set(user_id, material)
+    return material
+
+def invalidate_key_material(user_id):
+    """Drops the cached key material of a user whose key was (re)written."""
+    key_cache.invalidate(user_id)
@@ -0,0 +1,160 @@
+"""
+Bulk user and key provisioning.
+
+bcrypt hashing and Ed25519 key generation are CPU-bound, so they run on a
+process pool while the parent writes finished chunks with executemany, one
+transaction per chunk. Runs are resumable: users whose email already exists
+and users that already have a key are skipped, so an interrupted run can
+simply be started again with the same input.
+
+The engines work on any storage backend (see app/storage) and are shared by
+the CLI commands below and provide_keys.py.
+"""
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import bcrypt
+import click
+import didkit
+from quart import current_app
+from quart.cli import with_appcontext
+
+from app.storage import get_storage
+
+KEYED_ROLES = ('holder', 'issuer')
+
+# --- Input ---
+def read_users(path):
+    """Yields user dicts (email, password, role, username) from a CSV (with header) or NDJSON file."""
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith(('.ndjson', '.jsonl')):
+            records = (json.loads(line) for line in f if line.strip())
+        else:
+            records = csv.DictReader(f)
+        for record in records:
+            yield {
+                "email": (record.get("email") or "").strip(),
+                "password": record.get("password") or "",
+                "role": (record.get("role") or "holder").strip(),
+                "username": (record.get("username") or "").strip() or None,
+            }
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+# --- Process pool workers (module level so they can be pickled) ---
+def _prepare_user(record, rounds):
+    """Hashes the password and, for holders and issuers, generates the signing key."""
+    hashed = bcrypt.hashpw(record["password"].encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+    jwk = didkit.generate_ed25519_key() if record["role"] in KEYED_ROLES else None
+    return (record["username"], record["email"], hashed, record["role"], jwk)
+
+def _generate_key(user_id):
+    return (didkit.generate_ed25519_key(), user_id)
+
+class Throughput:
+    """Counts processed items and reports items per second."""
+
+    def __init__(self, label):
+        self.label = label
+        self.done = 0
+        self.started = time.perf_counter()
+
+    def add(self, count):
+        self.done += count
+
+    def rate(self):
+        elapsed = time.perf_counter() - self.started
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def report(self, extra=""):
+        print(f"  {self.done} {self.label} ({self.rate():.1f} {self.label}/s){extra}")
+
+# --- Engines ---
+def provision_users(storage, records, rounds=12, chunk_size=500, workers=None):
+    """
+    Creates the users in `records` that don't exist yet. Returns (created, skipped).
+    Existing emails are filtered out before hashing, so re-running after an
+    interruption only pays for the users that are still missing.
+    """
+    workers = workers or os.cpu_count() or 1
+    created = skipped = 0
+    progress = Throughput("users")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for chunk in _chunks(records, chunk_size):
+            valid = {r["email"]: r for r in chunk if r["email"] and r["password"]}
+            skipped += len(chunk) - len(valid)
+            for email in storage.existing_emails(valid):
+                del valid[email]
+                skipped += 1
+            if not valid:
+                continue
+
+            rows = list(pool.map(_prepare_user, valid.values(), [rounds] * len(valid),
+                                 chunksize=max(1, len(valid) // (4 * workers))))
+            # Rows raced in by another writer (duplicate email/username) are skipped
+            inserted = storage.insert_users(rows)
+            created += inserted
+            skipped += len(rows) - inserted
+            progress.add(len(rows))
+            progress.report(f", {skipped} skipped")
+    return created, skipped
+
+def backfill_keys(storage, chunk_size=500, workers=None):
+    """
+    Generates signing keys for every user that has none, in chunks. Returns the
+    number of keys written. Keys are only stored for users that still have
+    none, so a key written concurrently (e.g. by registration) is never overwritten.
+    """
+    written = 0
+    last_id = 0
+    progress = Throughput("keys")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            user_ids = storage.users_without_key(last_id, chunk_size)
+            if not user_ids:
+                break
+            last_id = user_ids[-1]
+
+            updates = list(pool.map(_generate_key, user_ids))
+            written += storage.set_missing_keys(updates)
+            progress.add(len(updates))
+            progress.report()
+    return written
+
+# --- CLI ---
+@click.command('provision-users')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--chunk-size', default=500, show_default=True)
+@click.option('--workers', type=int, default=None, help="Worker processes (defaults to the CPU count).")
+@with_appcontext
+def provision_users_command(path, chunk_size, workers):
+    """CLI command to bulk-create users from a CSV or NDJSON file."""
+    started = time.perf_counter()
+    created, skipped = provision_users(
+        get_storage(), read_users(path),
+        rounds=current_app.config["BCRYPT_ROUNDS"], chunk_size=chunk_size, workers=workers
+    )
+    elapsed = time.perf_counter() - started
+    click.echo(click.style(
+        f"Created {created} user(s), skipped {skipped} in {elapsed:.1f}s ({created / elapsed if elapsed else 0:.1f} users/s).",
+        fg="green"
+    ))
+
+@click.command('backfill-keys')
+@click.option('--chunk-size', default=500, show_default=True)
+@click.option('--workers', type=int, default=None, help="Worker processes (defaults to the CPU count).")
+@with_appcontext
+def backfill_keys_command(chunk_size, workers):
+    """CLI command to generate signing keys for users that have none."""
+    written = backfill_keys(get_storage(), chunk_size=chunk_size, workers=workers)
+    click.echo(click.style(f"Generated {written} key(s).", fg="green"))
@@ -0,0 +1,236 @@
+"""
+SD-JWT credentials: selective disclosure that keeps the issuer's signature.
+
+An SD-JWT credential is `<issuer JWT>~<disclosure>~...~<disclosure>~`. The
+issuer JWT is a VC-JWT signed by didkit (EdDSA with the issuer's did:key) whose
+credentialSubject carries no claim values, only `_sd`: the digests of the
+disclosures. A disclosure is base64url(JSON [salt, name, value]) and its digest
+is base64url(SHA-256(disclosure)); the random salt keeps claims from being
+guessed from their digests.
+
+A holder presents a subset of the claims by dropping disclosures, so the issuer
+JWT is passed on untouched and presenting costs no signature. Optionally the
+presentation ends with a key-binding JWT instead of the empty last part: a
+VP-JWT signed with the holder's did:key (the credential's subject) over the
+verifier's nonce and audience and the `sd_hash` of everything before it.
+
+A verifier checks the issuer JWT once (the result is cached per credential by
+verification_cache) and then only hashes disclosures and matches them against
+`_sd`. The signature only authenticates the JWT's `iss`, so the credential's
+issuer and subject must equal the JWT's `iss` and `sub`.
+"""
+import base64
+import hashlib
+import re
+import secrets
+
+from app.json_provider import dumps, loads
+from app.metrics import span
+from app.utils.batch_verify import batch_verifier
+from app.utils.crypto_pool import get_crypto_pool
+from app.utils.verification_cache import verification_cache
+
+FORMAT = "vc+sd-jwt"
+CATEGORY = "SD-JWT"  # Credentials.category of stored SD-JWT credentials
+SD_ALG = "sha-256"
+SALT_BYTES = 16
+BASE64URL_RE = re.compile(r'[A-Za-z0-9_-]+\Z')
+COMPACT_JWT_RE = re.compile(r'[A-Za-z0-9_-]+\.[A-Za-z0-9_-]+\.[A-Za-z0-9_-]+\Z')
+
+class SDJWTError(ValueError):
+    """Raised when an SD-JWT is malformed."""
+
+
+def _b64encode(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+def digest(text):
+    """The `_sd` digest of a disclosure (or the sd_hash of a presentation)."""
+    return _b64encode(hashlib.sha256(text.encode("ascii")).digest())
+
+def make_disclosure(name, value):
+    """Returns a salted disclosure for one claim."""
+    return _b64encode(dumps([_b64encode(secrets.token_bytes(SALT_BYTES)), name, value]).encode("utf-8"))
+
+def decode_disclosure(disclosure):
+    """Returns (name, value) of a disclosure."""
+    try:
+        salt, name, value = loads(_b64decode(disclosure))
+    except (TypeError, ValueError) as e:
+        raise SDJWTError(f"Malformed disclosure: {str(e)}") from e
+    if not isinstance(name, str) or name in ("_sd", "id"):
+        raise SDJWTError(f"Disclosure has an invalid claim name: {name!r}")
+    return name, value
+
+def decode_jwt_payload(jwt):
+    """Returns the payload of a compact JWS without checking its signature."""
+    try:
+        payload = loads(_b64decode(jwt.split(".")[1]))
+    except (IndexError, TypeError, ValueError) as e:
+        raise SDJWTError(f"Malformed JWT: {str(e)}") from e
+    if not isinstance(payload, dict):
+        raise SDJWTError("Malformed JWT: payload is not an object")
+    return payload
+
+def split(token):
+    """Splits an SD-JWT into (issuer JWT, disclosures, key-binding JWT or None)."""
+    parts = token.strip().split("~")
+    if len(parts) < 2 or not COMPACT_JWT_RE.match(parts[0]):
+        raise SDJWTError("Not an SD-JWT: expected '<issuer JWT>~<disclosures>~[<key binding JWT>]'")
+    disclosures, kb_jwt = parts[1:-1], parts[-1] or None
+    # Everything that gets hashed must be base64url text
+    if not all(BASE64URL_RE.match(d) for d in disclosures):
+        raise SDJWTError("Malformed disclosure: not base64url")
+    if kb_jwt is not None and not COMPACT_JWT_RE.match(kb_jwt):
+        raise SDJWTError("Malformed key binding JWT")
+    return parts[0], disclosures, kb_jwt
+
+
+# --- Issuance ---
+async def issue(vc_payload, issuer_key):
+    """Signs `vc_payload` as an SD-JWT with every credentialSubject claim except `id` selectively disclosable."""
+    subject = dict(vc_payload["credentialSubject"])
+    disclosures = [make_disclosure(name, value) for name, value in subject.items() if name != "id"]
+
+    payload = dict(vc_payload, _sd_alg=SD_ALG)
+    payload["credentialSubject"] = {"id": subject.get("id"), "_sd": sorted(digest(d) for d in disclosures)}
+    proof_options = {"proofFormat": "jwt", "proofPurpose": "assertionMethod", "verificationMethod": issuer_key.verification_method}
+    with span("sign"):
+        issuer_jwt = await get_crypto_pool().issue_credential(dumps(payload), dumps(proof_options), issuer_key.jwk)
+    return "~".join([issuer_jwt, *disclosures, ""])
+
+def credential_of(token):
+    """The VC of an SD-JWT with all of its disclosures applied, without any verification."""
+    issuer_jwt, disclosures, _ = split(token)
+    vc = dict(decode_jwt_payload(issuer_jwt).get("vc") or {})
+    vc.pop("_sd_alg", None)
+    subject = {k: v for k, v in (vc.get("credentialSubject") or {}).items() if k != "_sd"}
+    subject.update(decode_disclosure(d) for d in disclosures)
+    vc["credentialSubject"] = subject
+    return vc
+
+
+# --- Presentation ---
+def present(token, fields):
+    """Keeps only the disclosures of the claims named in `fields`. No signature is involved."""
+    issuer_jwt, disclosures, _ = split(token)
+    wanted = set(fields)
+    kept = [d for d in disclosures if decode_disclosure(d)[0] in wanted]
+    return "~".join([issuer_jwt, *kept, ""])
+
+async def bind_key(presentation, holder_key, nonce, audience):
+    """Appends a key-binding JWT signed by the holder over the verifier's nonce and audience."""
+    vp = {
+        "@context": ["https://www.w3.org/2018/credentials/v1"],
+        "type": ["VerifiablePresentation"],
+        "holder": holder_key.did,
+        "sd_hash": digest(presentation),
+    }
+    proof_options = {"proofFormat": "jwt", "proofPurpose": "authentication", "verificationMethod": holder_key.verification_method,
+                     "challenge": nonce, "domain": audience}
+    with span("sign_presentation"):
+        kb_jwt = await get_crypto_pool().issue_presentation(dumps(vp), dumps(proof_options), holder_key.jwk)
+    return presentation + kb_jwt
+
+
+# --- Verification ---
+async def _verify_issuer_jwt(issuer_jwt, credential_id):
+    proof_options = {"proofFormat": "jwt"}
+
+    async def check():
+        with span("didkit_verify"):
+            result_obj = loads(await batch_verifier.verify("verify_credential", issuer_jwt, dumps(proof_options)))
+        return {"verified": not result_obj.get("errors"), "errors": result_obj.get("errors", [])}
+
+    # Keyed by the issuer JWT alone: every presentation of a credential shares one check
+    return await verification_cache.get_or_verify({"id": credential_id, "jwt": issuer_jwt}, proof_options, check)
+
+async def _verify_key_binding(kb_jwt, presented, subject_id, nonce, audience):
+    """Returns the errors of the key-binding JWT (empty if it holds)."""
+    claims = decode_jwt_payload(kb_jwt)
+    if nonce is not None and claims.get("nonce") != nonce:
+        return ["Key binding nonce does not match."]
+    if audience is not None and claims.get("aud") != audience:
+        return ["Key binding audience does not match."]
+    # didkit only accepts a VP-JWT against an expected challenge and domain. Without the
+    # verifier's own values this proves the signature, not freshness.
+    proof_options = {"proofFormat": "jwt", "challenge": claims.get("nonce"), "domain": claims.get("aud")}
+    with span("didkit_verify"):
+        result_obj = loads(await batch_verifier.verify("verify_presentation", kb_jwt, dumps(proof_options)))
+    if result_obj.get("errors"):
+        return result_obj["errors"]
+    if not subject_id or claims.get("iss") != subject_id:
+        return ["Key binding is not signed by the credential subject."]
+    if (claims.get("vp") or {}).get("sd_hash") != digest(presented):
+        return ["Key binding does not cover this presentation."]
+    return []
+
+async def verify(token, nonce=None, audience=None):
+    """
+    Verifies an SD-JWT credential or presentation and returns
+    {"verified": bool, "errors": [...]} plus the disclosed "credential" when it
+    verifies. Passing `nonce` (and `audience`) makes key binding mandatory.
+    """
+    try:
+        issuer_jwt, disclosures, kb_jwt = split(token)
+        claims = decode_jwt_payload(issuer_jwt)
+        vc = claims.get("vc")
+        if not isinstance(vc, dict) or not isinstance(vc.get("credentialSubject"), dict):
+            raise SDJWTError("Issuer JWT does not carry a credential.")
+        # The signature only proves who `iss` is: the credential must name the same issuer and subject
+        issuer = vc.get("issuer")
+        if (issuer.get("id") if isinstance(issuer, dict) else issuer) != claims.get("iss"):
+            raise SDJWTError("The credential's issuer is not the signer of the issuer JWT.")
+        if vc["credentialSubject"].get("id") != claims.get("sub"):
+            raise SDJWTError("The credential's subject does not match the issuer JWT.")
+    except SDJWTError as e:
+        return {"verified": False, "errors": [str(e)]}
+
+    # 1. Issuer signature
+    result = await _verify_issuer_jwt(issuer_jwt, vc.get("id"))
+    if not result["verified"]:
+        return result
+
+    # 2. Every disclosure must match a distinct digest signed by the issuer
+    errors = []
+    subject = {k: v for k, v in vc["credentialSubject"].items() if k != "_sd"}
+    if vc.get("_sd_alg", SD_ALG) != SD_ALG:
+        errors.append(f"Unsupported _sd_alg: {vc.get('_sd_alg')}")
+    signed_digests = set(vc["credentialSubject"].get("_sd") or [])
+    seen = set()
+    with span("sd_jwt_disclose"):
+        for disclosure in disclosures:
+            disclosure_digest = digest(disclosure)
+            if disclosure_digest not in signed_digests or disclosure_digest in seen:
+                errors.append("A disclosure does not match the issuer's digests.")
+                continue
+            seen.add(disclosure_digest)
+            try:
+                name, value = decode_disclosure(disclosure)
+            except SDJWTError as e:
+                errors.append(str(e))
+                continue
+            if name in subject:
+                errors.append(f"Claim '{name}' is disclosed more than once.")
+                continue
+            subject[name] = value
+
+    # 3. Key binding
+    if kb_jwt:
+        presented = token.strip()[:-len(kb_jwt)]
+        try:
+            errors += await _verify_key_binding(kb_jwt, presented, subject.get("id"), nonce, audience)
+        except SDJWTError as e:
+            errors.append(str(e))
+    elif nonce is not None or audience is not None:
+        errors.append("Key binding is required but the presentation has none.")
+
+    if errors:
+        return {"verified": False, "errors": errors}
+    credential = {k: v for k, v in vc.items() if k != "_sd_alg"}
+    credential["issuer"] = dict(issuer, id=claims["iss"]) if isinstance(issuer, dict) else claims["iss"]
+    credential["credentialSubject"] = subject
+    return {"verified": True, "errors": [], "credential": credential}
@@ -0,0 +1,202 @@
+"""
+StatusList2021-style revocation lists.
+
+Every issuer owns one bitstring (StatusLists.bits). Each credential issued by
+issue_vc gets a position in it (Credentials.status_list_index) that is embedded
+in the signed VC as a `credentialStatus` entry. Revoking a credential flips its
+bit. The list is served as a signed StatusList2021Credential with an ETag, and
+the verifier checks status against a decoded in-memory copy, so a revocation
+check is a bit lookup rather than a query.
+"""
+import asyncio
+import base64
+import gzip
+import threading
+from datetime import datetime
+
+from quart import current_app
+
+from app import async_db
+from app.cache import TTLCache
+from app.config import Config
+from app.storage import get_storage
+
+STATUS_LIST_CONTEXT = "https://w3id.org/vc/status-list/2021/v1"
+
+
+class StatusListFull(Exception):
+    """Raised when an issuer's status list has no free positions left."""
+
+
+# --- Bitstring helpers (bit 0 is the most significant bit of the first byte) ---
+def get_bit(bits, index):
+    byte = index // 8
+    return byte < len(bits) and bool(bits[byte] & (0x80 >> (index % 8)))
+
+def set_bit(bits, index):
+    bits[index // 8] |= 0x80 >> (index % 8)
+
+def encode_list(bits):
+    """GZIP-compresses and base64url-encodes a bitstring for `encodedList`."""
+    return base64.urlsafe_b64encode(gzip.compress(bytes(bits), mtime=0)).decode('ascii').rstrip('=')
+
+def status_list_url(issuer_id):
+    return f"{current_app.config['PUBLIC_BASE_URL'].rstrip('/')}/api/issuer/status/{issuer_id}"
+
+def credential_status_entry(issuer_id, index):
+    """The `credentialStatus` object embedded in a VC at issuance."""
+    list_url = status_list_url(issuer_id)
+    return {
+        "id": f"{list_url}#{index}",
+        "type": "StatusList2021Entry",
+        "statusPurpose": "revocation",
+        "statusListIndex": str(index),
+        "statusListCredential": list_url
+    }
+
+# --- Storage access (blocking; call through async_db.run_sync from async routes) ---
+def allocate_indexes(issuer_id, count=1):
+    """
+    Reserves `count` consecutive positions in the issuer's list and returns the
+    first one. Runs as its own short transaction so concurrent issuances never
+    share a position; positions of credentials that fail to sign are simply left unused.
+    """
+    size = current_app.config["STATUS_LIST_SIZE"]
+    first = get_storage().allocate_status_indexes(issuer_id, count, size)
+    if first is None:
+        raise StatusListFull(f"Status list of issuer {issuer_id} is full ({size} entries).")
+    return first
+
+def load_status_list(issuer_id):
+    """Returns (bits, revision) for an issuer, or (empty list, 0) if nothing was revoked yet."""
+    size = current_app.config["STATUS_LIST_SIZE"]
+    stored, revision = get_storage().load_status_list(issuer_id)
+    bits = bytearray(stored or b'')
+    bits.extend(b'\x00' * (size // 8 - len(bits)))
+    return bits, revision
+
+
+class StatusListCache:
+    """
+    Decoded status lists kept in memory per issuer, at most `maxsize` of them.
+    Revocations made by this process update the copy immediately; changes made
+    by other workers are picked up once an entry is older than `ttl` seconds.
+    """
+
+    def __init__(self, maxsize, ttl):
+        # Entries are [bits, revision] so a revocation updates them in place without resetting their age
+        self._lists = TTLCache("status_lists", maxsize=maxsize, ttl=ttl)
+        self._documents = TTLCache("status_list_documents", maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def get(self, issuer_id):
+        """Returns (bits, revision) if a fresh copy is cached, otherwise None."""
+        entry = self._lists.get(issuer_id)
+        if entry is None:
+            return None
+        with self._lock:
+            return entry[0], entry[1]
+
+    def put(self, issuer_id, bits, revision):
+        self._lists.set(issuer_id, [bits, revision])
+
+    def revoke(self, issuer_id, index, revision):
+        entry = self._lists.get(issuer_id)
+        if entry:
+            with self._lock:
+                set_bit(entry[0], index)
+                entry[1] = revision
+
+    # Signed list documents, keyed by (issuer_id, revision). The revision check keeps them
+    # correct; the TTL only lets documents of issuers nobody asks for any more go.
+    def get_document(self, issuer_id, revision):
+        cached = self._documents.get(issuer_id)
+        return cached[1] if cached and cached[0] == revision else None
+
+    def put_document(self, issuer_id, revision, document):
+        self._documents.set(issuer_id, (revision, document))
+
+
+status_list_cache = StatusListCache(maxsize=Config.STATUS_LIST_CACHE_SIZE, ttl=Config.STATUS_LIST_TTL)
+
+def get_status_list(issuer_id):
+    """
+    Blocking: returns the decoded (bits, revision) for an issuer, from memory when
+    fresh, or None if `issuer_id` is not an issuer (nothing is cached for it then).
+    """
+    cached = status_list_cache.get(issuer_id)
+    if cached is None:
+        user = get_storage().get_user(issuer_id)
+        if not user or user['role'] != 'issuer':
+            return None
+        cached = load_status_list(issuer_id)
+        status_list_cache.put(issuer_id, *cached)
+    return cached
+
+def build_status_list_credential(issuer_id, issuer_did, bits):
+    """Unsigned StatusList2021Credential for an issuer's list."""
+    list_url = status_list_url(issuer_id)
+    return {
+        "@context": ["https://www.w3.org/2018/credentials/v1", STATUS_LIST_CONTEXT],
+        "id": list_url,
+        "type": ["VerifiableCredential", "StatusList2021Credential"],
+        "issuer": issuer_did,
+        "issuanceDate": datetime.utcnow().isoformat() + "Z",
+        "credentialSubject": {
+            "id": f"{list_url}#list",
+            "type": "StatusList2021",
+            "statusPurpose": "revocation",
+            "encodedList": encode_list(bits)
+        }
+    }
+
+def status_entries(payload):
+    """Yields (issuer_id, index, entry_id) for every StatusList2021Entry of this server in a VC or in the VCs of a VP."""
+    prefix = status_list_url("")
+    documents = [payload]
+    embedded = payload.get("verifiableCredential") or []
+    documents += [embedded] if isinstance(embedded, dict) else list(embedded)
+    for document in documents:
+        status = document.get("credentialStatus") if isinstance(document, dict) else None
+        if not isinstance(status, dict) or status.get("type") != "StatusList2021Entry":
+            continue
+        list_url = str(status.get("statusListCredential", ""))
+        issuer_part = list_url[len(prefix):] if list_url.startswith(prefix) else ""
+        index = str(status.get("statusListIndex", ""))
+        if issuer_part.isdigit() and index.isdigit():
+            yield int(issuer_part), int(index), status.get("id")
+
+# Issuers whose lists were looked up and do not exist, so repeated lookups don't reach the database
+unknown_issuers = TTLCache("status_list_unknown_issuers", maxsize=Config.STATUS_LIST_CACHE_SIZE, ttl=Config.STATUS_LIST_TTL)
+_loading = {}
+
+async def _load_status_list(issuer_id):
+    # verify_batch checks many documents of one request at once: each load gets an app
+    # context, and so a connection, of its own instead of sharing the request's
+    async with current_app.app_context():
+        cached = await async_db.run_sync(get_status_list, issuer_id)
+    if cached is None:
+        unknown_issuers.set(issuer_id, True)
+    return cached
+
+async def cached_status_list(issuer_id):
+    """Like get_status_list, for async callers; concurrent lookups of one issuer share a single load."""
+    cached = status_list_cache.get(issuer_id)
+    if cached is not None or unknown_issuers.get(issuer_id):
+        return cached
+    task = _loading.get(issuer_id)
+    if task is None:
+        task = _loading[issuer_id] = asyncio.ensure_future(_load_status_list(issuer_id))
+        task.add_done_callback(lambda _: _loading.pop(issuer_id, None))
+    # Shielded so a caller that goes away doesn't cancel the load for the others
+    return await asyncio.shield(task)
+
+async def revoked_entries(payload):
+    """Returns the ids of the status entries in `payload` whose revocation bit is set."""
+    revoked = []
+    for issuer_id, index, entry_id in status_entries(payload):
+        cached = await cached_status_list(issuer_id)
+        # Entries naming an unknown issuer have no list to be revoked in
+        if cached and get_bit(cached[0], index):
+            revoked.append(entry_id)
+    return revoked
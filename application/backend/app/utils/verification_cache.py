@@ -0,0 +1,99 @@
+import asyncio
+import hashlib
+import json
+import threading
+from concurrent.futures import Future
+
+from app.cache import TTLCache
+from app.config import Config
+
+
+def document_digest(payload, proof_options):
+    """SHA-256 of the canonical JSON form of a document plus its proof options."""
+    canonical = json.dumps([payload, proof_options], sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def credential_ids(payload):
+    """Ids of the document and of any credentials embedded in a presentation."""
+    ids = set()
+    if payload.get("id"):
+        ids.add(payload["id"])
+    embedded = payload.get("verifiableCredential") or []
+    if isinstance(embedded, dict):
+        embedded = [embedded]
+    for vc in embedded:
+        if isinstance(vc, dict) and vc.get("id"):
+            ids.add(vc["id"])
+    return frozenset(ids)
+
+
+class _LeaderCancelled(Exception):
+    """Passed to the followers of a check whose leader was cancelled."""
+
+
+class VerificationCache:
+    """
+    Caches verification results by document digest and collapses concurrent
+    checks of the same document into one (single-flight). Waiters may sit on
+    different event loops, so the in-flight result is shared through a
+    thread-safe concurrent.futures.Future.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self._results = TTLCache("verification", maxsize=maxsize, ttl=ttl)
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.collapsed = 0
+
+    async def get_or_verify(self, payload, proof_options, verify):
+        """Returns the cached result for `payload`, or awaits `verify()` exactly once to produce it."""
+        key = document_digest(payload, proof_options)
+        while True:
+            cached = self._results.get(key)
+            if cached is not None:
+                return dict(cached[1])
+
+            with self._lock:
+                future = self._in_flight.get(key)
+                leader = future is None
+                if leader:
+                    future = self._in_flight[key] = Future()
+                    # Running futures can't be cancelled: a follower that goes away must not cancel the others
+                    future.set_running_or_notify_cancel()
+                else:
+                    self.collapsed += 1
+
+            if not leader:
+                try:
+                    return dict(await asyncio.wrap_future(future))
+                except _LeaderCancelled:
+                    # The leader's request went away before the check finished: retry, possibly as the leader
+                    continue
+
+            try:
+                result = await verify()
+            except asyncio.CancelledError:
+                # Only the leader's own request is cancelled; its followers start a new check
+                self._forget(key)
+                future.set_exception(_LeaderCancelled())
+                raise
+            except BaseException as e:
+                self._forget(key)
+                future.set_exception(e)
+                raise
+            self._results.set(key, (credential_ids(payload), result))
+            self._forget(key)
+            future.set_result(result)
+            return dict(result)
+
+    def _forget(self, key):
+        # Before the future completes, so a retrying follower never finds the finished future
+        with self._lock:
+            self._in_flight.pop(key, None)
+
+    def evict_credential(self, credential_id):
+        """Drops every cached result that involves the given credential id (e.g. on revocation)."""
+        return self._results.invalidate_where(lambda entry: credential_id in entry[0])
+
+
+verification_cache = VerificationCache(Config.VERIFY_CACHE_SIZE, Config.VERIFY_CACHE_TTL)
@@ -0,0 +1,58 @@
+"""
+Per-process warm-up, run once by every server process before it accepts traffic.
+
+The first requests a fresh worker serves would otherwise pay for opening DB
+connections, starting the executors and crypto workers and deriving issuer key
+material (which also spins up didkit's runtime). Everything here is created lazily, so running
+it in `before_serving` does it inside the worker, after the production launcher
+has forked, and never in the master process. A failure is logged and the worker
+starts cold instead of refusing to serve.
+"""
+import time
+
+from quart import current_app
+
+from . import async_db
+from .storage import get_storage, StorageError
+from .utils.crypto import get_password_hasher
+from .utils.crypto_pool import get_crypto_pool
+from .utils.keys import get_key_material
+
+
+async def warm_up():
+    started = time.perf_counter()
+    storage = get_storage()
+
+    # 1. Start the DB and bcrypt executors and the crypto workers, and open pooled connections
+    async_db.get_executor()
+    get_password_hasher()
+    try:
+        await get_crypto_pool().start()
+    except Exception as e:
+        print(f"Warm-up: could not start the crypto workers: {str(e)}")
+    try:
+        connections = await async_db.run_sync(storage.prewarm, current_app.config["WARMUP_DB_CONNECTIONS"])
+    except StorageError as err:
+        print(f"Warm-up: could not open database connections: {err}")
+        return
+
+    # 2. Load issuer key material into the key cache
+    loaded = 0
+    try:
+        issuer_ids = await async_db.run_sync(storage.issuers_with_keys, current_app.config["WARMUP_KEYS"])
+        for issuer_id in issuer_ids:
+            if await get_key_material(issuer_id):
+                loaded += 1
+    except Exception as e:
+        print(f"Warm-up: could not load issuer keys: {str(e)}")
+    finally:
+        # The lookups ran in the serving app context, not a request; hand its connection back
+        storage.release()
+
+    print(f"Warm-up: {connections} DB connections opened, {loaded} issuer keys cached "
+          f"in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+
+def init_app(app):
+    if app.config["WARMUP_ON_START"]:
+        app.before_serving(warm_up)
@@ -0,0 +1,379 @@
+"""
+End-to-end benchmarks for the hot API paths.
+
+Builds the app with create_app() against a throwaway embedded SQLite database,
+seeds an issuer, holders and credentials, then drives each scenario with a
+pool of client threads, either in-process through the Quart test client or over
+HTTP against uvicorn. Reports throughput and p50/p95/p99 latency per scenario
+and writes everything (plus the git commit and settings) to a JSON file so runs
+can be compared across commits:
+
+    python benchmarks/bench.py --requests 500 --concurrency 16
+    python benchmarks/bench.py --transport uvicorn --scenarios login,verify
+    python benchmarks/bench.py --baseline benchmarks/results/<previous>.json
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BACKEND_DIR)
+
+SCENARIOS = ["login", "issue_vc", "create_presentation", "create_presentation_sd_jwt", "upload", "verify",
+             "verify_uncached", "verify_sd_jwt", "list_credentials"]
+PASSWORD = "bench-password"
+
+
+# --- Transports ---
+_loop = None
+_loop_lock = threading.Lock()
+
+def shared_loop():
+    """One event loop on a background thread that serves every in-process request, as a server would."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, daemon=True).start()
+    return _loop
+
+
+class InProcessClient:
+    """Calls the ASGI app through the Quart test client on the shared loop (one client per thread)."""
+
+    def __init__(self, app):
+        self._client = app.test_client()
+
+    async def _send(self, method, path, body, headers):
+        headers = dict(headers or {}, **{"Content-Type": "application/json"})
+        response = await self._client.open(path, method=method, data=body or "", headers=headers)
+        return response.status_code, await response.get_data()
+
+    def request(self, method, path, body=None, headers=None):
+        return asyncio.run_coroutine_threadsafe(self._send(method, path, body, headers), shared_loop()).result()
+
+
+class HTTPClient:
+    """Keep-alive HTTP/1.1 connection to a running server (one connection per thread)."""
+
+    def __init__(self, port):
+        self._conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {}, **{"Content-Type": "application/json"})
+        self._conn.request(method, path, body=body, headers=headers)
+        response = self._conn.getresponse()
+        return response.status, response.read()
+
+
+def start_uvicorn(app):
+    """Serves the app on a free local port from a background thread. Returns (server, port)."""
+    import uvicorn
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, port
+
+
+# --- Dataset ---
+def make_token(app, user_id, role):
+    import jwt
+    payload = {'user_id': user_id, 'role': role, 'exp': datetime.utcnow() + timedelta(days=1)}
+    return "Bearer " + jwt.encode(payload, app.config['SECRET_KEY'], algorithm="HS256")
+
+def subject(holder_email, grade, nonce):
+    return {"holder_email": holder_email, "name": "Bench Holder", "course": "Benchmark Engineering",
+            "grade": f"{nonce}-{grade}", "completionDate": "2024-06-30"}
+
+async def _sign_documents(app, count, holder_id):
+    """Signs `count` unique VCs with the issuer key without storing them (for upload / uncached verify)."""
+    from app.routes.issuer_routes import build_vc_payload, sign_credential
+    from app.utils.keys import get_key_material
+
+    issuer_key = await get_key_material(1)
+    nonce = uuid.uuid4().hex[:8]
+    payloads = [build_vc_payload(issuer_key.did, holder_id, subject("", i, nonce)) for i in range(count)]
+    # Stay within the crypto pool's admission limit
+    semaphore = asyncio.Semaphore(app.config["CRYPTO_MAX_QUEUE"])
+
+    async def sign(payload):
+        async with semaphore:
+            return await sign_credential(payload, issuer_key)
+
+    return list(await asyncio.gather(*(sign(p) for p in payloads)))
+
+def seed(app, holders, credentials_per_holder, documents):
+    """Creates the issuer (user 1, also used for imported documents), holders and their credentials."""
+    print(f"Seeding {holders} holder(s) with {credentials_per_holder} credential(s) each...")
+    return asyncio.run_coroutine_threadsafe(_seed(app, holders, credentials_per_holder, documents), shared_loop()).result()
+
+async def _seed(app, holders, credentials_per_holder, documents):
+    import bcrypt
+    import didkit
+    from app.storage import get_storage
+
+    async with app.app_context():
+        storage = get_storage()
+        storage.migrate()
+        password_hash = bcrypt.hashpw(PASSWORD.encode('utf-8'),
+                                      bcrypt.gensalt(app.config["BCRYPT_ROUNDS"])).decode('utf-8')
+        storage.insert_users([("bench-issuer", "issuer@bench.local", password_hash, "issuer", didkit.generate_ed25519_key())])
+        storage.insert_users([
+            (None, f"holder{i}@bench.local", password_hash, "holder", didkit.generate_ed25519_key())
+            for i in range(holders)
+        ])
+        holder_ids = storage.find_holders([f"holder{i}@bench.local" for i in range(holders)])
+
+    client = app.test_client()
+    issuer_auth = {"Authorization": make_token(app, 1, "issuer")}
+    batch_size = app.config["ISSUE_BATCH_MAX_ITEMS"]
+    nonce = uuid.uuid4().hex[:8]
+    items = [subject(f"holder{h}@bench.local", c, nonce) for h in range(holders) for c in range(credentials_per_holder)]
+    for start in range(0, len(items), batch_size):
+        response = await client.post("/api/issuer/issue_vc_batch", json={"credentials": items[start:start + batch_size]},
+                                     headers=issuer_auth)
+        assert response.status_code == 200, await response.get_data(as_text=True)
+
+    # One SD-JWT credential for the selective-disclosure scenarios
+    response = await client.post("/api/issuer/issue_vc", json=dict(subject("holder0@bench.local", 0, "sd-" + nonce), format="vc+sd-jwt"),
+                                 headers=issuer_auth)
+    assert response.status_code == 201, await response.get_data(as_text=True)
+
+    first_holder = holder_ids["holder0@bench.local"]
+    async with app.app_context():
+        recent = get_storage().list_holder_credentials(first_holder, full=False, limit=2)
+        sample = [row for row in recent if row["category"] == "VC"]
+        sd_jwt_credential = next((row for row in recent if row["category"] == "SD-JWT"), None)
+        signed = await _sign_documents(app, documents, first_holder) if documents else []
+    return {
+        "holder_ids": holder_ids,
+        "holder_auth": {"Authorization": make_token(app, first_holder, "holder")},
+        "issuer_auth": issuer_auth,
+        "sample_cred_id": sample[0]["cred_id"] if sample else None,
+        "sd_jwt_cred_id": sd_jwt_credential["cred_id"] if sd_jwt_credential else None,
+        "sd_jwt_presentation": await _present_sd_jwt(app, client, sd_jwt_credential, first_holder),
+        "signed_documents": signed,
+    }
+
+
+async def _present_sd_jwt(app, client, credential, holder_id):
+    """A two-claim SD-JWT presentation of `credential` for the verify_sd_jwt scenario."""
+    if not credential:
+        return None
+    body = {"cred_id": credential["cred_id"], "disclosure_frame": {"credentialSubject": ["name", "course"]}}
+    response = await client.post("/api/holder/create_presentation", json=body,
+                                 headers={"Authorization": make_token(app, holder_id, "holder")})
+    return json.dumps((await response.get_json())["presentation"])
+
+# --- Scenarios ---
+def build_requests(name, count, dataset, holders):
+    """Returns [(method, path, body, headers)] for one scenario; bodies are pre-serialised."""
+    nonce = uuid.uuid4().hex[:8]
+    documents = iter(dataset["signed_documents"])
+    requests = []
+    for i in range(count):
+        if name == "login":
+            body = {"email": f"holder{i % holders}@bench.local", "password": PASSWORD}
+            requests.append(("POST", "/api/login", json.dumps(body), {}))
+        elif name == "issue_vc":
+            body = subject(f"holder{i % holders}@bench.local", i, nonce)
+            requests.append(("POST", "/api/issuer/issue_vc", json.dumps(body), dataset["issuer_auth"]))
+        elif name == "create_presentation":
+            body = {"cred_id": dataset["sample_cred_id"], "disclosure_frame": {"credentialSubject": ["name", "course"]}}
+            requests.append(("POST", "/api/holder/create_presentation", json.dumps(body), dataset["holder_auth"]))
+        elif name == "create_presentation_sd_jwt":
+            body = {"cred_id": dataset["sd_jwt_cred_id"], "disclosure_frame": {"credentialSubject": ["name", "course"]}}
+            requests.append(("POST", "/api/holder/create_presentation", json.dumps(body), dataset["holder_auth"]))
+        elif name == "upload":
+            requests.append(("POST", "/api/holder/upload", next(documents), dataset["holder_auth"]))
+        elif name == "verify":
+            requests.append(("POST", "/api/verifier/verify", dataset["signed_documents"][0], {}))
+        elif name == "verify_uncached":
+            requests.append(("POST", "/api/verifier/verify", next(documents), {}))
+        elif name == "verify_sd_jwt":
+            requests.append(("POST", "/api/verifier/verify", dataset["sd_jwt_presentation"], {}))
+        elif name == "list_credentials":
+            requests.append(("GET", "/api/holder/list_credentials?limit=50", None, dataset["holder_auth"]))
+    return requests
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+def run_scenario(make_client, requests, concurrency, expected_status):
+    """Sends `requests` from `concurrency` threads and returns the latency summary."""
+    local = threading.local()
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def send(req):
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = make_client()
+        method, path, body, headers = req
+        started = time.perf_counter()
+        status, _ = client.request(method, path, body, headers)
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    wall_started = time.perf_counter()
+    cpu_started = time.process_time()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(send, requests))
+    cpu = time.process_time() - cpu_started
+    wall = time.perf_counter() - wall_started
+
+    latencies.sort()
+    ms = lambda seconds: round(seconds * 1000, 3)
+    return {
+        "requests": len(requests),
+        "concurrency": concurrency,
+        "errors": sum(count for status, count in statuses.items() if status != expected_status),
+        "status_codes": {str(status): count for status, count in sorted(statuses.items())},
+        "throughput_rps": round(len(requests) / wall, 2) if wall else 0.0,
+        # Process CPU (all threads, client included when in-process) divided by requests
+        "cpu_ms_per_request": ms(cpu / len(requests)) if requests else 0.0,
+        "latency_ms": {
+            "mean": ms(sum(latencies) / len(latencies)) if latencies else 0.0,
+            "p50": ms(percentile(latencies, 50)),
+            "p95": ms(percentile(latencies, 95)),
+            "p99": ms(percentile(latencies, 99)),
+            "max": ms(latencies[-1]) if latencies else 0.0,
+        },
+    }
+
+EXPECTED_STATUS = {"login": 200, "issue_vc": 201, "create_presentation": 200, "create_presentation_sd_jwt": 200,
+                   "upload": 201, "verify": 200, "verify_uncached": 200, "verify_sd_jwt": 200, "list_credentials": 200}
+
+
+# --- Reporting ---
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_table(results, baseline=None):
+    header = f"{'scenario':<28}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'cpu ms':>10}{'errors':>8}"
+    print("\n" + header + ("   vs baseline (rps / p95 / cpu)" if baseline else ""))
+    print("-" * len(header))
+    for name, r in results.items():
+        line = (f"{name:<28}{r['throughput_rps']:>10.1f}{r['latency_ms']['p50']:>10.2f}"
+                f"{r['latency_ms']['p95']:>10.2f}{r['latency_ms']['p99']:>10.2f}{r.get('cpu_ms_per_request', 0.0):>10.3f}{r['errors']:>8}")
+        base = (baseline or {}).get(name)
+        if base and base["throughput_rps"] and base["latency_ms"]["p95"]:
+            rps_delta = (r["throughput_rps"] / base["throughput_rps"] - 1) * 100
+            p95_delta = (r["latency_ms"]["p95"] / base["latency_ms"]["p95"] - 1) * 100
+            line += f"   {rps_delta:+.1f}% / {p95_delta:+.1f}%"
+            if base.get("cpu_ms_per_request"):
+                line += f" / {(r['cpu_ms_per_request'] / base['cpu_ms_per_request'] - 1) * 100:+.1f}%"
+        print(line)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated subset of: " + ", ".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per scenario.")
+    parser.add_argument("--warmup", type=int, default=20, help="Unmeasured requests per scenario before measuring.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Client threads.")
+    parser.add_argument("--holders", type=int, default=50, help="Seeded holders.")
+    parser.add_argument("--credentials", type=int, default=20, help="Seeded credentials per holder.")
+    parser.add_argument("--transport", choices=["inprocess", "uvicorn"], default="inprocess")
+    parser.add_argument("--bcrypt-rounds", type=int, default=None, help="Override BCRYPT_ROUNDS (login cost).")
+    parser.add_argument("--output", default=None, help="Results file (default: benchmarks/results/<timestamp>-<commit>.json).")
+    parser.add_argument("--baseline", default=None, help="Earlier results file to compare against.")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        sys.exit(f"Unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    workdir = tempfile.mkdtemp(prefix="vc-bench-")
+    os.environ.update({
+        "STORAGE_BACKEND": "sqlite",
+        "SQLITE_PATH": os.path.join(workdir, "bench.sqlite3"),
+        "FLASK_SECRET_KEY": os.environ.get("FLASK_SECRET_KEY", "benchmark-secret-key-not-for-production"),
+    })
+    if args.bcrypt_rounds:
+        os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+
+    from app import create_app
+    app = create_app()
+
+    per_scenario = args.requests + args.warmup
+    documents = per_scenario * sum(1 for s in scenarios if s in ("upload", "verify_uncached")) + 1
+    dataset = seed(app, args.holders, args.credentials, documents)
+
+    server = None
+    if args.transport == "uvicorn":
+        server, port = start_uvicorn(app)
+        make_client = lambda: HTTPClient(port)
+    else:
+        make_client = lambda: InProcessClient(app)
+
+    results = {}
+    try:
+        for name in scenarios:
+            requests = build_requests(name, per_scenario, dataset, args.holders)
+            if args.warmup:
+                run_scenario(make_client, requests[:args.warmup], args.concurrency, EXPECTED_STATUS[name])
+            print(f"Running {name} ({args.requests} requests, concurrency {args.concurrency})...")
+            results[name] = run_scenario(make_client, requests[args.warmup:], args.concurrency, EXPECTED_STATUS[name])
+    finally:
+        if server:
+            server.should_exit = True
+
+    commit = git_commit()
+    report = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "commit": commit,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "storage_backend": app.config["STORAGE_BACKEND"],
+            "settings": vars(args),
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(
+        BACKEND_DIR, "benchmarks", "results", f"{datetime.utcnow():%Y%m%dT%H%M%S}-{commit or 'nogit'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    print_table(results, baseline)
+    print(f"\nResults written to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,176 @@
 # /run.py
+"""
+Starts the backend.
+
+    python run.py                    development server with auto-reload on port 5001
+    python run.py prod [options]     production: pre-forked uvicorn workers sharing one socket
+
+In prod mode the app (and didkit) is created once here, in the master, and the
+workers are forked from it, so they share the imported code instead of each
+re-importing it. Each worker warms its own DB pool, key cache and crypto pool
+(see app/warmup.py) before it starts accepting connections; unless CRYPTO_WORKERS
+and BCRYPT_WORKERS are set, the crypto pools and bcrypt threads share the cores
+between the workers. Metrics are per worker too: each scrape of /metrics is
+answered by one worker with its own counters only (see app/metrics.py).
+uvloop and httptools are used when installed. SIGTERM or SIGINT drains the workers: in-flight requests get
+up to --graceful-timeout seconds to finish before the remaining workers are killed.
+"""
+import argparse
+import importlib.util
+import math
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+
 import uvicorn
 from app import create_app
 
 app = create_app()
 
+
+def serve_dev(args):
+    # The reloader re-imports this module in a child process on every change
+    uvicorn.run("run:app", host=args.host, port=args.port, reload=True)
+
+# --- Production ---
+def _bind(host, port, backlog):
+    """Opens the listening socket in the master so every worker accepts on it."""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.setblocking(False)
+    return sock
+
+def _serve_worker(sock, args):
+    config = uvicorn.Config(
+        app,
+        loop=args.loop,
+        http=args.http,
+        lifespan="on",
+        access_log=args.access_log,
+        backlog=args.backlog,
+        timeout_keep_alive=args.keep_alive,
+        timeout_graceful_shutdown=args.graceful_timeout,
+    )
+    # Runs the lifespan startup (and with it the warm-up) before accepting on the socket
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class Supervisor:
+    """Keeps `workers` forked children serving `sock`, restarts crashed ones and drains them on shutdown."""
+
+    def __init__(self, sock, args):
+        self.sock = sock
+        self.args = args
+        self.children = {}  # pid -> start time
+        self.stopping = False
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            # Worker: uvicorn installs its own SIGTERM/SIGINT handlers for a graceful shutdown
+            for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGALRM):
+                signal.signal(sig, signal.SIG_DFL)
+            code = 0
+            try:
+                _serve_worker(self.sock, self.args)
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        self.children[pid] = time.monotonic()
+
+    def signal_all(self, sig):
+        for pid in list(self.children):
+            try:
+                os.kill(pid, sig)
+            except ProcessLookupError:
+                pass
+
+    def stop(self, signum, frame):
+        if self.stopping:
+            return
+        self.stopping = True
+        print(f"Draining {len(self.children)} workers (up to {self.args.graceful_timeout}s)...", flush=True)
+        self.signal_all(signal.SIGTERM)
+        # Workers that are still around after the grace period (plus lifespan shutdown) are killed
+        signal.alarm(math.ceil(self.args.graceful_timeout) + 5)
+
+    def kill(self, signum, frame):
+        print(f"Killing {len(self.children)} workers that did not drain in time.", flush=True)
+        self.signal_all(signal.SIGKILL)
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGALRM, self.kill)
+
+        for _ in range(self.args.workers):
+            self.spawn()
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            started = self.children.pop(pid, None)
+            if started is None or self.stopping:
+                continue
+            print(f"Worker {pid} exited unexpectedly (code {os.waitstatus_to_exitcode(status)}); restarting.", flush=True)
+            if time.monotonic() - started < 5:
+                # Don't spin if workers die during startup (e.g. the port or database is misconfigured)
+                time.sleep(1)
+            if not self.stopping:
+                self.spawn()
+        print("All workers stopped.", flush=True)
+
+
+def serve_prod(args):
+    loop = args.loop if args.loop != "auto" else ("uvloop" if importlib.util.find_spec("uvloop") else "asyncio")
+    http = args.http if args.http != "auto" else ("httptools" if importlib.util.find_spec("httptools") else "h11")
+    sock = _bind(args.host, args.port, args.backlog)
+    print(f"Serving on http://{args.host}:{args.port} with {args.workers} workers (loop={loop}, http={http}), master pid {os.getpid()}", flush=True)
+
+    # Every worker starts its own didkit pool (see app/utils/crypto_pool.py) and bcrypt threads
+    # (see app/utils/crypto.py): unless set explicitly, share the cores between them
+    cores_per_worker = max(1, (os.cpu_count() or 1) // max(args.workers, 1))
+    for setting in ("CRYPTO_WORKERS", "BCRYPT_WORKERS"):
+        if setting not in os.environ:
+            app.config[setting] = cores_per_worker
+
+    if args.workers <= 1 or not hasattr(os, "fork"):
+        _serve_worker(sock, args)
+        return
+    Supervisor(sock, args).run()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Runs the backend.")
+    parser.add_argument("mode", nargs="?", choices=["dev", "prod"], default="dev")
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 5001)))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1)),
+                        help="worker processes in prod mode (default: WEB_CONCURRENCY or the number of cores)")
+    parser.add_argument("--loop", choices=["auto", "asyncio", "uvloop"], default="auto")
+    parser.add_argument("--http", choices=["auto", "h11", "httptools"], default="auto")
+    parser.add_argument("--graceful-timeout", type=float, default=float(os.environ.get("GRACEFUL_TIMEOUT", 30)),
+                        help="seconds in-flight requests get to finish on shutdown")
+    parser.add_argument("--keep-alive", type=int, default=5, help="idle keep-alive timeout in seconds")
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--access-log", action="store_true", help="log every request (off in prod by default)")
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
-    uvicorn.run("run:app.asgi_app", host="0.0.0.0", port=5001, reload=True)
\ No newline at end of file
+    args = parse_args()
+    if args.mode == "prod":
+        serve_prod(args)
+    else:
+        serve_dev(args)
@@ -0,0 +1,33 @@
+import asyncio
+import os
+
+import pytest
+
+# Config is read at import time: an embedded database and inline crypto, no external services
+os.environ.setdefault("FLASK_SECRET_KEY", "test-secret-of-at-least-32-bytes")
+os.environ.setdefault("STORAGE_BACKEND", "sqlite")
+os.environ.setdefault("CRYPTO_WORKERS", "0")
+os.environ.setdefault("WARMUP_ON_START", "false")
+os.environ.setdefault("ISSUE_JOB_CONCURRENCY", "0")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+
+@pytest.fixture
+def app(tmp_path):
+    from app import Config, create_app, run_with_app_context
+    from app.storage import get_storage
+    Config.SQLITE_PATH = str(tmp_path / "test.sqlite3")
+    app = create_app()
+    run_with_app_context(app, lambda: get_storage().migrate())
+    return app
+
+
+@pytest.fixture
+def run(app):
+    """Runs a coroutine inside an app context on a fresh event loop."""
+    def _run(coroutine):
+        async def _inner():
+            async with app.app_context():
+                return await coroutine
+        return asyncio.run(_inner())
+    return _run
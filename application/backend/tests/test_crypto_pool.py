@@ -0,0 +1,35 @@
+import asyncio
+
+import pytest
+
+from app.utils.crypto_pool import CryptoPool, CryptoPoolSaturated
+
+
+async def _hold(event):
+    await event.wait()
+    return "done"
+
+
+def test_batches_take_one_slot_per_proof():
+    async def scenario():
+        pool = CryptoPool(workers=0, max_queue=9)
+        release = asyncio.Event()
+        batch = asyncio.ensure_future(pool.run("verify_batch", _hold, release, slots=8))
+        await asyncio.sleep(0)
+        assert pool.stats()["in_flight"] == 8
+
+        # Two slots left: a second batch of three is turned away, a single operation is not
+        with pytest.raises(CryptoPoolSaturated):
+            await pool.run("verify_batch", _hold, release, slots=3)
+        single = asyncio.ensure_future(pool.run("verify_credential", _hold, release))
+        await asyncio.sleep(0)
+        assert pool.stats()["in_flight"] == 9
+
+        release.set()
+        assert await asyncio.gather(batch, single) == ["done", "done"]
+        assert pool.stats()["in_flight"] == 0
+
+        # A batch larger than the pool runs when the pool is idle
+        assert await pool.run("verify_batch", _hold, release, slots=50) == "done"
+
+    asyncio.run(scenario())
@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import run_with_app_context
+from app.storage import get_storage
+
+T0 = datetime(2024, 1, 1, 12, 0, 0, 123456)
+LEASE = timedelta(seconds=300)
+
+
+@pytest.fixture
+def storage(app):
+    """Calls storage methods, each in its own app context, on a database with one queued item."""
+    def call(method, *args):
+        return run_with_app_context(app, lambda: getattr(get_storage(), method)(*args))
+    issuer_id = call("create_user", "issuer@example.org", "x", "issuer")
+    call("create_issuance_job", issuer_id, ['{"holder_email": "h@example.org"}'], T0)
+    return call
+
+
+def _claim(storage, now, max_attempts=3):
+    return storage("claim_issuance_items", 1, now, now - LEASE, max_attempts)
+
+
+def test_outcome_of_a_lost_lease_is_not_recorded(storage):
+    [first] = _claim(storage, T0)
+    assert _claim(storage, T0 + timedelta(seconds=1)) == []
+
+    # The first worker stalled past its lease and the item was claimed again
+    [second] = _claim(storage, T0 + LEASE * 2)
+    assert second['attempts'] == 2
+    assert not storage("finish_issuance_item", first['item_id'], first['claimed_at'], "error", "late", T0 + LEASE * 2)
+    assert not storage("retry_issuance_item", first['item_id'], first['claimed_at'], "late", T0 + LEASE * 2)
+
+    assert storage("finish_issuance_item", second['item_id'], second['claimed_at'], "created", None, T0 + LEASE * 2)
+    [row] = storage("list_issuance_items", second['job_id'])
+    assert (row['status'], row['error']) == ("created", None)
+
+
+def test_expired_lease_without_attempts_left_fails_the_item(storage):
+    now = T0
+    for attempt in range(1, 4):
+        [item] = _claim(storage, now)
+        assert item['attempts'] == attempt
+        now += LEASE * 2
+
+    assert _claim(storage, now) == []
+    [row] = storage("list_issuance_items", item['job_id'])
+    assert (row['status'], row['attempts']) == ("error", 3)
+    assert row['error'] == "Lease expired on all 3 attempts."
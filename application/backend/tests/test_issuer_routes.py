@@ -0,0 +1,29 @@
+import asyncio
+
+import pytest
+
+
+async def _issuer_headers(client):
+    await client.post("/api/register", json={"email": "issuer@example.org", "password": "pw", "role": "issuer"})
+    response = await client.post("/api/login", json={"email": "issuer@example.org", "password": "pw"})
+    return {"Authorization": "Bearer " + (await response.get_json())["token"]}
+
+
+@pytest.mark.parametrize("cred_id", [[1], "1", 1.5, True, -3, {"id": 1}])
+def test_revoke_rejects_cred_id_that_is_not_a_positive_int(app, cred_id):
+    async def revoke():
+        client = app.test_client()
+        response = await client.post("/api/issuer/revoke", json={"cred_id": cred_id}, headers=await _issuer_headers(client))
+        return response.status_code, await response.get_json()
+
+    status, body = asyncio.run(revoke())
+    assert status == 400, body
+
+
+def test_revoke_unknown_credential(app):
+    async def revoke():
+        client = app.test_client()
+        response = await client.post("/api/issuer/revoke", json={"cred_id": 42}, headers=await _issuer_headers(client))
+        return response.status_code
+
+    assert asyncio.run(revoke()) == 404
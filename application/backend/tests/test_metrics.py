@@ -0,0 +1,26 @@
+import asyncio
+
+import pytest
+
+from app import Config, create_app
+
+
+async def _get_metrics(app, headers=None):
+    response = await app.test_client().get("/metrics", headers=headers or {})
+    return response.status_code
+
+
+def test_metrics_require_the_admin_token(app):
+    assert asyncio.run(_get_metrics(app)) == 403
+
+
+def test_metrics_with_admin_token(monkeypatch, app):
+    monkeypatch.setitem(app.config, "PROFILE_TOKEN", "admin-token")
+    assert asyncio.run(_get_metrics(app, {"Authorization": "Bearer wrong"})) == 403
+    assert asyncio.run(_get_metrics(app, {"Authorization": "Bearer admin-token"})) == 200
+
+
+@pytest.mark.usefixtures("app")
+def test_metrics_public_when_configured(monkeypatch):
+    monkeypatch.setattr(Config, "METRICS_PUBLIC", True)
+    assert asyncio.run(_get_metrics(create_app())) == 200
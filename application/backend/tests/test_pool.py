@@ -0,0 +1,32 @@
+from unittest import mock
+
+from app.pool import ConnectionPool
+
+
+class FakeConnection:
+    in_transaction = False
+    closed = False
+
+    def ping(self, reconnect=False):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def test_release_after_dispose_closes_connection():
+    with mock.patch("mysql.connector.connect", side_effect=lambda **_: FakeConnection()):
+        pool = ConnectionPool({}, pool_size=2)
+        kept, idle = pool.checkout(), pool.checkout()
+        pool.release(idle)
+        pool.dispose()
+        assert idle.closed
+
+        # Checked out before dispose(): closed when it comes back instead of rejoining the pool
+        pool.release(kept)
+        assert kept.closed
+        assert pool.stats()["total"] == 0 and pool.stats()["idle"] == 0
+
+        fresh = pool.checkout()
+        pool.release(fresh)
+        assert not fresh.closed and pool.stats()["idle"] == 1
@@ -0,0 +1,38 @@
+import asyncio
+
+import pytest
+
+from app import Config, create_app
+
+
+@pytest.fixture
+def profiled_app(monkeypatch, tmp_path, app):
+    monkeypatch.setattr(Config, "PROFILE_TOKEN", "admin-token")
+    monkeypatch.setattr(Config, "PROFILE_DIR", str(tmp_path / "profiles"))
+    monkeypatch.setattr(Config, "PROFILE_MIN_INTERVAL", 0)
+    return create_app()
+
+
+def _profile_header(app, path, headers=None):
+    async def get():
+        response = await app.test_client().get(path, headers=headers or {})
+        return response.headers.get("X-Profile")
+    return asyncio.run(get())
+
+
+@pytest.mark.parametrize("path, headers", [
+    ("/", {"X-Profile": "admin-token"}),
+    ("/?_profile=1", {"Authorization": "Bearer admin-token"}),
+])
+def test_profiles_requests_carrying_the_token_in_a_header(profiled_app, path, headers):
+    assert _profile_header(profiled_app, path, headers).endswith(".prof")
+
+
+@pytest.mark.parametrize("path, headers", [
+    ("/?_profile=admin-token", {}),
+    ("/?_profile=1", {}),
+    ("/", {"Authorization": "Bearer admin-token"}),
+    ("/", {"X-Profile": "wrong"}),
+])
+def test_ignores_requests_without_switch_and_header_token(profiled_app, path, headers):
+    assert _profile_header(profiled_app, path, headers) is None
@@ -0,0 +1,103 @@
+import base64
+import json
+
+import didkit
+import pytest
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
+from app.utils import sd_jwt
+from app.utils.keys import derive_key_material
+
+
+def _new_key(run):
+    return run(derive_key_material(didkit.generate_ed25519_key()))
+
+def _payload(issuer_did, holder_did, **claims):
+    return {
+        "@context": ["https://www.w3.org/2018/credentials/v1", {"grade": "https://schema.org/grade", "name": "https://schema.org/name"}],
+        "id": "urn:uuid:6b1e5f0e-1f1c-4a63-9b53-0c6a4cf2b4d1",
+        "type": ["VerifiableCredential"],
+        "issuer": issuer_did,
+        "issuanceDate": "2024-01-01T00:00:00Z",
+        "credentialSubject": {"id": holder_did, **(claims or {"name": "Ana", "grade": "14"})},
+    }
+
+def _b64(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+def _forge(key, claims, vc, disclosed):
+    """An SD-JWT whose issuer JWT `key` signs directly, bypassing didkit's issuer checks."""
+    disclosures = [sd_jwt.make_disclosure(name, value) for name, value in disclosed.items()]
+    vc = dict(vc, _sd_alg=sd_jwt.SD_ALG)
+    vc["credentialSubject"] = {"id": vc["credentialSubject"]["id"], "_sd": sorted(sd_jwt.digest(d) for d in disclosures)}
+    header = {"alg": "EdDSA", "kid": f"{key.did}#{key.did[len('did:key:'):]}"}
+    signing_input = f"{_b64(json.dumps(header).encode())}.{_b64(json.dumps(dict(claims, iss=key.did, vc=vc)).encode())}"
+    d = json.loads(key.jwk)["d"]
+    signature = Ed25519PrivateKey.from_private_bytes(base64.urlsafe_b64decode(d + "=" * (-len(d) % 4))).sign(signing_input.encode())
+    return "~".join([f"{signing_input}.{_b64(signature)}", *disclosures, ""])
+
+def _with_disclosure(token, disclosure):
+    issuer_jwt, disclosures, _ = sd_jwt.split(token)
+    return "~".join([issuer_jwt, *disclosures, disclosure, ""])
+
+
+@pytest.fixture
+def keys(run):
+    return {"issuer": _new_key(run), "holder": _new_key(run)}
+
+@pytest.fixture
+def token(run, keys):
+    return run(sd_jwt.issue(_payload(keys["issuer"].did, keys["holder"].did), keys["issuer"]))
+
+
+def test_verify_discloses_presented_claims(run, keys, token):
+    result = run(sd_jwt.verify(sd_jwt.present(token, ["grade"])))
+    assert result["verified"], result["errors"]
+    assert result["credential"]["issuer"] == keys["issuer"].did
+    assert result["credential"]["credentialSubject"] == {"id": keys["holder"].did, "grade": "14"}
+
+def test_key_binding(run, keys, token):
+    presentation = run(sd_jwt.bind_key(sd_jwt.present(token, ["name"]), keys["holder"], "n-1", "verifier.example"))
+    assert run(sd_jwt.verify(presentation, "n-1", "verifier.example"))["verified"]
+
+    result = run(sd_jwt.verify(presentation, "n-2", "verifier.example"))
+    assert not result["verified"]
+    assert result["errors"] == ["Key binding nonce does not match."]
+
+def test_forged_token_with_matching_issuer_verifies(run, keys):
+    # Control for the two tests below: a hand-signed token is accepted when issuer and subject match
+    attacker = _new_key(run)
+    vc = _payload(attacker.did, keys["holder"].did)
+    assert run(sd_jwt.verify(_forge(attacker, {"sub": keys["holder"].did}, vc, {"grade": "20"})))["verified"]
+
+def test_rejects_issuer_other_than_signer(run, keys):
+    # Signed by a fresh did:key, but claiming to be the university
+    attacker = _new_key(run)
+    vc = _payload(keys["issuer"].did, keys["holder"].did)
+    result = run(sd_jwt.verify(_forge(attacker, {"sub": keys["holder"].did}, vc, {"grade": "20"})))
+    assert result == {"verified": False, "errors": ["The credential's issuer is not the signer of the issuer JWT."]}
+
+    vc["issuer"] = {"id": keys["issuer"].did, "name": "University"}
+    assert not run(sd_jwt.verify(_forge(attacker, {"sub": keys["holder"].did}, vc, {"grade": "20"})))["verified"]
+
+def test_rejects_subject_other_than_sub(run, keys):
+    vc = _payload(keys["issuer"].did, keys["holder"].did)
+    result = run(sd_jwt.verify(_forge(keys["issuer"], {"sub": "did:key:z6MkotherHolder"}, vc, {"grade": "20"})))
+    assert result == {"verified": False, "errors": ["The credential's subject does not match the issuer JWT."]}
+
+def test_rejects_disclosure_not_signed(run, token):
+    result = run(sd_jwt.verify(_with_disclosure(token, sd_jwt.make_disclosure("grade", "20"))))
+    assert not result["verified"]
+    assert "A disclosure does not match the issuer's digests." in result["errors"]
+
+def test_rejects_repeated_disclosure(run, token):
+    _, disclosures, _ = sd_jwt.split(token)
+    result = run(sd_jwt.verify(_with_disclosure(token, disclosures[0])))
+    assert not result["verified"]
+    assert "A disclosure does not match the issuer's digests." in result["errors"]
+
+@pytest.mark.parametrize("suffix", ["é~", "abc def~", "eyJ.é.x"])
+def test_rejects_non_base64url_parts(run, token, suffix):
+    result = run(sd_jwt.verify(token + suffix))
+    assert not result["verified"]
+    assert result["errors"][0].startswith("Malformed")
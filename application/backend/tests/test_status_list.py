@@ -0,0 +1,33 @@
+import asyncio
+import threading
+from unittest import mock
+
+from quart import g
+
+from app.utils import status_list
+
+
+def test_concurrent_lookups_share_one_load_off_the_request_connection(run):
+    calls = []
+
+    def get_status_list(issuer_id):
+        calls.append((issuer_id, threading.get_ident()))
+        # The request's own context must not have been handed to the loader
+        assert "checked" not in g
+        g.checked = True
+        return None
+
+    async def lookups():
+        g.pop("checked", None)
+        results = await asyncio.gather(*(status_list.cached_status_list(987654) for _ in range(8)))
+        again = await status_list.cached_status_list(987654)
+        return results, again, "checked" in g
+
+    with mock.patch.object(status_list, "get_status_list", side_effect=get_status_list):
+        results, again, leaked = run(lookups())
+    assert results == [None] * 8 and again is None
+    # One load for the eight concurrent lookups, none for the unknown issuer afterwards
+    assert len(calls) == 1
+    assert not leaked
+
+    status_list.unknown_issuers.invalidate(987654)